@@ -0,0 +1,20 @@
+"""
+ASGI config for appointments project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+serving the async versions of the list, detail, calendar and status views
+(see ``project_app/async_views.py``). Run it with an ASGI server, e.g.
+``uvicorn appointments.asgi:application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "appointments.settings")
+os.environ.setdefault("APPOINTMENTS_ASYNC_VIEWS", "True")
+
+application = get_asgi_application()
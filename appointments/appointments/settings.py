@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'project_app.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,7 +59,8 @@ ROOT_URLCONF = 'appointments.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for RequestMetricsMiddleware
+        'BACKEND': 'project_app.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,6 +75,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'appointments.wsgi.application'
+ASGI_APPLICATION = 'appointments.asgi.application'
 
 
 # Database
@@ -146,11 +149,80 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@appointments.local')
 
+# Notification outbox: views queue emails and `manage.py send_notifications`
+# delivers them. Set APPOINTMENTS_EMAIL_QUEUE=False to send inline instead.
+APPOINTMENTS_EMAIL_QUEUE = os.environ.get('APPOINTMENTS_EMAIL_QUEUE', 'True').lower() in ('true', '1', 'yes')
+APPOINTMENTS_EMAIL_BATCH_SIZE = 100
+APPOINTMENTS_EMAIL_MAX_ATTEMPTS = 5
+APPOINTMENTS_EMAIL_RETRY_DELAY = 60  # seconds, doubled after each failure
+APPOINTMENTS_EMAIL_RETRY_MAX_DELAY = 3600
+APPOINTMENTS_EMAIL_LEASE = 300  # seconds before an unfinished claim is retried
+# Reminders: minutes before an appointment that its reminders are sent, and
+# reminders claimed per transaction by `manage.py send_reminders`
+APPOINTMENTS_REMINDER_LEAD_MINUTES = [24 * 60]
+APPOINTMENTS_REMINDER_BATCH_SIZE = 500
+
 # Messages framework
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
 # Pagination
 APPOINTMENTS_PER_PAGE = 10
+# 'offset' (numbered pages) or 'keyset' (cursor-based, constant cost per page)
+APPOINTMENTS_PAGINATION = os.environ.get('APPOINTMENTS_PAGINATION', 'offset')
+# Keyset total count: None (not shown), 'exact' or 'cached'
+APPOINTMENTS_PAGINATION_COUNT = 'cached'
+APPOINTMENTS_PAGINATION_COUNT_TIMEOUT = 60
+
+# Calendar: months with more appointments than this show per-day counts only
+APPOINTMENTS_CALENDAR_MAX_APPOINTMENTS = 500
+
+# Cache alias (see CACHES) for calendar months and other derived data
+APPOINTMENTS_CACHE = 'default'
+APPOINTMENTS_CALENDAR_CACHE_TIMEOUT = 3600
+# Cached list row and detail card HTML, keyed on pk and updated_at
+APPOINTMENTS_FRAGMENT_CACHE_TIMEOUT = 3600
+
+# JSON API: maximum create + update + delete items per batch request
+APPOINTMENTS_API_MAX_BATCH = 1000
+
+# Longest allowed appointment, in minutes; also bounds the overlap check
+APPOINTMENTS_MAX_DURATION = 8 * 60
+
+# Availability search: weekday (0 = Monday) -> working periods, used for
+# owners without WorkingHours rows; slot start granularity in minutes; how
+# many days ahead to search; cache lifetime of per-day free intervals
+APPOINTMENTS_DEFAULT_WORKING_HOURS = {weekday: [('09:00', '17:00')] for weekday in range(5)}
+APPOINTMENTS_SLOT_STEP = 15
+APPOINTMENTS_AVAILABILITY_HORIZON = 60
+APPOINTMENTS_AVAILABILITY_CACHE_TIMEOUT = 3600
+
+# Export: rows fetched per database round-trip while streaming
+APPOINTMENTS_EXPORT_CHUNK_SIZE = 2000
+
+# Import: rows per bulk insert and transaction
+APPOINTMENTS_IMPORT_BATCH_SIZE = 1000
+
+# Request instrumentation: Server-Timing headers and per-view histograms
+# (served at /instrumentation/metrics/), and a warning logged for requests
+# over this many queries or milliseconds (None disables either check)
+APPOINTMENTS_INSTRUMENTATION = os.environ.get(
+    'APPOINTMENTS_INSTRUMENTATION', str(DEBUG)
+).lower() in ('true', '1', 'yes')
+APPOINTMENTS_SLOW_REQUEST_QUERIES = 50
+APPOINTMENTS_SLOW_REQUEST_MS = 500
+
+# Change feed (only served with APPOINTMENTS_ASYNC_VIEWS): seconds between
+# keep-alive comments, and before a stream is closed (the browser reconnects,
+# resuming from the last event it received)
+APPOINTMENTS_CHANGEFEED_HEARTBEAT = 15
+APPOINTMENTS_CHANGEFEED_MAX_SECONDS = 300
+
+# Serve the async versions of the list, export, detail, calendar and status views,
+# and the change feed the list and calendar subscribe to; asgi.py turns this on
+APPOINTMENTS_ASYNC_VIEWS = os.environ.get('APPOINTMENTS_ASYNC_VIEWS', 'False').lower() in ('true', '1', 'yes')
+
+# Search backend (dotted path); unset picks one for the database vendor
+APPOINTMENTS_SEARCH_BACKEND = os.environ.get('APPOINTMENTS_SEARCH_BACKEND') or None
 
 # Security settings for production
 if not DEBUG:
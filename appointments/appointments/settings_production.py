@@ -0,0 +1,77 @@
+"""
+Production settings profile for the appointments project.
+
+Extends ``settings.py``; select it with
+``DJANGO_SETTINGS_MODULE=appointments.settings_production``. Compared with
+the development defaults it:
+
+* turns DEBUG off and requires ``DJANGO_SECRET_KEY``;
+* loads templates through the cached loader explicitly, so each template
+  is compiled once per process;
+* configures a shared cache (Redis by default, which needs the ``redis``
+  package). The calendar, availability, ETag and fragment caches and the
+  per-owner versions that invalidate them must be shared by every worker
+  process, so a per-process ``LocMemCache`` is only suitable for a single
+  process;
+* keeps sessions in that cache, written through to the database
+  (``cached_db``), and flash messages in a cookie, falling back to the
+  session when too large;
+* keeps database connections open between requests, checked before reuse.
+
+Every choice can be overridden with the environment variables below.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, SECRET_KEY, TEMPLATES
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('true', '1', 'yes')
+
+
+DEBUG = _env_bool('DJANGO_DEBUG', False)
+
+if 'DJANGO_SECRET_KEY' not in os.environ or SECRET_KEY.startswith('django-insecure'):
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY for the production settings.')
+
+# Templates: the cached loader wraps the loaders APP_DIRS would have used
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Cache shared by all worker processes
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND',
+                                  'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+        'TIMEOUT': int(os.environ.get('DJANGO_CACHE_TIMEOUT', 3600)),
+        'KEY_PREFIX': os.environ.get('DJANGO_CACHE_KEY_PREFIX', 'appointments'),
+    }
+}
+
+# Sessions read from the cache, written through to the database
+SESSION_ENGINE = os.environ.get('DJANGO_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+# Flash messages in a cookie, so showing one does not rewrite the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.fallback.FallbackStorage'
+
+# Persistent database connections, health-checked before reuse
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DJANGO_CONN_MAX_AGE', 60))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# No per-request instrumentation unless asked for
+APPOINTMENTS_INSTRUMENTATION = _env_bool('APPOINTMENTS_INSTRUMENTATION', False)
+
+# Security settings (settings.py only applies them when DEBUG is off there)
+SECURE_BROWSER_XSS_FILTER = True
+SECURE_CONTENT_TYPE_NOSNIFF = True
+X_FRAME_OPTIONS = 'DENY'
+CSRF_COOKIE_SECURE = True
+SESSION_COOKIE_SECURE = True
@@ -0,0 +1,37 @@
+"""
+Benchmarks for the appointments project.
+
+Scripts in this package run standalone against a throwaway test database,
+never against db.sqlite3. Run them from the directory containing manage.py:
+
+    python -m benchmarks.query_plans --rows 1000000
+"""
+import os
+
+
+def setup():
+    """Configure Django for a standalone benchmark script."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appointments.settings')
+    import django
+    django.setup()
+
+
+def create_database(name=None, keepdb=False):
+    """
+    Create a throwaway test database and return a teardown callable.
+
+    ``name`` overrides the test database name (e.g. a file path, so large
+    SQLite datasets do not have to fit in memory). With ``keepdb`` an
+    existing database is reused and left in place afterwards.
+    """
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    if name:
+        connection.settings_dict['TEST']['NAME'] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+
+    def teardown():
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+    return teardown
@@ -0,0 +1,73 @@
+"""
+Compare appointment creation throughput: HTML form vs JSON bulk API.
+
+Creates N appointments through ``post_new`` (one request each) and through
+``POST /api/appointments/`` in batches, on a throwaway database:
+
+    python -m benchmarks.api_throughput --count 2000 --batch-size 500
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+
+from benchmarks import create_database, setup
+
+
+def item(i):
+    return {
+        'first_name': 'Jane',
+        'last_name': 'Smith',
+        'email': f'jane{i}@example.com',
+        'appointment_title': f'Benchmark {i}',
+        'appointment_description': 'Created by the throughput benchmark',
+        'date_field': str(date.today() + timedelta(days=1 + i % 300)),
+        'time_field': '10:30',
+        'status': 'pending',
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    setup_test_environment()
+    teardown = create_database()
+    try:
+        user = User.objects.create_user('bench', 'bench@example.com', 'bench-pass')
+        client = Client()
+        client.force_login(user)
+
+        start = time.perf_counter()
+        for i in range(args.count):
+            client.post(reverse('post_new'), item(i))
+        form_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, args.count, args.batch_size):
+            batch = [item(i) for i in range(offset, min(offset + args.batch_size, args.count))]
+            response = client.post(
+                reverse('api_appointments'), json.dumps({'create': batch}),
+                content_type='application/json',
+            )
+            assert response.status_code == 200, response.content
+        api_elapsed = time.perf_counter() - start
+
+        print(f'Creating {args.count} appointments')
+        print(f'{"form (post_new)":<24} {form_elapsed:8.2f}s  {args.count / form_elapsed:10,.0f}/s')
+        print(f'{"api (batch " + str(args.batch_size) + ")":<24} {api_elapsed:8.2f}s  '
+              f'{args.count / api_elapsed:10,.0f}/s')
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Compare concurrent throughput of the sync views under WSGI and the async
+views under ASGI.
+
+Each mode runs in a fresh interpreter against its own throwaway SQLite file
+seeded with the same appointments, calling Django's WSGI or ASGI handler
+in-process (no server or network) with ``--concurrency`` requests in
+flight: WSGI on that many threads, ASGI as that many tasks on one event
+loop. ``--db-latency-ms`` adds a sleep to every query, to stand in for a
+remote database:
+
+    python -m benchmarks.asgi_load --concurrency 16 --duration 10 --db-latency-ms 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import create_database, setup
+from benchmarks.suite import percentile
+
+SCENARIOS = ['list', 'calendar', 'detail', 'status']
+
+
+def _requests(scenario, detail_pk, today):
+    """Return ``(method, path, query, body)`` for one request of ``scenario``."""
+    if scenario == 'list':
+        return 'GET', '/view/', '', b''
+    if scenario == 'calendar':
+        return 'GET', '/calendar/', f'year={today.year}&month={today.month}', b''
+    if scenario == 'detail':
+        return 'GET', f'/appointments/{detail_pk}/', '', b''
+    return 'POST', f'/appointments/{detail_pk}/status/', '', b'status=confirmed'
+
+
+def _csrf_token(cookie):
+    return cookie.rsplit('csrftoken=', 1)[1]
+
+
+def _slow_queries(delay):
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+def run_wsgi(request, cookie, concurrency, duration, errors):
+    """Drive the WSGI handler from ``concurrency`` threads; return latencies in ms."""
+    from django.core.wsgi import get_wsgi_application
+    from django.test.client import FakePayload
+
+    application = get_wsgi_application()
+    method, path, query, body = request
+    deadline = time.perf_counter() + duration
+    timings = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            environ = {
+                'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query,
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_COOKIE': cookie, 'HTTP_X_CSRFTOKEN': _csrf_token(cookie),
+                'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+                'CONTENT_LENGTH': str(len(body)), 'wsgi.input': FakePayload(body),
+                'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            start = time.perf_counter()
+            statuses = []
+            response = application(environ, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            local.append((time.perf_counter() - start) * 1000)
+            if not statuses[0].startswith('200'):
+                errors.append(statuses[0])
+        with lock:
+            timings.extend(local)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return timings
+
+
+def run_asgi(request, cookie, concurrency, duration, errors):
+    """Drive the ASGI handler with ``concurrency`` tasks; return latencies in ms."""
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+    method, path, query, body = request
+    headers = [(b'host', b'testserver'), (b'cookie', cookie.encode()),
+               (b'x-csrftoken', _csrf_token(cookie).encode()),
+               (b'content-type', b'application/x-www-form-urlencoded'),
+               (b'content-length', str(len(body)).encode())]
+
+    async def one_request():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '', 'headers': headers,
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        disconnected = asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        statuses = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        await application(scope, receive, send)
+        disconnected.set()
+        if statuses[0] != 200:
+            errors.append(statuses[0])
+
+    async def worker(deadline, timings):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await one_request()
+            timings.append((time.perf_counter() - start) * 1000)
+
+    async def main():
+        timings = []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(worker(deadline, timings) for _ in range(concurrency)))
+        return timings
+
+    return asyncio.run(main())
+
+
+def measure(mode, scenarios, rows, concurrency, duration, db_latency_ms):
+    """Seed a database and measure each scenario under ``mode``."""
+    setup()
+    from datetime import date
+
+    from django.contrib.auth.models import User
+    from django.db import connection, connections
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.utils.crypto import get_random_string
+
+    from benchmarks.generator import generate_appointments
+    from project_app.models import Appointment
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        teardown = create_database(os.path.join(directory, 'load.sqlite3'))
+        try:
+            generate_appointments(rows, owners=10, seed=0)
+            owner = User.objects.filter(username__startswith='bench_owner_').order_by('pk').first()
+            detail_pk = Appointment.objects.filter(owner=owner).values_list('pk', flat=True).first()
+            client = Client(enforce_csrf_checks=False)
+            client.force_login(owner)
+            # A CSRF secret doubles as a valid token for the status POSTs
+            csrf_token = get_random_string(32)
+            cookie = f'sessionid={client.cookies["sessionid"].value}; csrftoken={csrf_token}'
+            connection.close()
+
+            results = {}
+            for scenario in scenarios:
+                request = _requests(scenario, detail_pk, date.today())
+                run = run_asgi if mode == 'asgi' else run_wsgi
+                if db_latency_ms:
+                    # Every connection opened from here on sleeps per query
+                    from django.db.backends.signals import connection_created
+
+                    def slow(sender, connection, **kwargs):
+                        connection.execute_wrappers.append(_slow_queries(db_latency_ms / 1000))
+                    connection_created.connect(slow, weak=False)
+                errors = []
+                timings = run(request, cookie, concurrency, duration, errors)
+                if db_latency_ms:
+                    connection_created.disconnect(slow)
+                connections.close_all()
+                results[scenario] = {
+                    'requests_per_s': round(len(timings) / duration, 1),
+                    'p50_ms': round(statistics.median(timings), 3),
+                    'p99_ms': round(percentile(timings, 0.99), 3),
+                    'requests': len(timings),
+                    # e.g. "database is locked" when SQLite writers collide
+                    'errors': len(errors),
+                }
+            return results
+        finally:
+            connections.close_all()
+            teardown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Requests in flight: WSGI threads, or ASGI tasks.')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per scenario.')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0)
+    parser.add_argument('--only', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        # Child process: one mode, results as JSON on the last line
+        print(json.dumps(measure(args.mode, args.only, args.rows, args.concurrency,
+                                 args.duration, args.db_latency_ms)))
+        return 0
+
+    results = {}
+    for mode in ('wsgi', 'asgi'):
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.asgi_load', '--mode', mode,
+             '--rows', str(args.rows), '--concurrency', str(args.concurrency),
+             '--duration', str(args.duration), '--db-latency-ms', str(args.db_latency_ms),
+             '--only', *args.only],
+            env=dict(os.environ, APPOINTMENTS_ASYNC_VIEWS=str(mode == 'asgi')),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+    for scenario in args.only:
+        for mode in ('wsgi', 'asgi'):
+            result = results[mode][scenario]
+            print(f'{scenario:<10} {mode}  {result["requests_per_s"]:8.1f} req/s  '
+                  f'p50 {result["p50_ms"]:8.2f}ms  p99 {result["p99_ms"]:8.2f}ms  '
+                  f'{result["errors"]} errors', file=sys.stderr)
+    print(json.dumps({'concurrency': args.concurrency, 'db_latency_ms': args.db_latency_ms,
+                      'results': results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
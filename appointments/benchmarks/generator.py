@@ -0,0 +1,135 @@
+"""Seeded generator for realistic Appointment rows."""
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from project_app.models import Appointment
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael',
+    'Linda', 'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan',
+    'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+    'Davis', 'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez',
+    'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+]
+TITLES = [
+    'Initial Consultation', 'Follow-up Visit', 'Annual Checkup',
+    'Dental Cleaning', 'Physical Therapy', 'Lab Results Review',
+    'Vaccination', 'Eye Exam', 'Counseling Session', 'Blood Work',
+]
+CITIES = [
+    ('Springfield', 'IL'), ('Portland', 'OR'), ('Austin', 'TX'),
+    ('Madison', 'WI'), ('Denver', 'CO'), ('Raleigh', 'NC'),
+]
+# Most appointments are settled; a minority are still open or cancelled.
+STATUS_WEIGHTS = [
+    ('pending', 20),
+    ('confirmed', 30),
+    ('completed', 40),
+    ('cancelled', 10),
+]
+DURATION_WEIGHTS = [
+    (15, 15),
+    (30, 50),
+    (45, 15),
+    (60, 20),
+]
+# Named dataset sizes accepted by ``parse_scale``
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+
+def parse_scale(value):
+    """Return the row count for a scale name ('10k', '1m', ...) or a number."""
+    value = str(value).lower().replace('_', '')
+    if value in SCALES:
+        return SCALES[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'Unknown scale {value!r}; use a number or one of {", ".join(SCALES)}')
+
+
+def default_owners(count):
+    """Owners for ``count`` rows: about 1000 appointments each, at least 100."""
+    return max(100, count // 1000)
+
+
+def create_owners(count, prefix='bench_owner'):
+    """Create ``count`` users to own generated appointments."""
+    users = [
+        User(username=f'{prefix}_{i}', email=f'{prefix}_{i}@example.com')
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, ignore_conflicts=True)
+    return list(User.objects.filter(username__startswith=f'{prefix}_').order_by('pk'))
+
+
+def iter_appointments(count, owners, seed=0, days=365, today=None):
+    """
+    Yield ``count`` unsaved Appointment instances.
+
+    Dates are spread over ``days`` either side of ``today`` and owners are
+    picked with a skewed distribution, so a few owners are much busier than
+    the rest, as in a real clinic.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    statuses = [s for s, _ in STATUS_WEIGHTS]
+    weights = [w for _, w in STATUS_WEIGHTS]
+    durations = [d for d, _ in DURATION_WEIGHTS]
+    duration_weights = [w for _, w in DURATION_WEIGHTS]
+    owner_weights = [1.0 / (i + 1) for i in range(len(owners))]
+
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        city, state = rng.choice(CITIES)
+        yield Appointment(
+            owner=rng.choices(owners, owner_weights)[0],
+            first_name=first,
+            last_name=last,
+            email=f'{first}.{last}{i}@example.com'.lower(),
+            phone=f'+1{rng.randint(2000000000, 9999999999)}',
+            appointment_title=rng.choice(TITLES),
+            appointment_description=f'{rng.choice(TITLES)} for {first} {last}.',
+            status=rng.choices(statuses, weights)[0],
+            date_field=today + timedelta(days=rng.randint(-days, days)),
+            time_field=time(rng.randint(8, 17), rng.choice((0, 30))),
+            duration_minutes=rng.choices(durations, duration_weights)[0],
+            address=f'{rng.randint(1, 9999)} Main St',
+            city=city,
+            state=state,
+            zip_code=f'{rng.randint(10000, 99999)}',
+        )
+
+
+def generate_appointments(count, owners=100, seed=0, batch_size=5000, progress=None):
+    """
+    Insert ``count`` appointments spread across ``owners`` users.
+
+    ``progress``, if given, is called with the number of rows inserted so
+    far after each batch.
+    """
+    owner_objs = create_owners(owners)
+    batch = []
+    inserted = 0
+    for appointment in iter_appointments(count, owner_objs, seed=seed):
+        batch.append(appointment)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                Appointment.objects.bulk_create(batch)
+            inserted += len(batch)
+            batch = []
+            if progress:
+                progress(inserted)
+    if batch:
+        with transaction.atomic():
+            Appointment.objects.bulk_create(batch)
+        if progress:
+            progress(inserted + len(batch))
+    return owner_objs
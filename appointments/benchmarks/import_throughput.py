@@ -0,0 +1,75 @@
+"""
+Measure bulk import throughput.
+
+Writes N generated appointments to a CSV file, compares validating them with
+one ``AppointmentForm`` per row against ``AppointmentRowCleaner``, then runs
+``import_appointments`` on a throwaway database:
+
+    python -m benchmarks.import_throughput --count 100000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from benchmarks import create_database, setup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.core.management import call_command
+
+    from benchmarks.generator import iter_appointments
+    from project_app.forms import AppointmentForm
+    from project_app.importer import AppointmentRowCleaner, read_rows
+
+    teardown = create_database()
+    fields = AppointmentForm.Meta.fields
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(fields)
+            for appointment in iter_appointments(args.count, [None]):
+                writer.writerow([getattr(appointment, field) for field in fields])
+
+        with open(path, newline='') as input_file:
+            rows = [row for _, row in read_rows(input_file)]
+        sample = rows[:min(len(rows), 20000)]
+
+        start = time.perf_counter()
+        for row in sample:
+            AppointmentForm(data=row).is_valid()
+        form_elapsed = time.perf_counter() - start
+
+        cleaner = AppointmentRowCleaner(allow_past=True)
+        start = time.perf_counter()
+        for row in sample:
+            cleaner.clean(row)
+        cleaner_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        call_command('import_appointments', path, '--allow-past',
+                     '--batch-size', str(args.batch_size))
+        import_elapsed = time.perf_counter() - start
+
+        print(f'Validating {len(sample)} rows')
+        print(f'{"form per row":<24} {form_elapsed:8.2f}s  {len(sample) / form_elapsed:10,.0f}/s')
+        print(f'{"row cleaner":<24} {cleaner_elapsed:8.2f}s  '
+              f'{len(sample) / cleaner_elapsed:10,.0f}/s')
+        print(f'Importing {args.count} rows')
+        print(f'{"import_appointments":<24} {import_elapsed:8.2f}s  '
+              f'{args.count / import_elapsed:10,.0f}/s')
+    finally:
+        os.unlink(path)
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare notification rendering: compiled templates vs the old f-strings.
+
+Renders the subject and text body of N notifications (no database needed):
+
+    python -m benchmarks.notification_templates --count 100000
+"""
+import argparse
+import time
+from datetime import date, time as dtime
+
+from benchmarks import setup
+
+
+def legacy_notification(appointment, action):
+    """The pre-template implementation: builds every action, keeps one."""
+    subjects = {
+        'created': f'New Appointment: {appointment.appointment_title}',
+        'updated': f'Appointment Updated: {appointment.appointment_title}',
+        'status_changed': f'Appointment Status Changed: {appointment.appointment_title}',
+    }
+
+    messages_content = {
+        'created': f'''
+Hello {appointment.first_name},
+
+Your appointment has been created successfully.
+
+Title: {appointment.appointment_title}
+Date: {appointment.date_field}
+Time: {appointment.time_field}
+Status: {appointment.get_status_display()}
+
+Thank you for using our Appointments App!
+        ''',
+        'updated': f'''
+Hello {appointment.first_name},
+
+Your appointment has been updated.
+
+Title: {appointment.appointment_title}
+Date: {appointment.date_field}
+Time: {appointment.time_field}
+Status: {appointment.get_status_display()}
+
+Thank you for using our Appointments App!
+        ''',
+        'status_changed': f'''
+Hello {appointment.first_name},
+
+The status of your appointment has been changed.
+
+Title: {appointment.appointment_title}
+New Status: {appointment.get_status_display()}
+
+Thank you for using our Appointments App!
+        ''',
+    }
+
+    return (
+        subjects.get(action, 'Appointment Notification'),
+        messages_content.get(action, ''),
+    )
+
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {elapsed:8.3f}s  {count / elapsed:12,.0f}/s')
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    setup()
+    from project_app.models import Appointment
+    from project_app.notifications import Notification
+
+    appointment = Appointment(
+        first_name='John', last_name='Doe', appointment_title='Annual Checkup',
+        date_field=date(2030, 1, 15), time_field=dtime(9, 30), status='confirmed',
+    )
+    actions = ['created', 'updated', 'status_changed']
+    items = [actions[i % 3] for i in range(args.count)]
+
+    def run_legacy():
+        for action in items:
+            legacy_notification(appointment, action)
+
+    def run_templates():
+        for action in items:
+            notification = Notification(appointment, action)
+            notification.subject, notification.body
+
+    def run_templates_html():
+        for action in items:
+            notification = Notification(appointment, action)
+            notification.subject, notification.body, notification.html_body
+
+    Notification(appointment, 'created').body  # compile outside the timing
+    print(f'Rendering {args.count} notifications')
+    timed('legacy f-strings', args.count, run_legacy)
+    timed('templates (text)', args.count, run_templates)
+    timed('templates (text + html)', args.count, run_templates_html)
+
+
+if __name__ == '__main__':
+    main()
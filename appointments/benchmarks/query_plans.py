@@ -0,0 +1,81 @@
+"""
+Show that the appointment list/calendar queries use the composite indexes.
+
+Seeds a throwaway database, then prints the query plan and timing of each
+access path used by the views and the admin:
+
+    python -m benchmarks.query_plans --rows 1000000 --owners 200
+"""
+import argparse
+import calendar
+import time
+from datetime import date, time as clock_time
+
+from benchmarks import create_database, setup
+
+
+def access_paths(owner, today):
+    """Return (name, queryset, expected index) for each view access path."""
+    from project_app.conflicts import conflict_candidates
+    from project_app.models import Appointment
+    from project_app.search import FTS_TABLE
+
+    month_end = date(today.year, today.month,
+                     calendar.monthrange(today.year, today.month)[1])
+    owned = Appointment.objects.filter(owner=owner)
+    return [
+        ('list', owned, 'appt_owner_date_time_idx'),
+        ('status filter', owned.filter(status='confirmed'),
+         'appt_owner_status_date_idx'),
+        ('date filter', owned.filter(date_field=today),
+         'appt_owner_date_time_idx'),
+        ('calendar month',
+         owned.filter(date_field__range=(today.replace(day=1), month_end)),
+         'appt_owner_date_time_idx'),
+        ('upcoming',
+         owned.filter(date_field__gte=today).exclude(status='cancelled'),
+         'appt_upcoming_idx'),
+        ('search', owned.search('smi'), FTS_TABLE),
+        ('conflict check', conflict_candidates(owner.pk, today, clock_time(10, 0), 30),
+         'appt_upcoming_idx'),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--owners', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.db import connection
+    from benchmarks.generator import generate_appointments
+
+    teardown = create_database()
+    try:
+        start = time.perf_counter()
+        owners = generate_appointments(args.rows, owners=args.owners, seed=args.seed)
+        print(f'Seeded {args.rows} appointments in {time.perf_counter() - start:.1f}s')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        # The first owner is the busiest one in the skewed distribution.
+        failures = 0
+        for name, queryset, index in access_paths(owners[0], date.today()):
+            plan = queryset.explain()
+            start = time.perf_counter()
+            rows = len(queryset[:100])
+            elapsed = (time.perf_counter() - start) * 1000
+            used = index in plan
+            failures += not used
+            print(f'\n== {name}: {rows} rows in {elapsed:.2f}ms, '
+                  f'uses {index}: {"yes" if used else "NO"}')
+            print(plan)
+        return 1 if failures else 0
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
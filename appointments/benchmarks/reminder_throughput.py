@@ -0,0 +1,63 @@
+"""
+Measure how many reminders the dispatcher claims and sends per second.
+
+Seeds N appointments whose reminders are all due, then drains them with
+``reminders.run`` over one in-memory mail connection, on a throwaway
+database:
+
+    python -m benchmarks.reminder_throughput --count 100000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks import create_database, setup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    setup()
+    from django.core.mail import get_connection
+    from django.test.utils import setup_test_environment
+    from django.utils import timezone
+
+    from benchmarks.generator import create_owners, iter_appointments
+    from project_app.models import Appointment, Reminder
+    from project_app.reminders import run
+
+    # The in-memory mail backend, so the numbers exclude SMTP round-trips
+    setup_test_environment()
+    teardown = create_database()
+    try:
+        owners = create_owners(10)
+        appointments = Appointment.objects.bulk_create(
+            iter_appointments(args.count, owners), batch_size=5000
+        )
+        due = timezone.now() - timedelta(minutes=1)
+        Reminder.objects.bulk_create(
+            (Reminder(appointment=a, lead_minutes=24 * 60, reminder_at=due) for a in appointments),
+            batch_size=5000,
+        )
+
+        sent = 0
+
+        def report(claimed, batch_sent, failed):
+            nonlocal sent
+            sent += batch_sent
+
+        start = time.perf_counter()
+        run(batch_size=args.batch_size, connection=get_connection(), once=True, report=report)
+        elapsed = time.perf_counter() - start
+
+        print(f'Sent {sent} reminders in {elapsed:.1f}s: {sent / elapsed:,.0f}/s, '
+              f'{sent / elapsed * 3600:,.0f}/hour (batch size {args.batch_size})')
+    finally:
+        teardown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Compare startup and request latency between settings profiles.
+
+Each profile runs in a fresh interpreter against its own throwaway
+database seeded with the same appointments. It reports the time to import
+and set up Django, the first request to each page (which compiles its
+templates) and the p50 of the following requests, through the full
+middleware stack:
+
+    DJANGO_SECRET_KEY=... DJANGO_CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache \\
+        python -m benchmarks.settings_profiles appointments.settings appointments.settings_production
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PAGES = ['index', 'view', 'calendar', 'appointmentsdetail']
+
+
+def profile(rows, iterations):
+    """Measure the current ``DJANGO_SETTINGS_MODULE``; return the results."""
+    start = time.perf_counter()
+    from benchmarks import create_database, setup
+    setup()
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    from benchmarks.generator import generate_appointments
+    from project_app.caching import get_cache
+    from project_app.models import Appointment
+
+    setup_test_environment()
+    teardown = create_database()
+    try:
+        generate_appointments(rows, owners=10, seed=0)
+        get_cache().clear()
+        owner = User.objects.filter(username__startswith='bench_owner_').order_by('pk').first()
+        detail_pk = Appointment.objects.filter(owner=owner).values_list('pk', flat=True).first()
+        client = Client()
+        client.force_login(owner)
+
+        results = {}
+        for page in PAGES:
+            url = reverse(page, args=[detail_pk] if page == 'appointmentsdetail' else [])
+            timings = []
+            for _ in range(iterations + 1):
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, (url, response.status_code)
+            results[page] = {
+                'first_ms': round(timings[0], 3),
+                'p50_ms': round(statistics.median(timings[1:]), 3),
+            }
+        return {
+            'debug': settings.DEBUG,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'session_engine': settings.SESSION_ENGINE,
+            'setup_ms': round(setup_ms, 3),
+            'pages': results,
+        }
+    finally:
+        teardown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('profiles', nargs='*',
+                        default=['appointments.settings', 'appointments.settings_production'],
+                        help='Settings modules to compare.')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(profile(args.rows, args.iterations)))
+        return 0
+
+    results = {}
+    for module in args.profiles:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.settings_profiles', '--child',
+             '--rows', str(args.rows), '--iterations', str(args.iterations)],
+            env=dict(os.environ, DJANGO_SETTINGS_MODULE=module),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[module] = json.loads(output.strip().splitlines()[-1])
+        result = results[module]
+        print(f'{module}: setup {result["setup_ms"]:.1f}ms', file=sys.stderr)
+        for page, timing in result['pages'].items():
+            print(f'  {page:<20} first {timing["first_ms"]:8.2f}ms  p50 {timing["p50_ms"]:8.2f}ms',
+                  file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
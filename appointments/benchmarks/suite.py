@@ -0,0 +1,330 @@
+"""
+Repeatable latency benchmarks of the appointment views.
+
+Seeds a throwaway database with generated appointments, then times each
+view through the test client as the busiest owner and reports p50/p99
+latency and query counts as JSON:
+
+    python -m benchmarks.suite --scale 1m --output run.json
+    python -m benchmarks.suite --scale 1m --compare run.json
+
+Large SQLite datasets can be kept on disk and reused between runs with
+``--database /tmp/bench.sqlite3 --keep``. The cache is cleared before
+every iteration, so each request measures the database work of a cold
+view (pass ``--warm-cache`` to measure cached views instead).
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from benchmarks import create_database, setup
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class Benchmarks:
+    """The benchmarked requests, as the busiest owner of a seeded dataset."""
+
+    def __init__(self, client, owner, today):
+        from django.db.models import Count
+        from project_app.models import Appointment
+
+        self.client = client
+        self.owner = owner
+        self.today = today
+        self.owned = Appointment.objects.filter(owner=owner)
+        # The owner's busiest day, so the date filter returns a full page
+        self.busy_day = (
+            self.owned.values('date_field').annotate(count=Count('id'))
+            .order_by('-count').values_list('date_field', flat=True).first()
+        )
+        self.detail_pk = self.owned.values_list('pk', flat=True).first()
+        self.status_pk = None
+        self.created = 0
+
+    def names(self):
+        return [name[len('bench_'):] for name in dir(self) if name.startswith('bench_')]
+
+    def prepare(self, name):
+        """Run the untimed ``prepare_<name>`` step of a benchmark, if it has one."""
+        prepare = getattr(self, f'prepare_{name}', None)
+        if prepare:
+            prepare()
+
+    def run(self, name):
+        return getattr(self, f'bench_{name}')()
+
+    def _get(self, url, params=None):
+        response = self.client.get(url, params)
+        assert response.status_code == 200, (url, response.status_code)
+        return response
+
+    def _revalidate(self, url, params=None):
+        """Conditional GET with the ETag of an earlier response, expecting a 304."""
+        key = (url, tuple(sorted((params or {}).items())))
+        etags = self.__dict__.setdefault('_etags', {})
+        if key not in etags:
+            self._get(url, params)  # sets the CSRF cookie, part of the ETag
+            etags[key] = self._get(url, params)['ETag']
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etags[key])
+        assert response.status_code == 304, (url, response.status_code)
+        return response
+
+    def bench_list(self):
+        from django.urls import reverse
+        return self._get(reverse('view'))
+
+    def bench_list_100_rows(self):
+        from django.test import override_settings
+        from django.urls import reverse
+        with override_settings(APPOINTMENTS_PER_PAGE=100):
+            return self._get(reverse('view'))
+
+    def bench_list_search(self):
+        from django.urls import reverse
+        return self._get(reverse('view'), {'search': 'smith'})
+
+    def bench_status_filter(self):
+        from django.urls import reverse
+        return self._get(reverse('view'), {'status': 'confirmed'})
+
+    def bench_date_filter(self):
+        from django.urls import reverse
+        return self._get(reverse('view'), {'date': str(self.busy_day)})
+
+    def bench_deep_pagination(self):
+        from django.conf import settings
+        from django.urls import reverse
+        per_page = getattr(settings, 'APPOINTMENTS_PER_PAGE', 10)
+        # 90% of the way through the owner's list
+        page = max(self.owned.count() * 9 // 10 // per_page, 1)
+        return self._get(reverse('view'), {'page': page})
+
+    def bench_deep_pagination_keyset(self):
+        from django.test import override_settings
+        from django.urls import reverse
+        from project_app.pagination import KeysetPaginator
+
+        if not hasattr(self, '_deep_cursor'):
+            paginator = KeysetPaginator(self.owned, 10)
+            offset = self.owned.count() * 9 // 10
+            position = self.owned.order_by(*paginator.ordering())[offset]
+            self._deep_cursor = paginator.make_cursor(position)
+        with override_settings(APPOINTMENTS_PAGINATION='keyset'):
+            return self._get(reverse('view'), {'cursor': self._deep_cursor})
+
+    def bench_calendar_month(self):
+        from django.urls import reverse
+        return self._get(reverse('calendar'),
+                         {'year': self.today.year, 'month': self.today.month})
+
+    def bench_list_not_modified(self):
+        from django.urls import reverse
+        return self._revalidate(reverse('view'))
+
+    def bench_calendar_not_modified(self):
+        from django.urls import reverse
+        return self._revalidate(reverse('calendar'),
+                                {'year': self.today.year, 'month': self.today.month})
+
+    def bench_detail(self):
+        from django.urls import reverse
+        return self._get(reverse('appointmentsdetail', args=[self.detail_pk]))
+
+    def bench_create(self):
+        from django.urls import reverse
+        self.created += 1
+        # A different far-future day each time, so the overlap check passes
+        day = self.today + timedelta(days=1000 + self.created)
+        response = self.client.post(reverse('post_new'), {
+            'first_name': 'Bench',
+            'last_name': 'Mark',
+            'email': 'bench@example.com',
+            'appointment_title': 'Benchmark visit',
+            'date_field': str(day),
+            'time_field': '10:00',
+            'duration_minutes': 30,
+            'status': 'pending',
+        })
+        assert response.status_code == 302, response.status_code
+        return response
+
+    def prepare_status_update(self):
+        from project_app.models import Appointment
+        self.created += 1
+        # A fresh pending appointment each time: confirming is an allowed move
+        self.status_pk = Appointment.objects.create(
+            owner=self.owner, first_name='Bench', last_name='Mark', email='bench@example.com',
+            appointment_title='Benchmark status', status='pending',
+            date_field=self.today + timedelta(days=1000 + self.created),
+        ).pk
+
+    def bench_status_update(self):
+        from django.urls import reverse
+        response = self.client.post(reverse('update_status', args=[self.status_pk]),
+                                    {'status': 'confirmed'})
+        assert response.status_code == 200, response.status_code
+        assert response.json()['changed'], response.json()
+        return response
+
+
+def measure(benchmarks, name, iterations, warmup, warm_cache):
+    """Run one benchmark; return its latency percentiles and query counts."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from project_app.caching import get_cache
+
+    timings, queries = [], []
+    for iteration in range(warmup + iterations):
+        benchmarks.prepare(name)
+        if not warm_cache:
+            get_cache().clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            benchmarks.run(name)
+            elapsed = time.perf_counter() - start
+        if iteration >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': max(queries),
+        'iterations': iterations,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print p50/p99 ratios against a baseline run; return the regressions."""
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if not before:
+            continue
+        ratios = {key: result[key] / max(before[key], 1e-9) for key in ('p50_ms', 'p99_ms')}
+        query_change = result['queries'] - before['queries']
+        regressed = ratios['p50_ms'] > threshold or query_change > 0
+        print(f'{name:<24} p50 x{ratios["p50_ms"]:5.2f}  p99 x{ratios["p99_ms"]:5.2f}  '
+              f'queries {before["queries"]:>3} -> {result["queries"]}'
+              f'{"  REGRESSED" if regressed else ""}', file=sys.stderr)
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', default='10k',
+                        help='Rows to seed: 10k, 100k, 1m, 10m or a number.')
+    parser.add_argument('--owners', type=int, default=None,
+                        help='Owners to spread rows over (default: about 1000 rows each).')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='Benchmarks to run.')
+    parser.add_argument('--warm-cache', action='store_true',
+                        help='Keep the cache between iterations.')
+    parser.add_argument('--database', help='Test database name (a file path for SQLite).')
+    parser.add_argument('--keep', action='store_true',
+                        help='Reuse a seeded --database and keep it afterwards.')
+    parser.add_argument('--output', '-o', help='Write the JSON results to this file.')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='Compare with a previous JSON run; exit 1 on regressions.')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='p50 slowdown ratio counted as a regression (default 1.2).')
+    args = parser.parse_args(argv)
+
+    setup()
+    import django
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from benchmarks.generator import default_owners, generate_appointments, parse_scale
+    from project_app.models import Appointment
+
+    rows = parse_scale(args.scale)
+    owners = args.owners or default_owners(rows)
+    setup_test_environment()
+    teardown = create_database(args.database, keepdb=args.keep)
+    try:
+        if Appointment.objects.exists():
+            print(f'Reusing {Appointment.objects.count()} seeded appointments', file=sys.stderr)
+        else:
+            start = time.perf_counter()
+
+            def progress(done):
+                if done % 500_000 < 5000:
+                    print(f'  {done:,} rows', file=sys.stderr)
+
+            generate_appointments(rows, owners=owners, seed=args.seed, progress=progress)
+            print(f'Seeded {rows:,} appointments for {owners} owners '
+                  f'in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+
+        # The first owner is the busiest one in the skewed distribution
+        owner = User.objects.filter(username__startswith='bench_owner_').order_by('pk').first()
+        client = Client()
+        client.force_login(owner)
+        benchmarks = Benchmarks(client, owner, date.today())
+        names = args.only or benchmarks.names()
+        unknown = set(names) - set(benchmarks.names())
+        if unknown:
+            parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+
+        results = {
+            'meta': {
+                'rows': Appointment.objects.count(),
+                'owners': User.objects.filter(username__startswith='bench_owner_').count(),
+                'owner_rows': benchmarks.owned.count(),
+                'seed': args.seed,
+                'iterations': args.iterations,
+                'warm_cache': args.warm_cache,
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            },
+            'benchmarks': {},
+        }
+        for name in names:
+            results['benchmarks'][name] = measure(
+                benchmarks, name, args.iterations, args.warmup, args.warm_cache
+            )
+            result = results['benchmarks'][name]
+            print(f'{name:<24} p50 {result["p50_ms"]:8.2f}ms  p99 {result["p99_ms"]:8.2f}ms  '
+                  f'{result["queries"]:3} queries', file=sys.stderr)
+    finally:
+        teardown()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
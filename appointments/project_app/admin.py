@@ -1,11 +1,74 @@
+from django import forms
 from django.contrib import admin
-from .models import Appointment
+from django.core.exceptions import ValidationError
+from .models import (
+    Appointment, OutboundEmail, OwnerStats, Recurrence, RecurrenceException, Reminder,
+    WorkingHours,
+)
+from .recurrence import clean_rule, series_start
+from .transitions import bulk_transition
+
+
+class RecurrenceInlineForm(forms.ModelForm):
+    """Recurrence form validating the rule like the site's form does."""
+
+    class Meta:
+        model = Recurrence
+        fields = ['rule']
+
+    def clean_rule(self):
+        appointment = self.instance.appointment
+        dtstart = series_start(appointment) if appointment.date_field else None
+        return clean_rule(self.cleaned_data['rule'], dtstart)
+
+
+class AppointmentAdminForm(forms.ModelForm):
+    """Appointment form moving the status like the site's form does."""
+
+    class Meta:
+        model = Appointment
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        status = cleaned_data.get('status')
+        if self.instance.pk and status and 'status' in self.changed_data:
+            try:
+                self.instance.check_transition(status)
+            except ValidationError as error:
+                self.add_error('status', error)
+        return cleaned_data
+
+
+def status_action(status, label):
+    """Return an admin action moving the selected appointments to ``status``."""
+    def action(modeladmin, request, queryset):
+        changed = bulk_transition(queryset, status)
+        modeladmin.message_user(
+            request, f'{len(changed)} of {queryset.count()} selected appointments marked {label.lower()}.'
+        )
+    action.__name__ = f'mark_{status}'
+    action.short_description = f'Mark selected appointments as {label.lower()}'
+    return action
+
+
+class RecurrenceInline(admin.StackedInline):
+    """The RRULE repeating an appointment, edited on the appointment."""
+
+    model = Recurrence
+    form = RecurrenceInlineForm
+    extra = 0
+    max_num = 1
 
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     """Admin interface for Appointment model."""
 
+    form = AppointmentAdminForm
+    inlines = [RecurrenceInline]
+    actions = [status_action(status, label) for status, label in Appointment.STATUS_CHOICES]
+
     list_display = [
         'appointment_title',
         'full_name',
@@ -35,7 +98,7 @@ class AppointmentAdmin(admin.ModelAdmin):
             'fields': ('appointment_title', 'appointment_description', 'status')
         }),
         ('Schedule', {
-            'fields': ('date_field', 'time_field')
+            'fields': ('date_field', 'time_field', 'duration_minutes')
         }),
         ('Location', {
             'fields': ('address', 'city', 'state', 'zip_code')
@@ -47,7 +110,83 @@ class AppointmentAdmin(admin.ModelAdmin):
     )
 
     readonly_fields = ['created_at', 'updated_at']
+    list_select_related = ['owner']
+    raw_id_fields = ['owner']
+
+    def get_queryset(self, request):
+        """Limit staff other than superusers to the appointments they may change."""
+        queryset = super().get_queryset(request)
+        if request.user.is_superuser:
+            return queryset
+        return queryset.for_user(request.user)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the same full-text backend as the list view."""
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
 
     def full_name(self, obj):
         return obj.full_name
     full_name.short_description = 'Name'
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """Admin interface for the notification outbox."""
+
+    list_display = [
+        'subject',
+        'recipient',
+        'action',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'sent_at'
+    ]
+    list_filter = ['status', 'action']
+    search_fields = ['recipient', 'subject']
+    raw_id_fields = ['appointment']
+    readonly_fields = ['created_at', 'sent_at']
+
+
+@admin.register(Reminder)
+class ReminderAdmin(admin.ModelAdmin):
+    """Admin interface for scheduled appointment reminders."""
+
+    list_display = ['appointment', 'lead_minutes', 'reminder_at', 'sent', 'sent_at']
+    list_filter = ['sent']
+    raw_id_fields = ['appointment']
+    readonly_fields = ['sent_at']
+
+
+@admin.register(RecurrenceException)
+class RecurrenceExceptionAdmin(admin.ModelAdmin):
+    """Admin interface for skipped and moved occurrences."""
+
+    list_display = ['recurrence', 'original_date', 'cancelled', 'date_field', 'time_field']
+    list_filter = ['cancelled']
+    raw_id_fields = ['recurrence']
+
+
+@admin.register(WorkingHours)
+class WorkingHoursAdmin(admin.ModelAdmin):
+    """Admin interface for owners' working hours."""
+
+    list_display = ['owner', 'weekday', 'start_time', 'end_time']
+    list_filter = ['weekday']
+    raw_id_fields = ['owner']
+
+
+@admin.register(OwnerStats)
+class OwnerStatsAdmin(admin.ModelAdmin):
+    """Read-only view of the per-owner counts maintained by ``stats.py``."""
+
+    list_display = ['owner', 'pending', 'confirmed', 'completed', 'cancelled', 'updated_at']
+    search_fields = ['owner__username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,300 @@
+"""
+JSON API for appointments.
+
+``GET /api/appointments/`` lists the user's appointments (same search,
+status and date filters as the HTML list, keyset-paginated).
+
+``GET /api/availability/`` returns an owner's next free slots.
+
+``POST /api/appointments/`` applies a batch in one transaction::
+
+    {
+        "create": [{"first_name": "Jane", ...}, ...],
+        "update": [{"id": 12, "status": "confirmed"}, ...],
+        "delete": [13, 14],
+        "atomic": false
+    }
+
+Every item is validated with the ``AppointmentForm`` rules; updates are
+partial. Creates and moved appointments must not overlap the user's other
+bookings, including ones earlier in the same batch. Valid items are written
+with ``bulk_create``/``bulk_update`` and one ``DELETE``; invalid ones are
+reported per item. With ``"atomic": true`` nothing is written unless every
+item is valid.
+"""
+import json
+from collections import Counter
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.forms.models import model_to_dict
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from .availability import next_free_slots
+from .caching import bump_version
+from .changefeed import publish_reload
+from .conflicts import SCHEDULE_FIELDS, interval, load_schedules, max_duration
+from .forms import AppointmentForm
+from .models import Appointment
+from .notifications import queue_notifications
+from .pagination import KeysetPaginator
+from .reminders import sync_reminders
+from .stats import apply_deltas, stats_key
+
+API_FIELDS = ['id'] + AppointmentForm.Meta.fields + ['owner', 'created_at', 'updated_at']
+
+
+def api_login_required(view_func):
+    """Like ``login_required``, but answers 401 JSON instead of redirecting."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def appointment_to_dict(appointment):
+    """Serialize an appointment for the API."""
+    data = {field: getattr(appointment, field) for field in API_FIELDS if field != 'owner'}
+    data['owner'] = appointment.owner_id
+    return data
+
+
+def _validate_creates(items, user):
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        form = AppointmentForm(data=item if isinstance(item, dict) else {})
+        if form.is_valid():
+            appointment = form.save(commit=False)
+            appointment.owner = user
+            valid.append((index, appointment))
+        else:
+            errors.append({'op': 'create', 'index': index, 'errors': form.errors.get_json_data()})
+    return valid, errors
+
+
+def _is_id(value):
+    # JSON ids must be integers; true and false are not ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _validate_updates(items, user):
+    valid, errors = [], []
+    ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+    existing = Appointment.objects.for_user(user).in_bulk([pk for pk in ids if _is_id(pk)])
+    changed, changed_fields, moved = [], set(), []
+    for index, (item, pk) in enumerate(zip(items, ids)):
+        if not _is_id(pk):
+            errors.append({'op': 'update', 'index': index, 'errors': {'id': 'Must be an integer.'}})
+            continue
+        appointment = existing.get(pk)
+        if appointment is None:
+            errors.append({'op': 'update', 'index': index, 'errors': {'id': 'Not found.'}})
+            continue
+        # Partial update: unspecified fields keep their current values
+        data = model_to_dict(appointment, fields=AppointmentForm.Meta.fields)
+        data.update({k: v for k, v in item.items() if k in AppointmentForm.Meta.fields})
+        form = AppointmentForm(data=data, instance=appointment)
+        if form.is_valid():
+            valid.append((index, form.save(commit=False)))
+            if form.has_changed():
+                changed.append(appointment)
+                changed_fields.update(form.changed_data)
+                if appointment.owner_id == user.pk and SCHEDULE_FIELDS & set(form.changed_data):
+                    moved.append((index, appointment))
+        else:
+            errors.append({'op': 'update', 'index': index, 'errors': form.errors.get_json_data()})
+    return valid, errors, changed, changed_fields, moved
+
+
+def _validate_deletes(ids, user):
+    found = set(Appointment.objects.for_user(user).filter(
+        pk__in=[pk for pk in ids if _is_id(pk)]
+    ).values_list('pk', flat=True))
+    errors = []
+    for index, pk in enumerate(ids):
+        if not _is_id(pk):
+            errors.append({'op': 'delete', 'index': index, 'errors': {'id': 'Must be an integer.'}})
+        elif pk not in found:
+            errors.append({'op': 'delete', 'index': index, 'errors': {'id': 'Not found.'}})
+    return sorted(found), errors
+
+
+def _check_conflicts(user, to_create, moved, deleted):
+    """
+    Return the ``(op, index)`` of items overlapping another booking, and errors.
+
+    The user's bookings on the affected days are loaded once into sorted
+    ``DaySchedule``s, without the moved and deleted ones; moved appointments
+    are then checked and placed first, then creates.
+    """
+    items = [('update', i, a) for i, a in moved] + [('create', i, a) for i, a in to_create]
+    items = [
+        item for item in items
+        if item[2].date_field and item[2].time_field and item[2].status != 'cancelled'
+    ]
+    schedules = load_schedules(
+        user.pk, {a.date_field for _, _, a in items},
+        exclude_pks=[a.pk for _, a in moved] + deleted,
+    )
+    rejected, errors = set(), []
+    for op, index, appointment in items:
+        start, end = interval(appointment.time_field, appointment.duration_minutes)
+        schedule = schedules[appointment.date_field]
+        if schedule.overlapping(start, end):
+            rejected.add((op, index))
+            errors.append({'op': op, 'index': index,
+                           'errors': {'__all__': ['Overlaps another appointment.']}})
+        else:
+            schedule.add(start, end, (op, index))
+    return rejected, errors
+
+
+def _list(request):
+    queryset = Appointment.objects.filter(owner=request.user).list_filter(
+        search=request.GET.get('search', ''),
+        status=request.GET.get('status', ''),
+        date=request.GET.get('date', ''),
+    )
+    try:
+        limit = min(int(request.GET.get('limit', 100)), 1000)
+    except ValueError:
+        limit = 100
+    page = KeysetPaginator(queryset, max(limit, 1)).get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [appointment_to_dict(a) for a in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def _batch(request):
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+
+    creates = payload.get('create') or []
+    updates = payload.get('update') or []
+    deletes = payload.get('delete') or []
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        return JsonResponse({'error': 'create, update and delete must be lists'}, status=400)
+    max_batch = getattr(settings, 'APPOINTMENTS_API_MAX_BATCH', 1000)
+    if len(creates) + len(updates) + len(deletes) > max_batch:
+        return JsonResponse({'error': f'At most {max_batch} items per request'}, status=400)
+
+    to_create, errors = _validate_creates(creates, request.user)
+    to_update, update_errors, changed, changed_fields, moved = _validate_updates(
+        updates, request.user
+    )
+    to_delete, delete_errors = _validate_deletes(deletes, request.user)
+    errors += update_errors + delete_errors
+
+    moved = [(i, a) for i, a in moved if a.pk not in to_delete]
+    rejected, conflict_errors = _check_conflicts(request.user, to_create, moved, to_delete)
+    if rejected:
+        errors += conflict_errors
+        to_create = [(i, a) for i, a in to_create if ('create', i) not in rejected]
+        rejected_pks = {a.pk for i, a in moved if ('update', i) in rejected}
+        to_update = [(i, a) for i, a in to_update if a.pk not in rejected_pks]
+        changed = [a for a in changed if a.pk not in rejected_pks]
+
+    if errors and payload.get('atomic'):
+        return JsonResponse({'created': [], 'updated': [], 'deleted': [], 'errors': errors},
+                            status=400)
+
+    created = [a for _, a in to_create]
+    # bulk_create() and bulk_update() bypass the signals maintaining the dashboard
+    stats_deltas = Counter(stats_key(a) for a in created)
+    for appointment in changed:
+        stats_deltas[appointment._stored_stats_key] -= 1
+        stats_deltas[stats_key(appointment)] += 1
+    with transaction.atomic():
+        Appointment.objects.bulk_create(created)
+        apply_deltas(stats_deltas)
+        if changed:
+            # bulk_update() does not apply auto_now
+            now = timezone.now()
+            for appointment in changed:
+                appointment.updated_at = now
+            Appointment.objects.bulk_update(changed, sorted(changed_fields) + ['updated_at'])
+        if to_delete:
+            Appointment.objects.filter(pk__in=to_delete).delete()
+        queue_notifications(created, 'created')
+        queue_notifications(changed, 'updated')
+        sync_reminders(created + changed)
+        if created or changed:
+            publish_reload({a.owner_id for a in created + changed})
+    # Bulk writes bypass the post_save signal
+    bump_version(request.user.pk, *{a.owner_id for a in changed})
+
+    return JsonResponse({
+        'created': [{'index': i, 'id': a.pk} for i, a in to_create],
+        'updated': [{'index': i, 'id': a.pk} for i, a in to_update],
+        'deleted': to_delete,
+        'errors': errors,
+    }, status=207 if errors else 200)
+
+
+@api_login_required
+@require_http_methods(['GET', 'POST'])
+def appointments_api(request):
+    """List appointments (GET) or apply a create/update/delete batch (POST)."""
+    if request.method == 'GET':
+        return _list(request)
+    return _batch(request)
+
+
+@api_login_required
+@require_http_methods(['GET'])
+def appointment_api_detail(request, pk):
+    """Return one appointment as JSON."""
+    appointment = Appointment.objects.for_user(request.user).filter(pk=pk).first()
+    if appointment is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return JsonResponse(appointment_to_dict(appointment))
+
+
+def _clock(seconds):
+    # 24:00 is a valid end of day
+    return f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}'
+
+
+@api_login_required
+@require_http_methods(['GET'])
+def availability_api(request):
+    """
+    Return the next free slots of an owner (default: the current user).
+
+    Query parameters: ``owner`` (user id), ``duration`` (minutes),
+    ``count`` (at most 100) and ``from`` (YYYY-MM-DD).
+    """
+    try:
+        owner_id = int(request.GET.get('owner', request.user.pk))
+        duration = int(request.GET.get('duration', 30))
+        count = min(int(request.GET.get('count', 10)), 100)
+        start_date = date.fromisoformat(request.GET['from']) if 'from' in request.GET else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+    if not 1 <= duration <= max_duration() or count < 1:
+        return JsonResponse({'error': 'Invalid duration or count'}, status=400)
+    if owner_id != request.user.pk and not get_user_model().objects.filter(pk=owner_id).exists():
+        return JsonResponse({'error': 'Not found'}, status=404)
+
+    slots = next_free_slots(owner_id, duration, count, start_date=start_date)
+    return JsonResponse({
+        'owner': owner_id,
+        'duration': duration,
+        'slots': [
+            {'date': day, 'start': _clock(start), 'end': _clock(end)}
+            for day, start, end in slots
+        ],
+    })
@@ -0,0 +1,173 @@
+"""
+Async versions of the list, export, calendar, detail and status views and
+the change feed.
+
+``urls.py`` serves these instead of their sync counterparts in ``views.py``
+when ``APPOINTMENTS_ASYNC_VIEWS`` is set, as ``asgi.py`` does, so a request
+waiting on the database leaves the event loop free for others.
+
+Queries go through the async ORM (``acount``, ``aget``, ``afirst``,
+``asave`` and async iteration). Work with no async equivalent runs in a
+thread with ``sync_to_async``: loading the session and user, keyset
+pagination, recurrence expansion, the calendar month data and rendering
+the cached fragments. Pages are returned as ``TemplateResponse`` objects,
+which the handler renders in a thread after the view returns.
+
+Status change emails always go through the outbox (``queue_notifications``)
+and are delivered by ``manage.py send_notifications``, so no SMTP call is
+made during the request.
+
+The change feed has no sync version (see ``changefeed.py``).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.template.response import TemplateResponse
+
+from .calendar_data import cached_month_data
+from .changefeed import astream, subscribe
+from .conditional import conditional_page, detail_etag, detail_last_modified, list_etag
+from .export import aexport_lines
+from .models import Appointment, Recurrence
+from .notifications import queue_notifications
+from .pagination import aget_page
+from .views import (
+    calendar_context, calendar_params, day_occurrences, detail_context,
+    export_params, export_response, list_context, list_filters, list_paginator, row_fragments,
+)
+
+
+async def _user(request):
+    """Return ``request.user``, loading the session and user in a thread."""
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+async def _appointment(pk):
+    try:
+        return await Appointment.objects.aget(pk=pk)
+    except Appointment.DoesNotExist:
+        raise Http404('No appointment matches the given query.')
+
+
+async def _editable_appointment(user, pk):
+    """Async version of ``views.editable_appointment``."""
+    appointment = await Appointment.objects.for_user(user).filter(pk=pk).afirst()
+    if appointment is None:
+        if not await Appointment.objects.filter(pk=pk).aexists():
+            raise Http404('No appointment matches the given query.')
+        return None
+    if appointment.owner_id is not None:
+        appointment.owner = user
+    return appointment
+
+
+# List all appointments with search, filter, and pagination
+@conditional_page(list_etag)
+async def view(request):
+    """Async version of ``views.view``."""
+    user = await _user(request)
+    if user.is_authenticated:
+        appointments_list = Appointment.objects.filter(owner=user)
+    else:
+        appointments_list = Appointment.objects.all()
+
+    filters = list_filters(request)
+    if filters['date']:
+        occurrences_list = await sync_to_async(day_occurrences)(appointments_list, filters)
+    else:
+        occurrences_list = []
+    appointments_list = appointments_list.list_filter(**filters)
+
+    paginator, cursor_pagination = list_paginator(appointments_list)
+    if cursor_pagination:
+        page_obj = await sync_to_async(paginator.get_page)(request.GET.get('cursor'))
+    else:
+        page_obj = await aget_page(paginator, request.GET.get('page'))
+
+    rows = await sync_to_async(row_fragments)(list(page_obj), user.is_authenticated)
+    context = list_context(page_obj, rows, cursor_pagination, occurrences_list, filters)
+    return TemplateResponse(request, 'appointment_files/view.html', context)
+
+
+# Export the (filtered) appointment list
+async def export(request):
+    """Async version of ``views.export``; the rows are streamed, not buffered."""
+    user = await _user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    appointments, export_format = export_params(request, user)
+    return export_response(aexport_lines(appointments, export_format), export_format)
+
+
+# Appointment Detail View
+@conditional_page(detail_etag, detail_last_modified)
+async def appointment_detail(request, pk):
+    """Async version of ``views.AppointmentDetailView``."""
+    appointment = await _appointment(pk)
+    recurrence = await Recurrence.objects.filter(appointment=appointment).afirst()
+    context = {'object': appointment, 'appointments': appointment}
+    context.update(await sync_to_async(detail_context)(request, appointment, recurrence))
+    return TemplateResponse(request, 'appointment_files/view_appointment.html', context)
+
+
+# Update appointment status
+async def update_status(request, pk):
+    """Async version of ``views.update_status``; the email is queued in the outbox."""
+    user = await _user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if request.method == "POST":
+        appointment = await _editable_appointment(user, pk)
+        if appointment is None:
+            return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+
+        new_status = request.POST.get('status')
+        if new_status in dict(Appointment.STATUS_CHOICES):
+            try:
+                changed = await appointment.atransition_to(new_status)
+            except ValidationError as e:
+                return JsonResponse({'success': False, 'error': e.messages[0]}, status=409)
+            if changed:
+                await sync_to_async(queue_notifications)([appointment], 'status_changed')
+            return JsonResponse({'success': True, 'status': appointment.get_status_display(),
+                                 'changed': changed})
+
+    return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+
+# Calendar View
+@conditional_page(list_etag)
+async def calendar_view(request):
+    """Async version of ``views.calendar_view``."""
+    user = await _user(request)
+    year, month = calendar_params(request)
+    if user.is_authenticated:
+        owner_id = user.pk
+        appointments = Appointment.objects.filter(owner_id=owner_id)
+    else:
+        owner_id = None
+        appointments = Appointment.objects.all()
+    calendar_month = await sync_to_async(cached_month_data)(appointments, owner_id, year, month)
+    return TemplateResponse(request, 'appointment_files/calendar.html',
+                            calendar_context(year, month, calendar_month))
+
+
+# Live appointment changes for the list and calendar pages
+async def change_feed(request):
+    """
+    Stream the changes to the appointments the list and calendar show.
+
+    Only served with the async views: an open stream waits on an
+    ``asyncio.Queue`` and holds no thread.
+    """
+    await _user(request)
+    response = StreamingHttpResponse(astream(subscribe(request, asyncio.get_running_loop())),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
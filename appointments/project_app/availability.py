@@ -0,0 +1,147 @@
+"""
+Free-slot search over owners' working hours and appointments.
+
+An owner's free time on a day is their working hours minus the intervals
+occupied by their appointments (see ``conflicts.py``), including occurrences
+of recurring series. Both lists are sorted
+by start, so ``subtract`` produces the free intervals in one merge pass.
+
+Free intervals are cached per owner and day under the owner's cache version,
+so saving an appointment or working hours invalidates them.
+``next_free_slots`` walks forward from a date a week at a time, computing
+all uncached days of the week with one query, and cuts the free intervals
+into bookable slots.
+"""
+from datetime import time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .caching import get_cache, versioned_keys
+from .conflicts import interval, occupying, to_seconds
+from .models import Appointment, WorkingHours
+from .recurrence import occurrences
+
+# Days computed (and cached) per query while searching forward
+CHUNK_DAYS = 7
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def working_hours(owner_id):
+    """Return ``{weekday: [(start, end), ...]}`` in seconds of day, sorted."""
+    hours = {}
+    rows = WorkingHours.objects.filter(owner_id=owner_id).values_list(
+        'weekday', 'start_time', 'end_time'
+    )
+    for weekday, start, end in rows:
+        hours.setdefault(weekday, []).append((to_seconds(start), to_seconds(end)))
+    if not hours:
+        default = _setting('APPOINTMENTS_DEFAULT_WORKING_HOURS', {})
+        for weekday, periods in default.items():
+            hours[weekday] = [
+                (to_seconds(time.fromisoformat(start)), to_seconds(time.fromisoformat(end)))
+                for start, end in periods
+            ]
+    return {weekday: sorted(periods) for weekday, periods in hours.items()}
+
+
+def busy_intervals(owner_id, days):
+    """Return ``{day: [(start, end), ...]}`` of occupied time, sorted by start."""
+    busy = {day: [] for day in days}
+    owned = occupying(Appointment.objects.filter(owner_id=owner_id))
+    rows = owned.filter(date_field__in=days).order_by('date_field', 'time_field').values_list(
+        'date_field', 'time_field', 'duration_minutes'
+    )
+    for day, start_time, duration_minutes in rows:
+        busy[day].append(interval(start_time, duration_minutes))
+    recurring = [o for o in occurrences(owned, min(days), max(days)) if o.date_field in busy]
+    for occurrence in recurring:
+        busy[occurrence.date_field].append(
+            interval(occurrence.time_field, occurrence.duration_minutes)
+        )
+    for day in {occurrence.date_field for occurrence in recurring}:
+        busy[day].sort()
+    return busy
+
+
+def subtract(periods, busy):
+    """
+    Return the parts of ``periods`` not covered by ``busy``.
+
+    Both are lists of ``(start, end)`` sorted by start; ``busy`` intervals
+    may overlap each other. Runs in one pass over both lists.
+    """
+    free = []
+    first = 0
+    for period_start, period_end in periods:
+        cursor = period_start
+        # Busy intervals ending before this period can't matter again
+        while first < len(busy) and busy[first][1] <= cursor:
+            first += 1
+        index = first
+        while index < len(busy) and busy[index][0] < period_end:
+            busy_start, busy_end = busy[index]
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            index += 1
+        if cursor < period_end:
+            free.append((cursor, period_end))
+    return free
+
+
+def free_intervals(owner_id, days):
+    """Return ``{day: [(start, end), ...]}`` of free time, through the cache."""
+    cache = get_cache()
+    keys = dict(zip(days, versioned_keys(
+        'availability', owner_id, [(day.isoformat(),) for day in days]
+    )))
+    cached = cache.get_many(list(keys.values()))
+    free = {day: cached[key] for day, key in keys.items() if key in cached}
+    missing = [day for day in days if day not in free]
+    if missing:
+        hours = working_hours(owner_id)
+        busy = busy_intervals(owner_id, missing)
+        computed = {day: subtract(hours.get(day.weekday(), []), busy[day]) for day in missing}
+        cache.set_many(
+            {keys[day]: intervals for day, intervals in computed.items()},
+            _setting('APPOINTMENTS_AVAILABILITY_CACHE_TIMEOUT', 3600),
+        )
+        free.update(computed)
+    return free
+
+
+def next_free_slots(owner_id, duration_minutes, count, start_date=None, now=None):
+    """
+    Return up to ``count`` free ``(date, start, end)`` slots, in seconds of day.
+
+    Slots start on ``APPOINTMENTS_SLOT_STEP`` minute boundaries from
+    ``start_date`` (today at the earliest, and not before the current time
+    today), up to ``APPOINTMENTS_AVAILABILITY_HORIZON`` days ahead.
+    """
+    now = now or timezone.localtime()
+    step = _setting('APPOINTMENTS_SLOT_STEP', 15) * 60
+    length = duration_minutes * 60
+    last_day = now.date() + timedelta(days=_setting('APPOINTMENTS_AVAILABILITY_HORIZON', 60))
+    day = max(start_date or now.date(), now.date())
+
+    slots = []
+    while day <= last_day:
+        days = [day + timedelta(days=offset) for offset in range(CHUNK_DAYS)
+                if day + timedelta(days=offset) <= last_day]
+        free = free_intervals(owner_id, days)
+        for current in days:
+            earliest = to_seconds(now.time()) if current == now.date() else 0
+            for start, end in free[current]:
+                start = max(start, earliest)
+                start += -start % step
+                while start + length <= end:
+                    slots.append((current, start, start + length))
+                    if len(slots) >= count:
+                        return slots
+                    start += step
+        day = days[-1] + timedelta(days=1)
+    return slots
@@ -0,0 +1,63 @@
+"""
+Versioned per-owner caching of derived appointment data.
+
+Every owner has a version number in the cache; cache keys for data derived
+from that owner's appointments embed it. Saving or deleting an appointment
+bumps the version (see ``signals.py``), so stale entries are never read
+again and simply expire. The ``all`` scope covers pages shown to anonymous
+users, which list every owner's appointments, and is bumped on any change.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+ALL_OWNERS = 'all'
+
+
+def get_cache():
+    """Return the cache used for appointment data."""
+    return caches[getattr(settings, 'APPOINTMENTS_CACHE', 'default')]
+
+
+def _version_key(scope):
+    return f'appointments:version:{scope}'
+
+
+def get_version(owner_id=None):
+    """Return the current cache version for an owner (or all owners)."""
+    cache = get_cache()
+    key = _version_key(owner_id or ALL_OWNERS)
+    version = cache.get(key)
+    if version is None:
+        # A version lost to eviction restarts from the clock rather than
+        # from 1, so it can never match keys written before the loss.
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(*owner_ids):
+    """Invalidate cached data for the given owners and the ``all`` scope."""
+    cache = get_cache()
+    for scope in {owner_id or ALL_OWNERS for owner_id in owner_ids} | {ALL_OWNERS}:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), time.time_ns(), None)
+
+
+def versioned_key(prefix, owner_id, *parts):
+    """Return a cache key for owner data that changes with its version."""
+    return versioned_keys(prefix, owner_id, [parts])[0]
+
+
+def versioned_keys(prefix, owner_id, parts_list):
+    """Return ``versioned_key`` for each tuple of parts, reading the version once."""
+    scope = owner_id or ALL_OWNERS
+    version = get_version(owner_id)
+    return [
+        f'appointments:{prefix}:{scope}:v{version}:' + ':'.join(str(part) for part in parts)
+        for parts in parts_list
+    ]
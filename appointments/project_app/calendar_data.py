@@ -0,0 +1,119 @@
+"""
+Month data for the calendar view.
+
+``month_data`` reads only the columns a calendar cell shows, groups the
+appointments per day in a single pass and lays them out as a grid of weeks,
+so the template renders each cell from its own list instead of scanning
+every appointment of the month per day.
+
+Recurring series are expanded for the displayed month only; their
+generated occurrences are merged into the day cells with ``recurring`` set.
+
+Very dense months switch to a count-only mode: one GROUP BY query returns
+the number of appointments per day and cells link to the filtered list.
+
+``cached_month_data`` serves months from the cache, keyed by owner, year and
+month under the owner's cache version, so repeat views and prev/next
+navigation do no database work until an appointment changes.
+"""
+import calendar
+from datetime import date, time
+
+from django.conf import settings
+from django.db.models import Count
+
+from .caching import get_cache, versioned_key
+from .recurrence import occurrences
+
+# Columns rendered in a calendar cell
+CALENDAR_FIELDS = ['id', 'appointment_title', 'status', 'date_field', 'time_field']
+
+
+def month_range(year, month):
+    """Return the first and last date of a month."""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _grid(year, month, by_day, counts):
+    cal = calendar.Calendar(firstweekday=6)  # Sunday start
+    return [
+        [
+            {
+                'day': day,
+                'appointments': by_day.get(day, []),
+                'count': counts.get(day, 0),
+            }
+            for day in week
+        ]
+        for week in cal.monthdayscalendar(year, month)
+    ]
+
+
+def month_data(queryset, year, month, max_appointments=None):
+    """
+    Return the calendar data for ``queryset`` in the given month.
+
+    The result is a plain dict (safe to cache) with ``weeks``, a list of
+    weeks of cells (``day`` is 0 for padding cells), ``by_day``, ``total``
+    and ``counts_only``. When the month holds more than
+    ``max_appointments`` appointments, cells carry only their ``count``.
+    """
+    if max_appointments is None:
+        max_appointments = getattr(settings, 'APPOINTMENTS_CALENDAR_MAX_APPOINTMENTS', 500)
+    first, last = month_range(year, month)
+    appointments = queryset.filter(date_field__range=(first, last))
+
+    rows = list(
+        appointments.order_by('date_field', 'time_field', 'id')
+        .values(*CALENDAR_FIELDS)[:max_appointments + 1]
+    )
+    generated = [
+        {field: getattr(occurrence, field) for field in CALENDAR_FIELDS}
+        | {'recurring': True}
+        for occurrence in occurrences(queryset, first, last)
+    ]
+    counts_only = len(rows) + len(generated) > max_appointments
+
+    by_day = {}
+    counts = {}
+    if counts_only:
+        for row in appointments.order_by().values('date_field').annotate(count=Count('id')):
+            counts[row['date_field'].day] = row['count']
+        for row in generated:
+            day = row['date_field'].day
+            counts[day] = counts.get(day, 0) + 1
+    else:
+        for row in rows:
+            day = row['date_field'].day
+            by_day.setdefault(day, []).append(row)
+        for row in generated:
+            day = row['date_field'].day
+            by_day.setdefault(day, []).append(row)
+        # Same order as the query: by time, untimed first
+        for day in {row['date_field'].day for row in generated}:
+            by_day[day].sort(key=lambda row: (row['time_field'] is not None,
+                                              row['time_field'] or time(), row['id']))
+        counts = {day: len(items) for day, items in by_day.items()}
+
+    return {
+        'weeks': _grid(year, month, by_day, counts),
+        'by_day': by_day,
+        'total': sum(counts.values()),
+        'counts_only': counts_only,
+    }
+
+
+def cached_month_data(queryset, owner_id, year, month):
+    """
+    ``month_data`` through the cache.
+
+    ``queryset`` must hold exactly the appointments of ``owner_id`` (or of
+    every owner when it is None), as the owner determines the cache key.
+    """
+    cache = get_cache()
+    key = versioned_key('calendar', owner_id, year, month)
+    data = cache.get(key)
+    if data is None:
+        data = month_data(queryset, year, month)
+        cache.set(key, data, getattr(settings, 'APPOINTMENTS_CALENDAR_CACHE_TIMEOUT', 3600))
+    return data
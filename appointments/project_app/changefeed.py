@@ -0,0 +1,239 @@
+"""
+Live appointment changes, streamed to open pages as server-sent events.
+
+Saving or deleting an appointment publishes, once the transaction
+commits, a small ``appointment`` event with the fields the list and
+calendar show (see ``signals.py``). Bulk writes, which bypass the signals,
+publish a ``reload`` event for the owners involved instead. The events go
+to the owner's scope and to the ``all`` scope of anonymous pages, as in
+``caching.py``.
+
+``broker`` is in-process: each worker process streams the changes made by
+its own requests and commands, so run the feed on a single ASGI process
+(or put a shared pub/sub behind ``Broker.publish``) when pages are served
+by several. It keeps the last ``HISTORY`` events, so a reconnecting
+``EventSource`` (which sends ``Last-Event-ID``) receives what it missed, or
+a ``reload`` event when that is no longer known.
+
+The feed is only served, and the list and calendar pages only subscribe
+to it, with the async views (``APPOINTMENTS_ASYNC_VIEWS``): an open stream
+lasts up to ``APPOINTMENTS_CHANGEFEED_MAX_SECONDS`` and would hold a
+worker thread of a WSGI server for that long. The pages patch the changed
+rows and cells in place (``_change_feed.html``) and only offer a reload
+for changes they cannot place, such as a new appointment or a new date.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import ALL_OWNERS
+
+# Fields sent with each appointment event
+FEED_FIELDS = ['id', 'appointment_title', 'first_name', 'last_name', 'status',
+               'date_field', 'time_field']
+# Events kept for reconnecting clients
+HISTORY = 1000
+# Events queued for a client not reading them before it is sent a reload
+QUEUE_SIZE = 500
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Event:
+    """One published change."""
+
+    def __init__(self, event_id, scopes, name, data):
+        self.id = event_id
+        self.scopes = scopes
+        self.name = name
+        self.data = data
+
+    def encode(self):
+        """Return the event in the ``text/event-stream`` format."""
+        event_id = '' if self.id is None else f'id: {self.id}\n'
+        return f'{event_id}event: {self.name}\ndata: {json.dumps(self.data)}\n\n'
+
+
+class Subscription:
+    """
+    The queue of events of one open stream.
+
+    Streams served by async views pass their event loop, and events
+    published from other threads are handed over with
+    ``call_soon_threadsafe``.
+    """
+
+    def __init__(self, scope, loop=None):
+        self.scope = scope
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE) if loop else queue.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except (asyncio.QueueFull, queue.Full):
+            self.overflowed = True
+
+    def put(self, event):
+        if self.loop is None:
+            self._put(event)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass  # Event loop closed; the stream is gone
+
+    def get(self, timeout):
+        """Return the next event, or None after ``timeout`` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout):
+        """Async ``get``."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """In-process publish/subscribe of appointment events, by scope."""
+
+    def __init__(self, history=HISTORY):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._history = deque(maxlen=history)
+        # Ids start from the clock, so ids of an earlier process are older
+        self._ids = itertools.count(time.time_ns() // 1000)
+
+    def publish(self, scopes, name, data):
+        """Send an event to the subscriptions of ``scopes``."""
+        with self._lock:
+            event = Event(next(self._ids), frozenset(scopes), name, data)
+            self._history.append(event)
+            subscriptions = [s for s in self._subscriptions if s.scope in event.scopes]
+        for subscription in subscriptions:
+            subscription.put(event)
+        return event
+
+    def subscribe(self, scope, last_event_id=None, loop=None):
+        """
+        Open a subscription to ``scope``.
+
+        With ``last_event_id``, the events published since are queued
+        first, or a ``reload`` event if they are no longer all known.
+        """
+        subscription = Subscription(scope, loop)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if last_event_id is None:
+                return subscription
+            known = self._history and self._history[0].id <= last_event_id + 1
+            if not known or last_event_id > self._history[-1].id:
+                subscription.queue.put_nowait(Event(None, {scope}, 'reload', {}))
+                return subscription
+            for event in self._history:
+                if event.id > last_event_id and scope in event.scopes:
+                    subscription._put(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscribers(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+broker = Broker()
+
+
+def _scopes(owner_ids):
+    return {owner_id or ALL_OWNERS for owner_id in owner_ids} | {ALL_OWNERS}
+
+
+def appointment_data(appointment, deleted=False):
+    """Return the event data of a saved or deleted appointment."""
+    data = {}
+    for name in FEED_FIELDS:
+        value = getattr(appointment, name)
+        data[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    data['status_display'] = appointment.get_status_display()
+    data['deleted'] = deleted
+    return data
+
+
+def publish_appointment(appointment, deleted=False):
+    """Publish an appointment's change once the current transaction commits."""
+    scopes = _scopes([appointment.owner_id])
+    data = appointment_data(appointment, deleted)
+    transaction.on_commit(lambda: broker.publish(scopes, 'appointment', data))
+
+
+def publish_reload(owner_ids):
+    """Ask the owners' open pages to reload, after a bulk write commits."""
+    scopes = _scopes(owner_ids)
+    transaction.on_commit(lambda: broker.publish(scopes, 'reload', {}))
+
+
+def subscribe(request, loop=None):
+    """
+    Subscribe to the changes shown to ``request.user``, resuming after the
+    ``Last-Event-ID`` a reconnecting client sends.
+    """
+    scope = request.user.pk if request.user.is_authenticated else ALL_OWNERS
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    return broker.subscribe(scope, last_event_id, loop)
+
+
+def _stream_settings():
+    return (_setting('APPOINTMENTS_CHANGEFEED_HEARTBEAT', 15),
+            _setting('APPOINTMENTS_CHANGEFEED_MAX_SECONDS', 300))
+
+
+def _next_chunk(subscription, event):
+    if subscription.overflowed:
+        # The client fell behind: drop the backlog and have it reload
+        subscription.overflowed = False
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        return Event(None, {subscription.scope}, 'reload', {}).encode()
+    if event is None:
+        return ': keepalive\n\n'
+    return event.encode()
+
+
+async def astream(subscription):
+    """
+    Yield a subscription's events as ``text/event-stream`` chunks.
+
+    A comment is sent every ``APPOINTMENTS_CHANGEFEED_HEARTBEAT`` seconds
+    without events, and the stream ends after
+    ``APPOINTMENTS_CHANGEFEED_MAX_SECONDS``, when the browser reconnects
+    with its ``Last-Event-ID``.
+    """
+    heartbeat, max_seconds = _stream_settings()
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            event = await subscription.aget(min(heartbeat, max(deadline - time.monotonic(), 0)))
+            yield _next_chunk(subscription, event)
+    finally:
+        broker.unsubscribe(subscription)
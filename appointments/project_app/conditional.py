@@ -0,0 +1,162 @@
+"""
+Conditional GET support (ETag / Last-Modified) for the appointment pages.
+
+A page's ETag hashes the state of the appointments it shows together with
+what else makes the rendered HTML differ between requests: the full URL,
+the user, their CSRF cookie (embedded in the page's forms) and today's
+date (the calendar highlights it). A matching ``If-None-Match`` is then
+answered with a 304 before the view runs, so nothing is rendered.
+
+* The detail page's state is the appointment's ``updated_at``, which is
+  also sent as ``Last-Modified``.
+* The list and calendar pages' state is one aggregate over the owner's
+  appointments (every appointment for anonymous users):
+  ``MAX(updated_at)`` and ``COUNT(*)``, answered from the
+  ``appt_owner_updated_idx`` index, and cached under the owner's cache
+  version (see ``caching.py``). The count catches deletes, which do not
+  move the maximum; for the same reason these pages send no
+  ``Last-Modified``, as a bare ``If-Modified-Since`` would hide deletes.
+
+Changes to a recurring series touch the appointment's ``updated_at`` (see
+``signals.py``), and bulk writes set it themselves. Pages with pending
+flash messages are never answered with a 304, so the messages are shown.
+"""
+import asyncio
+import hashlib
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .caching import get_cache, versioned_key
+from .models import Appointment
+
+
+def _has_messages(request):
+    return hasattr(request, '_messages') and len(messages.get_messages(request)) > 0
+
+
+def page_etag(request, *state):
+    """Return the ETag of a page showing ``state``, or None to skip the check."""
+    if _has_messages(request):
+        return None
+    parts = [
+        request.get_full_path(),
+        request.user.pk if request.user.is_authenticated else '',
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        date.today(),
+        *state,
+    ]
+    return hashlib.md5('\n'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def owner_state(request):
+    """
+    Return ``(MAX(updated_at), COUNT(*))`` of the appointments listed to the user.
+
+    Cached under the owner's version, so repeated views of an unchanged
+    owner cost no query.
+    """
+    if not hasattr(request, '_appointments_state'):
+        owner_id = request.user.pk if request.user.is_authenticated else None
+        cache = get_cache()
+        key = versioned_key('state', owner_id)
+        state = cache.get(key)
+        if state is None:
+            appointments = Appointment.objects.all()
+            if owner_id is not None:
+                appointments = appointments.filter(owner_id=owner_id)
+            aggregate = appointments.order_by().aggregate(last=Max('updated_at'), count=Count('id'))
+            state = (aggregate['last'], aggregate['count'])
+            cache.set(key, state, getattr(settings, 'APPOINTMENTS_CALENDAR_CACHE_TIMEOUT', 3600))
+        request._appointments_state = state
+    return request._appointments_state
+
+
+def appointment_updated_at(request, pk):
+    """Return the ``updated_at`` of appointment ``pk``, or None if it does not exist."""
+    if not hasattr(request, '_appointment_updated_at'):
+        request._appointment_updated_at = (
+            Appointment.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+        )
+    return request._appointment_updated_at
+
+
+def list_etag(request, *args, **kwargs):
+    """ETag of the list and calendar pages."""
+    return page_etag(request, *owner_state(request))
+
+
+def detail_etag(request, pk, *args, **kwargs):
+    """ETag of an appointment's detail page."""
+    updated_at = appointment_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return page_etag(request, pk, updated_at)
+
+
+def detail_last_modified(request, pk, *args, **kwargs):
+    """Last-Modified of an appointment's detail page."""
+    if _has_messages(request):
+        return None
+    return appointment_updated_at(request, pk)
+
+
+def _validators(etag_func, last_modified_func, request, *args, **kwargs):
+    """Return the quoted ETag and the Last-Modified timestamp of a page, or Nones."""
+    etag = etag_func(request, *args, **kwargs) if etag_func else None
+    last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+    return (
+        quote_etag(etag) if etag is not None else None,
+        int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def _finish(request, response, etag, last_modified):
+    if request.method in ('GET', 'HEAD'):
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+        if etag:
+            response.headers.setdefault('ETag', etag)
+            patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(etag_func=None, last_modified_func=None):
+    """
+    Answer conditional GETs of a page with 304s before the view runs.
+
+    Like ``django.views.decorators.http.condition``, and marks responses
+    (304s included) ``private, no-cache`` so browsers revalidate instead of
+    guessing a freshness lifetime from ``Last-Modified``. Async views are
+    supported too; their validators are computed in a thread, as they load
+    the user and query the database.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                etag, last_modified = await sync_to_async(_validators)(
+                    etag_func, last_modified_func, request, *args, **kwargs
+                )
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return _finish(request, response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified = _validators(etag_func, last_modified_func,
+                                              request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            return _finish(request, response, etag, last_modified)
+        return wrapper
+    return decorator
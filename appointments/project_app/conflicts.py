@@ -0,0 +1,161 @@
+"""
+Detection of overlapping appointments.
+
+An appointment occupies ``[time_field, time_field + duration_minutes)`` on
+its date, clipped at midnight. Appointments without a date or time, without
+an owner, or cancelled never conflict.
+
+Because no appointment lasts longer than ``APPOINTMENTS_MAX_DURATION``
+minutes, only appointments starting less than that long before a slot can
+reach into it. ``find_conflicts`` turns this into a range query on the
+(owner, date_field, time_field) index, so checking one slot costs an index
+seek plus the few candidates in that window, however many bookings the
+owner has.
+
+Occurrences of recurring appointments (see ``recurrence.py``) occupy their
+slots too. They have no rows, so they are expanded from the owner's series
+(up to two more queries) and checked alongside.
+
+Bulk validation (a whole batch or day at once) loads each day once into a
+``DaySchedule``, a list of intervals sorted by start, and checks and adds
+every slot with the same window using ``bisect``.
+"""
+import bisect
+from datetime import time
+
+from django.conf import settings
+
+from .models import Appointment
+from .recurrence import occurrences
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Edits touching these fields move an appointment and are re-checked
+SCHEDULE_FIELDS = {'date_field', 'time_field', 'duration_minutes', 'status'}
+
+
+def max_duration():
+    """Longest allowed appointment, in minutes."""
+    return getattr(settings, 'APPOINTMENTS_MAX_DURATION', 8 * 60)
+
+
+def to_seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def from_seconds(seconds):
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def interval(start_time, duration_minutes):
+    """Return the ``(start, end)`` seconds of day occupied by a slot."""
+    start = to_seconds(start_time)
+    return start, min(start + (duration_minutes or 0) * 60, DAY_SECONDS)
+
+
+def _window_start(start):
+    # Earliest start of an appointment that can still overlap ``start``
+    return max(start - max_duration() * 60 + 1, 0)
+
+
+def occupying(queryset):
+    """Filter to appointments that occupy their slot: timed and not cancelled."""
+    return queryset.filter(time_field__isnull=False).exclude(status='cancelled')
+
+
+def conflict_candidates(owner_id, day, start_time, duration_minutes):
+    """
+    Return the owner's active appointments that may overlap the slot.
+
+    These are the ones starting in the window from ``APPOINTMENTS_MAX_DURATION``
+    before the slot up to its end: one range on the owner/date/time index.
+    """
+    start, end = interval(start_time, duration_minutes)
+    candidates = occupying(Appointment.objects.filter(
+        owner_id=owner_id, date_field=day, time_field__gte=from_seconds(_window_start(start)),
+    ))
+    if end < DAY_SECONDS:
+        candidates = candidates.filter(time_field__lt=from_seconds(end))
+    return candidates
+
+
+def find_conflicts(owner_id, day, start_time, duration_minutes, exclude_pk=None):
+    """Return the owner's appointments overlapping the slot on ``day``."""
+    if owner_id is None or day is None or start_time is None:
+        return []
+    start = to_seconds(start_time)
+    candidates = conflict_candidates(owner_id, day, start_time, duration_minutes)
+    if exclude_pk is not None:
+        candidates = candidates.exclude(pk=exclude_pk)
+    candidates = candidates.only('id', 'appointment_title', 'time_field', 'duration_minutes')
+    conflicts = [
+        appointment for appointment in candidates
+        if interval(appointment.time_field, appointment.duration_minutes)[1] > start
+    ]
+    end = interval(start_time, duration_minutes)[1]
+    exclude_pks = [] if exclude_pk is None else [exclude_pk]
+    for occurrence in recurring(owner_id, day, day, exclude_pks):
+        other_start, other_end = interval(occurrence.time_field, occurrence.duration_minutes)
+        if other_start < end and other_end > start:
+            conflicts.append(occurrence)
+    return conflicts
+
+
+class DaySchedule:
+    """One owner's intervals on one day, sorted by start."""
+
+    def __init__(self, entries=()):
+        # Bookings are loaded in any order and sorted once
+        self.entries = sorted(entries, key=lambda entry: entry[0])  # (start, end, key)
+        self.starts = [start for start, _, _ in self.entries]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, start, end, key):
+        """Place one more interval (e.g. an item of the batch being checked)."""
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.entries.insert(index, (start, end, key))
+
+    def overlapping(self, start, end):
+        """Return the keys of intervals overlapping ``[start, end)``."""
+        low = bisect.bisect_left(self.starts, _window_start(start))
+        high = bisect.bisect_left(self.starts, end)
+        return [key for _, other_end, key in self.entries[low:high] if other_end > start]
+
+
+def recurring(owner_id, start, end, exclude_pks=()):
+    """
+    Return the occurrences in ``[start, end]`` of the owner's recurring
+    appointments that occupy their slot.
+    """
+    series = occupying(Appointment.objects.filter(owner_id=owner_id))
+    series = series.exclude(pk__in=list(exclude_pks))
+    return [occurrence for occurrence in occurrences(series, start, end)
+            if occurrence.time_field is not None]
+
+
+def load_schedules(owner_id, days, exclude_pks=()):
+    """
+    Return ``{day: DaySchedule}`` of the owner's bookings, in three queries.
+
+    Occurrences of recurring appointments are included. ``exclude_pks``
+    leaves out appointments that are being moved or deleted.
+    """
+    days = {day for day in days if day is not None}
+    if owner_id is None or not days:
+        return {day: DaySchedule() for day in days}
+    entries = {day: [] for day in days}
+    rows = occupying(Appointment.objects.filter(
+        owner_id=owner_id, date_field__in=list(days),
+    )).exclude(pk__in=list(exclude_pks))
+    rows = rows.values_list('pk', 'date_field', 'time_field', 'duration_minutes')
+    for pk, day, start_time, duration_minutes in rows:
+        entries[day].append((*interval(start_time, duration_minutes), pk))
+    for occurrence in recurring(owner_id, min(days), max(days), exclude_pks):
+        if occurrence.date_field in entries:
+            entries[occurrence.date_field].append(
+                (*interval(occurrence.time_field, occurrence.duration_minutes), occurrence.pk)
+            )
+    return {day: DaySchedule(day_entries) for day, day_entries in entries.items()}
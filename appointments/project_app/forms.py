@@ -5,7 +5,9 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import date
 
-from .models import Appointment
+from .conflicts import SCHEDULE_FIELDS, find_conflicts, max_duration
+from .models import Appointment, Recurrence
+from .recurrence import clean_rule
 
 
 class AppointmentForm(forms.ModelForm):
@@ -16,7 +18,7 @@ class AppointmentForm(forms.ModelForm):
         fields = [
             'first_name', 'last_name', 'email', 'phone',
             'appointment_title', 'appointment_description', 'status',
-            'date_field', 'time_field',
+            'date_field', 'time_field', 'duration_minutes',
             'address', 'city', 'state', 'zip_code',
             'notes'
         ]
@@ -57,6 +59,11 @@ class AppointmentForm(forms.ModelForm):
                 'class': 'form-control',
                 'type': 'time'
             }),
+            'duration_minutes': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': 1,
+                'step': 5
+            }),
             'address': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Enter address'
@@ -80,6 +87,11 @@ class AppointmentForm(forms.ModelForm):
             }),
         }
 
+    def __init__(self, *args, owner=None, **kwargs):
+        """``owner`` enables the overlap check against their appointments."""
+        super().__init__(*args, **kwargs)
+        self.owner = owner
+
     def clean_date_field(self):
         """Validate that appointment date is not in the past."""
         date_field = self.cleaned_data.get('date_field')
@@ -87,6 +99,15 @@ class AppointmentForm(forms.ModelForm):
             raise ValidationError('Appointment date cannot be in the past.')
         return date_field
 
+    def clean_duration_minutes(self):
+        """Default a missing duration and cap it at the maximum."""
+        duration = self.cleaned_data.get('duration_minutes')
+        if duration is None:
+            return Appointment._meta.get_field('duration_minutes').default
+        if duration > max_duration():
+            raise ValidationError(f'Appointments cannot be longer than {max_duration()} minutes.')
+        return duration
+
     def clean_email(self):
         """Validate email format."""
         email = self.cleaned_data.get('email')
@@ -127,9 +148,61 @@ class AppointmentForm(forms.ModelForm):
                     'Appointment time cannot be in the past for today\'s date.'
                 )
 
+        # Edits move the status only along Appointment.STATUS_TRANSITIONS
+        status = cleaned_data.get('status')
+        if self.instance.pk and status and 'status' in self.changed_data:
+            try:
+                self.instance.check_transition(status)
+            except ValidationError as error:
+                self.add_error('status', error)
+
+        # Only new appointments and ones being moved are checked for overlaps
+        if (self.owner is not None and date_field and time_field
+                and cleaned_data.get('status') != 'cancelled'
+                and (not self.instance.pk or SCHEDULE_FIELDS & set(self.changed_data))):
+            conflicts = find_conflicts(
+                self.owner.pk, date_field, time_field,
+                cleaned_data.get('duration_minutes'), exclude_pk=self.instance.pk,
+            )
+            if conflicts:
+                other = conflicts[0]
+                raise ValidationError(
+                    f'This time overlaps "{other.appointment_title}" at '
+                    f'{other.time_field:%H:%M}.'
+                )
+
         return cleaned_data
 
 
+class RecurrenceForm(forms.Form):
+    """Optional RRULE that repeats an appointment (rendered with a prefix)."""
+
+    rule = forms.CharField(
+        required=False,
+        max_length=255,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'e.g. FREQ=WEEKLY;COUNT=12 (leave empty for a single appointment)'
+        })
+    )
+
+    def clean_rule(self):
+        """Validate and normalise the rule."""
+        rule = self.cleaned_data.get('rule')
+        return clean_rule(rule) if rule else ''
+
+    def save(self, appointment):
+        """Create, update or remove the appointment's recurrence."""
+        rule = self.cleaned_data['rule']
+        if not rule:
+            Recurrence.objects.filter(appointment=appointment).delete()
+            return None
+        recurrence, _ = Recurrence.objects.update_or_create(
+            appointment=appointment, defaults={'rule': rule}
+        )
+        return recurrence
+
+
 class UserRegistrationForm(UserCreationForm):
     """Extended user registration form with email."""
 
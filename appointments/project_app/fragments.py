@@ -0,0 +1,60 @@
+"""
+Cached HTML fragments of appointments.
+
+The list rows and the detail card are rendered from their own templates
+(``_appointment_row.html``, ``_appointment_card.html``) and cached under
+the appointment's ``pk`` and ``updated_at``, plus whatever else the
+fragment depends on. Saving an appointment moves ``updated_at`` (bulk
+writes set it too, and series changes touch it, see ``signals.py``), so a
+changed appointment is simply rendered under a new key; stale fragments
+expire after ``APPOINTMENTS_FRAGMENT_CACHE_TIMEOUT``.
+
+A page of rows costs one ``get_many`` and, for the misses, one
+``set_many``. The fragments are user independent: per-user parts such as
+CSRF tokens stay in the page templates. Clear the cache when a fragment
+template changes.
+"""
+from django.conf import settings
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .caching import get_cache
+
+
+def _timeout():
+    return getattr(settings, 'APPOINTMENTS_FRAGMENT_CACHE_TIMEOUT', 3600)
+
+
+def fragment_key(name, appointment, *parts):
+    """Return the cache key of an appointment's ``name`` fragment."""
+    return ':'.join(
+        ['appointments:fragment', name, str(appointment.pk), appointment.updated_at.isoformat()]
+        + [str(part) for part in parts]
+    )
+
+
+def render_fragments(name, template_name, appointments, context=None):
+    """
+    Return the ``name`` fragment of each appointment, in order.
+
+    ``context`` is shared by all fragments and part of their keys; each
+    fragment is rendered with ``appointment`` added to it.
+    """
+    context = context or {}
+    parts = [f'{key}={value}' for key, value in sorted(context.items())]
+    keys = [fragment_key(name, appointment, *parts) for appointment in appointments]
+    cache = get_cache()
+    cached = cache.get_many(keys)
+    missing = {}
+    if len(cached) < len(keys):
+        template = get_template(template_name)
+        for key, appointment in zip(keys, appointments):
+            if key not in cached:
+                missing[key] = template.render(dict(context, appointment=appointment))
+        cache.set_many(missing, _timeout())
+    return [mark_safe(cached[key] if key in cached else missing[key]) for key in keys]
+
+
+def render_fragment(name, template_name, appointment, context=None):
+    """Return one appointment's ``name`` fragment."""
+    return render_fragments(name, template_name, [appointment], context)[0]
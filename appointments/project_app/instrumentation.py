@@ -0,0 +1,223 @@
+"""
+Per-request query, database and template timing.
+
+``RequestMetricsMiddleware`` (see ``middleware.py``) opens a
+``RequestMetrics`` for each request. While it is active:
+
+* an execute wrapper installed on every database connection counts and
+  times the SQL statements run for the request, including those an async
+  view runs in a ``sync_to_async`` thread (the metrics are found through
+  a context variable, which follows the request into that thread);
+* ``InstrumentedDjangoTemplates``, the template backend in ``TEMPLATES``,
+  times top-level template renders (queries run from a template count
+  towards both the database and the template time).
+
+Finished requests are reported in a ``Server-Timing`` header, added to an
+in-process histogram per view (``registry``, served as JSON by
+``views.request_metrics``) and logged when they exceed
+``APPOINTMENTS_SLOW_REQUEST_QUERIES`` queries or
+``APPOINTMENTS_SLOW_REQUEST_MS`` milliseconds.
+
+With ``APPOINTMENTS_INSTRUMENTATION`` off the middleware removes itself, and
+the execute wrapper and template backend cost one context variable lookup
+per query or render.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in milliseconds, of the latency histogram buckets
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+_current = contextvars.ContextVar('appointments_request_metrics', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled():
+    """Whether requests are instrumented."""
+    return _setting('APPOINTMENTS_INSTRUMENTATION', False)
+
+
+class RequestMetrics:
+    """Queries and timings collected for one request, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Return the ``Server-Timing`` header value."""
+        return (
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.1f}, '
+            f'tpl;desc="Templates";dur={self.template_time * 1000:.1f}, '
+            f'total;dur={self.total * 1000:.1f}'
+        )
+
+    def is_slow(self):
+        max_queries = _setting('APPOINTMENTS_SLOW_REQUEST_QUERIES', None)
+        max_ms = _setting('APPOINTMENTS_SLOW_REQUEST_MS', None)
+        return ((max_queries is not None and self.queries > max_queries)
+                or (max_ms is not None and self.total * 1000 > max_ms))
+
+
+def _record_query(execute, sql, params, many, context):
+    # Execute wrapper of every connection; counts towards the current request
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install)
+
+
+@contextmanager
+def collect():
+    """Collect ``RequestMetrics`` for the code run inside the block."""
+    metrics = RequestMetrics()
+    # Connections opened before this module was imported
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        metrics.finish()
+
+
+class ViewStats:
+    """Aggregated metrics of one view."""
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)  # the last one is unbounded
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+
+    def add(self, metrics):
+        total_ms = metrics.total * 1000
+        self.count += 1
+        self.buckets[bisect.bisect_left(BUCKETS_MS, total_ms)] += 1
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.db_ms += metrics.db_time * 1000
+        self.template_ms += metrics.template_time * 1000
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'latency_ms': {
+                'buckets': [
+                    {'le': bound, 'count': count}
+                    for bound, count in zip(BUCKETS_MS + ['+Inf'], self.buckets)
+                ],
+                'mean': round(self.total_ms / self.count, 2),
+                'max': round(self.max_ms, 2),
+            },
+            'db_ms_mean': round(self.db_ms / self.count, 2),
+            'template_ms_mean': round(self.template_ms / self.count, 2),
+            'queries_mean': round(self.queries / self.count, 2),
+            'queries_max': self.max_queries,
+        }
+
+
+class MetricsRegistry:
+    """Per-view ``ViewStats`` of this process, safe to update from threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, metrics):
+        with self._lock:
+            self._views.setdefault(view_name, ViewStats()).add(metrics)
+
+    def snapshot(self):
+        """Return ``{view_name: stats}`` as JSON-serializable dicts."""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._views.items())}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def report(request, response, metrics):
+    """Publish a finished request's metrics: header, histogram and slow log."""
+    match = request.resolver_match
+    view_name = (match.view_name or match._func_path) if match else 'unresolved'
+    response['Server-Timing'] = metrics.server_timing()
+    registry.record(view_name, metrics)
+    if metrics.is_slow():
+        logger.warning(
+            'Slow request %s %s (%s): %d queries, %.1fms total, %.1fms db, %.1fms templates',
+            request.method, request.path, view_name, metrics.queries,
+            metrics.total * 1000, metrics.db_time * 1000, metrics.template_time * 1000,
+        )
+
+
+class InstrumentedTemplate(Template):
+    """Django template whose renders are timed into the current request."""
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with renders timed by ``collect``."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,40 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from project_app.export import EXPORT_FORMATS, export_lines
+from project_app.models import Appointment
+
+
+class Command(BaseCommand):
+    help = 'Stream appointments to a CSV or NDJSON file (or stdout).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout).')
+        parser.add_argument('--owner', help='Only export appointments of this username.')
+        parser.add_argument('--search', default='', help='Same as the list view search.')
+        parser.add_argument('--status', default='', help='Only export this status.')
+        parser.add_argument('--date', default='', help='Only export this date (YYYY-MM-DD).')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows fetched per database round-trip.')
+
+    def handle(self, *args, **options):
+        queryset = Appointment.objects.all()
+        if options['owner']:
+            try:
+                owner = get_user_model().objects.get(username=options['owner'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user '{options['owner']}'.")
+            queryset = queryset.filter(owner=owner)
+        queryset = queryset.list_filter(
+            search=options['search'], status=options['status'], date=options['date']
+        )
+
+        lines = export_lines(queryset, options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            sys.stdout.writelines(lines)
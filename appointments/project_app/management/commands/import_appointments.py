@@ -0,0 +1,127 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from project_app.caching import bump_version
+from project_app.importer import batched, clean_batch, import_batch, insert_batch, read_rows
+
+
+def _init_worker():
+    django.setup()
+
+
+def _import_parallel(batches, workers, owner_id, allow_past):
+    """
+    Import batches over a process pool, keeping few batches in flight.
+
+    SQLite allows a single writer, so there the workers only clean rows and
+    this process inserts them; other databases insert from the workers.
+    """
+    single_writer = connection.vendor == 'sqlite'
+    # Children must open their own database connections
+    connections.close_all()
+    pending = set()
+
+    def results(futures):
+        for future in futures:
+            if single_writer:
+                cleaned_rows, rejects = future.result()
+                yield insert_batch(cleaned_rows, owner_id), rejects
+            else:
+                yield future.result()
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+        for batch in batches:
+            if single_writer:
+                pending.add(executor.submit(clean_batch, batch, allow_past))
+            else:
+                pending.add(executor.submit(import_batch, batch, owner_id, allow_past))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from results(done)
+        yield from results(pending)
+
+
+class Command(BaseCommand):
+    help = 'Bulk import appointments from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import.')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'], default=None,
+            help='Input format (default: from the file extension).',
+        )
+        parser.add_argument('--owner', help='Username owning the imported appointments.')
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Rows per bulk insert and transaction '
+                 '(default: APPOINTMENTS_IMPORT_BATCH_SIZE).',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes cleaning and inserting batches in parallel.',
+        )
+        parser.add_argument('--rejects', help='Write rejected rows to this NDJSON file.')
+        parser.add_argument(
+            '--allow-past', action='store_true',
+            help='Accept appointments dated in the past (history imports).',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or (
+            'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+        )
+        batch_size = options['batch_size'] or getattr(
+            settings, 'APPOINTMENTS_IMPORT_BATCH_SIZE', 1000
+        )
+        owner_id = None
+        if options['owner']:
+            try:
+                owner_id = get_user_model().objects.get(username=options['owner']).pk
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user '{options['owner']}'.")
+
+        rejects_file = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+        inserted = rejected = 0
+        start = last_report = time.monotonic()
+        try:
+            with open(path, newline='', encoding='utf-8') as input_file:
+                batches = batched(read_rows(input_file, import_format), batch_size)
+                if options['workers'] > 1:
+                    results = _import_parallel(
+                        batches, options['workers'], owner_id, options['allow_past']
+                    )
+                else:
+                    results = (import_batch(batch, owner_id, options['allow_past'])
+                               for batch in batches)
+                for batch_inserted, batch_rejects in results:
+                    inserted += batch_inserted
+                    rejected += len(batch_rejects)
+                    if rejects_file:
+                        for reject in batch_rejects:
+                            rejects_file.write(json.dumps(reject) + '\n')
+                    now = time.monotonic()
+                    if now - last_report >= 5:
+                        last_report = now
+                        self.stdout.write(
+                            f'{inserted + rejected} rows, '
+                            f'{(inserted + rejected) / (now - start):.0f} rows/s'
+                        )
+        finally:
+            if rejects_file:
+                rejects_file.close()
+            # bulk_create() bypasses the post_save signal
+            bump_version(owner_id)
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f'Imported {inserted} appointments, rejected {rejected} rows '
+            f'in {elapsed:.1f}s ({(inserted + rejected) / max(elapsed, 1e-9):.0f} rows/s)'
+        )
@@ -0,0 +1,33 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from project_app.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-owner dashboard statistics from the appointments table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--owner', action='append', default=None,
+            help='Username to rebuild (repeatable; default: all owners).',
+        )
+
+    def handle(self, *args, **options):
+        owner_ids = None
+        if options['owner']:
+            users = dict(get_user_model().objects.filter(
+                username__in=options['owner']
+            ).values_list('username', 'pk'))
+            missing = set(options['owner']) - set(users)
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}.")
+            owner_ids = list(users.values())
+
+        start = time.monotonic()
+        owners = rebuild(owner_ids)
+        self.stdout.write(
+            f'Rebuilt statistics of {owners} owners in {time.monotonic() - start:.1f}s'
+        )
@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from project_app.notifications import outbox_stats, process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued appointment notification emails from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Emails claimed and sent per mail connection '
+                 '(default: APPOINTMENTS_EMAIL_BATCH_SIZE).',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drain the due emails once and exit instead of polling.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to sleep when the outbox is empty.',
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Print queue-depth metrics as JSON and exit.',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox_stats()))
+            return
+
+        try:
+            while True:
+                sent, failed = process_outbox(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f'Sent {sent}, failed {failed}')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
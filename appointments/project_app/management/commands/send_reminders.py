@@ -0,0 +1,49 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from project_app.reminders import run
+
+
+class Command(BaseCommand):
+    help = 'Send appointment reminder emails as they fall due.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Reminders claimed per transaction '
+                 '(default: APPOINTMENTS_REMINDER_BATCH_SIZE).',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Send the due reminders once and exit instead of waiting for more.',
+        )
+        parser.add_argument(
+            '--max-wait', type=float, default=60.0,
+            help='Longest sleep, in seconds, before checking for new reminders.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        totals = {'claimed': 0, 'sent': 0}
+
+        def report(claimed, sent, failed):
+            totals['claimed'] += claimed
+            totals['sent'] += sent
+            elapsed = max(time.monotonic() - start, 1e-9)
+            self.stdout.write(
+                f'Claimed {claimed}, sent {sent}, failed {failed} '
+                f'({totals["sent"] / elapsed:.0f} emails/s overall)'
+            )
+
+        try:
+            run(
+                batch_size=options['batch_size'],
+                max_wait=options['max_wait'],
+                connection=get_connection(),
+                once=options['once'],
+                report=report,
+            )
+        except KeyboardInterrupt:
+            pass
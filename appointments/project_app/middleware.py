@@ -0,0 +1,39 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import instrumentation
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, database, template and total time of each request.
+
+    Place it first in ``MIDDLEWARE`` so the totals include the other
+    middleware (sessions, authentication). Removed from the chain at startup
+    unless ``APPOINTMENTS_INSTRUMENTATION`` is set. Works in sync and async
+    chains, so it does not put async views behind a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not instrumentation.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with instrumentation.collect() as metrics:
+            response = self.get_response(request)
+        instrumentation.report(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        with instrumentation.collect() as metrics:
+            response = await self.get_response(request)
+        instrumentation.report(request, response, metrics)
+        return response
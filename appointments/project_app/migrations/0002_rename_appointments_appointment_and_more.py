@@ -0,0 +1,102 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:49
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('project_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='appointments',
+            new_name='Appointment',
+        ),
+        migrations.AlterModelOptions(
+            name='appointment',
+            options={'ordering': ['-date_field', '-time_field'], 'verbose_name': 'Appointment', 'verbose_name_plural': 'Appointments'},
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='address',
+            field=models.CharField(blank=True, max_length=250),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='appointment_description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='appointment_title',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='city',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='first_name',
+            field=models.CharField(max_length=200, validators=[django.core.validators.MinLengthValidator(2)]),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='last_name',
+            field=models.CharField(max_length=200, validators=[django.core.validators.MinLengthValidator(2)]),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='notes',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='phone',
+            field=models.CharField(blank=True, max_length=17, validators=[django.core.validators.RegexValidator(message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.", regex='^\\+?1?\\d{9,15}$')]),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='state',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='zip_code',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+    ]
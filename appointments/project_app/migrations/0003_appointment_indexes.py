@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_app', '0002_rename_appointments_appointment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['owner', 'date_field', 'time_field'], name='appt_owner_date_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['owner', 'status', 'date_field', 'time_field'], name='appt_owner_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('date_field__isnull', False), models.Q(('status', 'cancelled'), _negated=True)), fields=['owner', 'date_field', 'time_field'], name='appt_upcoming_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:14
+
+import django.core.validators
+from django.db import migrations, models
+
+from project_app.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Adding the column rebuilds the table on SQLite, which drops the
+    # search index triggers. The update trigger is recreated to fire only
+    # on updates of the indexed columns (see search.SQLITE_INSTALL).
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_app', '0006_outboundemail_html_body'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(blank=True, default=30, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
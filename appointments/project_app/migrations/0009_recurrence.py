@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_app', '0008_workinghours'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule', models.CharField(max_length=255)),
+                ('appointment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recurrence', to='project_app.appointment')),
+            ],
+            options={
+                'verbose_name': 'Recurrence',
+                'verbose_name_plural': 'Recurrences',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecurrenceException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_date', models.DateField()),
+                ('cancelled', models.BooleanField(default=True)),
+                ('date_field', models.DateField(blank=True, null=True)),
+                ('time_field', models.TimeField(blank=True, null=True)),
+                ('recurrence', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='project_app.recurrence')),
+            ],
+            options={
+                'verbose_name': 'Recurrence exception',
+                'verbose_name_plural': 'Recurrence exceptions',
+                'ordering': ['recurrence', 'original_date'],
+                'indexes': [models.Index(fields=['recurrence', 'date_field'], name='recurrence_exc_moved_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recurrenceexception',
+            constraint=models.UniqueConstraint(fields=('recurrence', 'original_date'), name='recurrence_exception_unique_date'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_stats(apps, schema_editor):
+    Appointment = apps.get_model('project_app', 'Appointment')
+    OwnerStats = apps.get_model('project_app', 'OwnerStats')
+    OwnerDayStats = apps.get_model('project_app', 'OwnerDayStats')
+    statuses = {'pending', 'confirmed', 'completed', 'cancelled'}
+    appointments = Appointment.objects.filter(owner__isnull=False, status__in=statuses).order_by()
+
+    totals = {}
+    for row in appointments.values('owner_id', 'status').annotate(n=models.Count('id')):
+        totals.setdefault(row['owner_id'], {})[row['status']] = row['n']
+    OwnerStats.objects.bulk_create(
+        [OwnerStats(owner_id=owner_id, **counts) for owner_id, counts in totals.items()],
+        batch_size=1000,
+    )
+    days = appointments.filter(date_field__isnull=False).values(
+        'owner_id', 'date_field', 'status'
+    ).annotate(n=models.Count('id'))
+    OwnerDayStats.objects.bulk_create(
+        (OwnerDayStats(owner_id=row['owner_id'], date_field=row['date_field'],
+                       status=row['status'], count=row['n']) for row in days.iterator()),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('project_app', '0009_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerStats',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='appointment_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('pending', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Owner statistics',
+                'verbose_name_plural': 'Owner statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='OwnerDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_field', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointment_day_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Owner day statistics',
+                'verbose_name_plural': 'Owner day statistics',
+                'ordering': ['owner', 'date_field', 'status'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ownerdaystats',
+            constraint=models.UniqueConstraint(fields=('owner', 'date_field', 'status'), name='owner_day_stats_unique'),
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
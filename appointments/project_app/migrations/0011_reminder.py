@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_app', '0010_owner_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lead_minutes', models.PositiveIntegerField()),
+                ('reminder_at', models.DateTimeField()),
+                ('sent', models.BooleanField(default=False)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='project_app.appointment')),
+            ],
+            options={
+                'verbose_name': 'Reminder',
+                'verbose_name_plural': 'Reminders',
+                'ordering': ['reminder_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('sent', False)), fields=['reminder_at'], name='reminder_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reminder',
+            constraint=models.UniqueConstraint(fields=('appointment', 'lead_minutes'), name='reminder_unique_lead'),
+        ),
+    ]
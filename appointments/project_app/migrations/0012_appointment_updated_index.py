@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_app', '0011_reminder'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['owner', 'updated_at'], name='appt_owner_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from project_app.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    # Replace the update trigger of databases migrated before it was limited
+    # to the indexed columns.
+    install_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_app', '0012_appointment_updated_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+def prune_zero_rows(apps, schema_editor):
+    # Day rows that reached zero were kept before apply_deltas deleted them
+    apps.get_model('project_app', 'OwnerDayStats').objects.filter(count=0).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project_app', '0013_search_update_trigger'),
+    ]
+
+    operations = [
+        migrations.RunPython(prune_zero_rows, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,56 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
 from django.conf import settings
-from django.core.validators import RegexValidator, MinLengthValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator, MinLengthValidator, MinValueValidator
 from django.utils import timezone
+from datetime import datetime
+
+
+# Fields the dashboard statistics are keyed on (see stats.py)
+STATS_KEY_FIELDS = ('owner_id', 'date_field', 'status')
+
+
+class AppointmentQuerySet(models.QuerySet):
+    """QuerySet with appointment-specific lookups."""
+
+    def search(self, query, ranked=False):
+        """Full-text search using the configured search backend."""
+        from .search import get_search_backend
+        return get_search_backend(self.db).search(self, query, ranked=ranked)
+
+    def for_user(self, user):
+        """
+        Appointments ``user`` may change: their own and unowned ones.
+
+        The check is on ``owner_id``, so it needs no join and no query for
+        the owner.
+        """
+        if not user.is_authenticated:
+            return self.filter(owner__isnull=True)
+        return self.filter(Q(owner_id=user.pk) | Q(owner__isnull=True))
+
+    def list_filter(self, search='', status='', date=''):
+        """
+        Apply the appointment list's search, status and date filters.
+
+        ``date`` is a ``YYYY-MM-DD`` string; an unparseable date is ignored.
+        """
+        queryset = self
+        if search:
+            queryset = queryset.search(search)
+        if status:
+            queryset = queryset.filter(status=status)
+        if date:
+            try:
+                filter_date = datetime.strptime(date, '%Y-%m-%d').date()
+            except ValueError:
+                pass
+            else:
+                queryset = queryset.filter(date_field=filter_date)
+        return queryset
 
 
 class Appointment(models.Model):
@@ -13,6 +62,13 @@ class Appointment(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    # Status -> the statuses it may move to through transition_to()
+    STATUS_TRANSITIONS = {
+        'pending': ['confirmed', 'cancelled'],
+        'confirmed': ['completed', 'cancelled'],
+        'completed': [],
+        'cancelled': ['pending'],
+    }
 
     phone_regex = RegexValidator(
         regex=r'^\+?1?\d{9,15}$',
@@ -46,6 +102,9 @@ class Appointment(models.Model):
     # Scheduling
     time_field = models.TimeField(blank=True, null=True)
     date_field = models.DateField(blank=True, null=True)
+    duration_minutes = models.PositiveIntegerField(
+        default=30, blank=True, validators=[MinValueValidator(1)]
+    )
 
     # Location
     address = models.CharField(max_length=250, blank=True)
@@ -60,14 +119,47 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AppointmentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date_field', '-time_field']
         verbose_name = 'Appointment'
         verbose_name_plural = 'Appointments'
+        indexes = [
+            # List and calendar pages: owner scope, then date/time ordering
+            models.Index(
+                fields=['owner', 'date_field', 'time_field'],
+                name='appt_owner_date_time_idx',
+            ),
+            # Status filter within an owner's appointments, same ordering
+            models.Index(
+                fields=['owner', 'status', 'date_field', 'time_field'],
+                name='appt_owner_status_date_idx',
+            ),
+            # Upcoming (non-cancelled) appointments; "upcoming" itself is
+            # a date_field >= today range on this index
+            models.Index(
+                fields=['owner', 'date_field', 'time_field'],
+                condition=Q(date_field__isnull=False) & ~Q(status='cancelled'),
+                name='appt_upcoming_idx',
+            ),
+            # Conditional GETs: MAX(updated_at) and COUNT(*) per owner
+            models.Index(fields=['owner', 'updated_at'], name='appt_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.appointment_title} - {self.date_field}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored (owner, date, status), to update dashboard statistics
+        # incrementally when the instance is saved (see stats.py)
+        stored = dict(zip(field_names, values))
+        key = tuple(stored.get(name, models.DEFERRED) for name in STATS_KEY_FIELDS)
+        instance._stored_stats_key = None if models.DEFERRED in key else key
+        return instance
+
     @property
     def is_past_due(self):
         """Check if the appointment date has passed."""
@@ -80,6 +172,356 @@ class Appointment(models.Model):
         """Return the full name of the appointment contact."""
         return f"{self.first_name} {self.last_name}"
 
+    @property
+    def status_options(self):
+        """Return ``(status, label)`` for the current status and those it may move to."""
+        allowed = {self.status, *self.STATUS_TRANSITIONS.get(self.status, [])}
+        return [(value, label) for value, label in self.STATUS_CHOICES if value in allowed]
+
+    def check_transition(self, status):
+        """Raise ValidationError unless the appointment may move to ``status``."""
+        if status != self.status and status not in self.STATUS_TRANSITIONS.get(self.status, []):
+            raise ValidationError(
+                f"A {self.get_status_display().lower()} appointment cannot be "
+                f"{dict(self.STATUS_CHOICES).get(status, status).lower()}."
+            )
+
+    def check_slot(self):
+        """Raise ValidationError if the appointment overlaps another of its owner's."""
+        from .conflicts import find_conflicts
+        conflicts = find_conflicts(self.owner_id, self.date_field, self.time_field,
+                                   self.duration_minutes, exclude_pk=self.pk)
+        if conflicts:
+            other = conflicts[0]
+            raise ValidationError(
+                f'This time overlaps "{other.appointment_title}" at {other.time_field:%H:%M}.'
+            )
+
+    def _start_transition(self, status):
+        """
+        Check a move to ``status``; return whether there is anything to save,
+        and whether the appointment takes its slot back (so must be checked
+        for overlaps, as a cancelled appointment gave it up).
+        """
+        if status == self.status:
+            return False, False
+        self.check_transition(status)
+        return True, self.status == 'cancelled'
+
+    def _finish_transition(self, status):
+        """
+        Write ``status`` only if the stored status is still the one checked.
+
+        Otherwise the appointment moved in the meantime: it is reloaded and
+        ValidationError raised. The ``UPDATE`` bypasses ``save()``, so
+        ``post_save`` is sent here, once the row has actually changed, for
+        the statistics, reminders, change feed and cache versions.
+        """
+        current, now = self.status, timezone.now()
+        using = router.db_for_write(Appointment, instance=self)
+        with transaction.atomic(using=using):
+            updated = Appointment.objects.using(using).filter(
+                pk=self.pk, status=current,
+            ).update(status=status, updated_at=now)
+            if not updated:
+                try:
+                    self.refresh_from_db()
+                except Appointment.DoesNotExist:
+                    raise ValidationError('This appointment has been deleted.') from None
+                raise ValidationError(
+                    f'This appointment was changed to {self.get_status_display().lower()} '
+                    f'in the meantime.'
+                )
+            # The row was stored with the status checked (status comes last)
+            stored = (getattr(self, '_stored_stats_key', None)
+                      or tuple(getattr(self, name) for name in STATS_KEY_FIELDS))
+            self._stored_stats_key = (*stored[:-1], current)
+            self.status, self.updated_at = status, now
+            post_save.send(sender=Appointment, instance=self, created=False,
+                           update_fields=frozenset({'status', 'updated_at'}),
+                           raw=False, using=using)
+
+    def transition_to(self, status):
+        """
+        Move the appointment to ``status``, writing only the status.
+
+        Return False, without a query, when it already has that status.
+        Raise ValidationError for a status the current one may not move to,
+        when reactivating it would overlap another booking, or when its
+        stored status changed since it was loaded.
+        """
+        changed, reactivated = self._start_transition(status)
+        if not changed:
+            return False
+        if reactivated:
+            self.check_slot()
+        self._finish_transition(status)
+        return True
+
+    async def atransition_to(self, status):
+        """Async ``transition_to``."""
+        changed, reactivated = self._start_transition(status)
+        if not changed:
+            return False
+        if reactivated:
+            await sync_to_async(self.check_slot)()
+        await sync_to_async(self._finish_transition)(status)
+        return True
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting in (or sent from) the notification outbox.
+
+    Views enqueue rows here instead of talking to SMTP; the
+    ``send_notifications`` management command delivers them in batches.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.SET_NULL,
+        related_name='outbound_emails',
+        null=True,
+        blank=True
+    )
+    action = models.CharField(max_length=20)
+    recipient = models.EmailField(max_length=100)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+
+    # Delivery state
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        verbose_name = 'Outbound email'
+        verbose_name_plural = 'Outbound emails'
+        indexes = [
+            # Worker polling: due rows per status, oldest first
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
+
+
+class Reminder(models.Model):
+    """
+    An email reminder due ``lead_minutes`` before an appointment starts.
+
+    Rows are kept in step with their appointment by ``reminders.py``; the
+    ``send_reminders`` management command claims due ones and sends them.
+    """
+
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.CASCADE,
+        related_name='reminders'
+    )
+    lead_minutes = models.PositiveIntegerField()
+    reminder_at = models.DateTimeField()
+    sent = models.BooleanField(default=False)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['reminder_at', 'id']
+        verbose_name = 'Reminder'
+        verbose_name_plural = 'Reminders'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['appointment', 'lead_minutes'],
+                name='reminder_unique_lead',
+            ),
+        ]
+        indexes = [
+            # Dispatcher polling: unsent reminders by due time. Partial, so
+            # it only holds the pending work however many have been sent.
+            models.Index(fields=['reminder_at'], condition=Q(sent=False), name='reminder_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reminder for {self.appointment} at {self.reminder_at}"
+
+
+class Recurrence(models.Model):
+    """
+    Repeats an appointment according to an RFC 5545 RRULE.
+
+    The appointment row is the first occurrence; later ones are expanded on
+    demand for the dates being displayed (see ``recurrence.py``), so a
+    series costs one row however long it runs.
+    """
+
+    appointment = models.OneToOneField(
+        Appointment,
+        on_delete=models.CASCADE,
+        related_name='recurrence'
+    )
+    # RRULE body, e.g. "FREQ=WEEKLY;BYDAY=MO,TH;COUNT=20"
+    rule = models.CharField(max_length=255)
+
+    class Meta:
+        verbose_name = 'Recurrence'
+        verbose_name_plural = 'Recurrences'
+
+    def __str__(self):
+        return f"{self.appointment} ({self.rule})"
+
+
+class RecurrenceException(models.Model):
+    """
+    A change to one occurrence of a series: skipped or moved.
+
+    Only occurrences that differ from the rule get a row.
+    """
+
+    recurrence = models.ForeignKey(
+        Recurrence,
+        on_delete=models.CASCADE,
+        related_name='exceptions'
+    )
+    original_date = models.DateField()
+    cancelled = models.BooleanField(default=True)
+    # New date/time of a moved (not cancelled) occurrence
+    date_field = models.DateField(blank=True, null=True)
+    time_field = models.TimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['recurrence', 'original_date']
+        verbose_name = 'Recurrence exception'
+        verbose_name_plural = 'Recurrence exceptions'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurrence', 'original_date'],
+                name='recurrence_exception_unique_date',
+            ),
+        ]
+        indexes = [
+            # Occurrences moved into a displayed window
+            models.Index(fields=['recurrence', 'date_field'], name='recurrence_exc_moved_idx'),
+        ]
+
+    def __str__(self):
+        action = 'cancelled' if self.cancelled else f'moved to {self.date_field}'
+        return f"{self.recurrence.appointment} on {self.original_date} {action}"
+
+
+class WorkingHours(models.Model):
+    """
+    A period of a weekday during which an owner takes appointments.
+
+    An owner may have several periods per weekday (e.g. a lunch break);
+    owners without any use ``APPOINTMENTS_DEFAULT_WORKING_HOURS``.
+    """
+
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='working_hours'
+    )
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ['owner', 'weekday', 'start_time']
+        verbose_name = 'Working hours'
+        verbose_name_plural = 'Working hours'
+        constraints = [
+            models.CheckConstraint(
+                check=Q(end_time__gt=models.F('start_time')),
+                name='working_hours_end_after_start',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+
+class OwnerStats(models.Model):
+    """
+    An owner's appointment counts per status, for the dashboard.
+
+    Maintained incrementally as appointments change (see ``stats.py``);
+    ``manage.py rebuild_stats`` recomputes it from scratch.
+    """
+
+    owner = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='appointment_stats'
+    )
+    pending = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Owner statistics'
+        verbose_name_plural = 'Owner statistics'
+
+    def __str__(self):
+        return f"Statistics of {self.owner}"
+
+
+class OwnerDayStats(models.Model):
+    """
+    Number of an owner's appointments with a status on one date.
+
+    One row per (owner, date, status) rather than per appointment, so the
+    dashboard's date-based figures sum a handful of rows.
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='appointment_day_stats'
+    )
+    date_field = models.DateField()
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['owner', 'date_field', 'status']
+        verbose_name = 'Owner day statistics'
+        verbose_name_plural = 'Owner day statistics'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'date_field', 'status'],
+                name='owner_day_stats_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} {self.date_field} {self.status}: {self.count}"
+
 
 # Keep backwards compatibility alias
 appointments = Appointment
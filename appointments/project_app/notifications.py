@@ -0,0 +1,328 @@
+"""
+Appointment email notifications and the outbox that delivers them.
+
+Emails are rendered from per-action templates in
+``templates/appointment_files/email/`` (subject, text and HTML parts, with
+optional per-language variants in ``email/<language>/``).
+
+Views call ``send_appointment_notification``, which only writes an
+``OutboundEmail`` row. The ``send_notifications`` management command drains
+the outbox: it claims due rows in batches, sends each batch over a single
+mail connection and retries failures with exponential backoff.
+"""
+import functools
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Count, Min
+from django.dispatch import receiver
+from django.template import Context, TemplateDoesNotExist
+from django.template.loader import select_template
+from django.utils import timezone, translation
+from django.utils.functional import cached_property
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+TEMPLATE_DIR = 'appointment_files/email'
+FALLBACK_ACTION = 'notification'
+
+
+@functools.lru_cache(maxsize=None)
+def get_notification_template(action, part, language):
+    """
+    Return the compiled template for one part of an action's email.
+
+    ``part`` is ``'subject.txt'``, ``'txt'`` or ``'html'``. A
+    language-specific variant in ``email/<language>/`` wins over the
+    default one, and unknown actions use the generic ``notification``
+    templates. Each lookup is compiled once per process; returns None
+    when no template exists (e.g. an action without an HTML part).
+    """
+    separator = '_' if part == 'subject.txt' else '.'
+    candidates = []
+    for name in (action, FALLBACK_ACTION):
+        filename = f'{name}{separator}{part}'
+        if language:
+            candidates.append(f'{TEMPLATE_DIR}/{language}/{filename}')
+            if '-' in language:
+                candidates.append(f'{TEMPLATE_DIR}/{language.split("-")[0]}/{filename}')
+        candidates.append(f'{TEMPLATE_DIR}/{filename}')
+    try:
+        return select_template(candidates)
+    except TemplateDoesNotExist:
+        return None
+
+
+@receiver(setting_changed)
+def clear_template_cache(*, setting, **kwargs):
+    """Forget compiled templates when template settings change (tests)."""
+    if setting == 'TEMPLATES':
+        get_notification_template.cache_clear()
+
+
+class Notification:
+    """
+    The email for one appointment action, rendered lazily.
+
+    Only the parts that are accessed are rendered, each at most once.
+    """
+
+    def __init__(self, appointment, action, language=None):
+        self.appointment = appointment
+        self.action = action
+        self.language = language or translation.get_language() or settings.LANGUAGE_CODE
+
+    @cached_property
+    def context(self):
+        # Values used by several parts are computed once. Date and time
+        # are pre-formatted as before; locale variants may use the
+        # |date and |time filters on ``appointment`` instead.
+        appointment = self.appointment
+        return {
+            'appointment': appointment,
+            'status_display': appointment.get_status_display(),
+            'date_display': str(appointment.date_field),
+            'time_display': str(appointment.time_field),
+        }
+
+    def render(self, part):
+        template = get_notification_template(self.action, part, self.language)
+        if template is None:
+            return ''
+        # Only the HTML part is autoescaped
+        context = Context(self.context, autoescape=part == 'html')
+        if self.language == translation.get_language():
+            return template.template.render(context)
+        with translation.override(self.language):
+            return template.template.render(context)
+
+    @cached_property
+    def subject(self):
+        # Subjects must be a single line
+        return ' '.join(self.render('subject.txt').split())
+
+    @cached_property
+    def body(self):
+        return self.render('txt')
+
+    @cached_property
+    def html_body(self):
+        return self.render('html')
+
+
+def build_notification(appointment, action):
+    """Return the ``(subject, body)`` of the email for ``action``."""
+    notification = Notification(appointment, action)
+    return notification.subject, notification.body
+
+
+def send_appointment_notification(appointment, action):
+    """
+    Queue an email notification for an appointment action.
+
+    A still-pending email for the same appointment and action is rewritten
+    in place, so repeated edits before the worker runs send one email with
+    the latest details.
+    """
+    if not appointment.email:
+        return None
+
+    notification = Notification(appointment, action)
+    if not _setting('APPOINTMENTS_EMAIL_QUEUE', True):
+        make_message(
+            notification.subject, notification.body, notification.html_body,
+            appointment.email,
+        ).send(fail_silently=True)
+        return None
+
+    pending = OutboundEmail.objects.filter(
+        appointment=appointment, action=action, status='pending'
+    )
+    with transaction.atomic():
+        email = pending.select_for_update().first()
+        if email is None:
+            return OutboundEmail.objects.create(
+                appointment=appointment,
+                action=action,
+                recipient=appointment.email,
+                subject=notification.subject,
+                body=notification.body,
+                html_body=notification.html_body,
+            )
+        email.recipient = appointment.email
+        email.subject = notification.subject
+        email.body = notification.body
+        email.html_body = notification.html_body
+        email.save(update_fields=['recipient', 'subject', 'body', 'html_body'])
+    return email
+
+
+def queue_notifications(appointments, action, claimed=False):
+    """
+    Queue notifications for many appointments with one bulk insert.
+
+    Pending emails for the same appointments and action are replaced, as
+    ``send_appointment_notification`` does for a single appointment. With
+    ``claimed`` the rows are created already claimed, as ``claim_batch``
+    leaves them, for the caller to deliver with ``send_batch``.
+    """
+    appointments = [a for a in appointments if a.email]
+    if not appointments:
+        return []
+    state = {'status': 'sending', 'next_attempt_at': timezone.now() + lease()} if claimed else {}
+    emails = []
+    for appointment in appointments:
+        notification = Notification(appointment, action)
+        emails.append(OutboundEmail(
+            appointment=appointment,
+            action=action,
+            recipient=appointment.email,
+            subject=notification.subject,
+            body=notification.body,
+            html_body=notification.html_body,
+            **state,
+        ))
+    with transaction.atomic():
+        OutboundEmail.objects.filter(
+            appointment__in=[a.pk for a in appointments], action=action, status='pending'
+        ).delete()
+        return OutboundEmail.objects.bulk_create(emails)
+
+
+def make_message(subject, body, html_body, recipient, connection=None):
+    """Build the outgoing message, with an HTML alternative if there is one."""
+    message = EmailMultiAlternatives(
+        subject, body, settings.DEFAULT_FROM_EMAIL, [recipient], connection=connection,
+    )
+    if html_body:
+        message.attach_alternative(html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    """Backoff before retry number ``attempts``: base * 2**(attempts-1), capped."""
+    base = _setting('APPOINTMENTS_EMAIL_RETRY_DELAY', 60)
+    cap = _setting('APPOINTMENTS_EMAIL_RETRY_MAX_DELAY', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def lease():
+    """How long a claimed email is left to its worker before it is retried."""
+    return timedelta(seconds=_setting('APPOINTMENTS_EMAIL_LEASE', 300))
+
+
+def claim_batch(batch_size):
+    """
+    Mark up to ``batch_size`` due emails as sending and return them.
+
+    Rows are locked with SKIP LOCKED where the database supports it, so
+    several workers can drain the outbox without sending twice. Rows left
+    in ``sending`` by a crashed worker are reclaimed after the lease.
+    """
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(
+        status__in=['pending', 'sending'], next_attempt_at__lte=now
+    ).order_by('next_attempt_at', 'id')
+    with transaction.atomic():
+        batch = list(due.select_for_update(skip_locked=True)[:batch_size])
+        OutboundEmail.objects.filter(pk__in=[e.pk for e in batch]).update(
+            status='sending', next_attempt_at=now + lease()
+        )
+    return batch
+
+
+def _record_failure(email, error, max_attempts):
+    """Count a failed attempt: retry later with backoff, or give up."""
+    email.last_error = error
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def send_batch(batch, connection=None):
+    """
+    Send ``batch`` over one mail connection; return ``(sent, failed)``.
+
+    A ``connection`` passed in is opened if needed and left open for the
+    caller to reuse; otherwise one is opened and closed for the batch.
+    When the connection cannot be opened, every email of the batch counts
+    a failed attempt and is rescheduled, rather than left claimed until
+    its lease expires.
+    """
+    sent = failed = 0
+    max_attempts = _setting('APPOINTMENTS_EMAIL_MAX_ATTEMPTS', 5)
+    managed = connection is None
+    if managed:
+        connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning('Opening the mail connection for %s outbound emails failed: %s',
+                       len(batch), exc)
+        for email in batch:
+            email.attempts += 1
+            _record_failure(email, str(exc), max_attempts)
+        OutboundEmail.objects.bulk_update(
+            batch, ['status', 'attempts', 'last_error', 'next_attempt_at']
+        )
+        return 0, len(batch)
+    try:
+        for email in batch:
+            message = make_message(
+                email.subject, email.body, email.html_body, email.recipient,
+                connection=connection,
+            )
+            email.attempts += 1
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                logger.warning('Sending outbound email %s failed: %s', email.pk, exc)
+                failed += 1
+                _record_failure(email, str(exc), max_attempts)
+                email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+            else:
+                sent += 1
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.save(update_fields=['status', 'attempts', 'sent_at'])
+    finally:
+        if managed:
+            connection.close()
+    return sent, failed
+
+
+def process_outbox(batch_size=None):
+    """Claim and send one batch; return ``(sent, failed)``."""
+    batch_size = batch_size or _setting('APPOINTMENTS_EMAIL_BATCH_SIZE', 100)
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+    return send_batch(batch)
+
+
+def outbox_stats():
+    """Queue-depth metrics: row counts per status and the oldest due email."""
+    counts = dict(
+        OutboundEmail.objects.order_by().values_list('status').annotate(Count('id'))
+    )
+    oldest = OutboundEmail.objects.filter(status='pending').aggregate(
+        oldest=Min('created_at')
+    )['oldest']
+    return {
+        'depth': counts.get('pending', 0) + counts.get('sending', 0),
+        'by_status': {status: counts.get(status, 0) for status, _ in OutboundEmail.STATUS_CHOICES},
+        'oldest_pending_age': (timezone.now() - oldest).total_seconds() if oldest else None,
+    }
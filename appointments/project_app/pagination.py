@@ -0,0 +1,209 @@
+"""
+Keyset (cursor) pagination for the appointment list.
+
+``django.core.paginator.Paginator`` runs ``COUNT(*)`` on every request and
+uses ``OFFSET``, which gets slower the deeper the page. ``KeysetPaginator``
+instead seeks past the last row shown, keyed on the list ordering
+``(date_field, time_field, id)`` descending with NULLs last, so every page
+costs the same as the first one.
+
+Cursors are opaque signed tokens; a missing or tampered cursor falls back to
+the first page.
+"""
+import collections.abc
+import hashlib
+from datetime import date, time
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import F, Q
+
+CURSOR_SALT = 'project_app.pagination.cursor'
+
+
+def _encode(value):
+    return value.isoformat() if value is not None else None
+
+
+class KeysetPage(collections.abc.Sequence):
+    """A page of results with opaque cursors to its neighbours."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.make_cursor(self.object_list[-1], forward=True)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.make_cursor(self.object_list[0], forward=False)
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by seeking on ``(date_field, time_field, pk)``.
+
+    ``count`` controls ``KeysetPaginator.count``: ``None`` never counts,
+    ``'exact'`` counts on every access and ``'cached'`` keeps the count in
+    the default cache for ``count_timeout`` seconds.
+    """
+
+    def __init__(self, queryset, per_page, count=None, count_timeout=60):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.count_mode = count
+        self.count_timeout = count_timeout
+
+    @property
+    def count(self):
+        """Total number of rows, or None when counting is disabled."""
+        if self.count_mode == 'exact':
+            return self.queryset.count()
+        if self.count_mode == 'cached':
+            sql = str(self.queryset.order_by().query).encode()
+            key = 'appointments:count:' + hashlib.md5(sql).hexdigest()
+            return cache.get_or_set(key, self.queryset.count, self.count_timeout)
+        return None
+
+    def ordering(self, forward=True):
+        if forward:
+            return [F('date_field').desc(nulls_last=True),
+                    F('time_field').desc(nulls_last=True), F('pk').desc()]
+        return [F('date_field').asc(nulls_first=True),
+                F('time_field').asc(nulls_first=True), F('pk').asc()]
+
+    def make_cursor(self, obj, forward=True):
+        """Return an opaque cursor positioned at ``obj``."""
+        return signing.dumps({
+            'd': 'n' if forward else 'p',
+            'k': [_encode(obj.date_field), _encode(obj.time_field), obj.pk],
+        }, salt=CURSOR_SALT)
+
+    def parse_cursor(self, cursor):
+        """Return ``(forward, key)`` for ``cursor``, or None if invalid."""
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            date_value, time_value, pk = data['k']
+            key = (
+                date.fromisoformat(date_value) if date_value else None,
+                time.fromisoformat(time_value) if time_value else None,
+                int(pk),
+            )
+            return data['d'] == 'n', key
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+    def _rest(self, key, forward):
+        """Q for rows on the cursor's date that lie beyond the cursor."""
+        time_value, pk = key[1], key[2]
+        pk_q = Q(pk__lt=pk) if forward else Q(pk__gt=pk)
+        if time_value is None:
+            if forward:
+                return Q(time_field__isnull=True) & pk_q
+            return Q(time_field__isnull=False) | (Q(time_field__isnull=True) & pk_q)
+        if forward:
+            return (Q(time_field__lt=time_value) | Q(time_field__isnull=True) |
+                    (Q(time_field=time_value) & pk_q))
+        return Q(time_field__gt=time_value) | (Q(time_field=time_value) & pk_q)
+
+    def segments(self, key, forward):
+        """
+        Return the filters to read, in order, to walk past ``key``.
+
+        The date bound is kept as a top-level range so the database can seek
+        the (owner, date_field, time_field) index; NULL dates sort last and
+        are read as a separate segment.
+        """
+        if key is None:
+            return [Q()]
+        date_value = key[0]
+        rest = self._rest(key, forward)
+        if date_value is None:
+            if forward:
+                return [Q(date_field__isnull=True) & rest]
+            return [Q(date_field__isnull=True) & rest, Q(date_field__isnull=False)]
+        if forward:
+            return [
+                Q(date_field__lte=date_value) &
+                (Q(date_field__lt=date_value) | (Q(date_field=date_value) & rest)),
+                Q(date_field__isnull=True),
+            ]
+        return [
+            Q(date_field__gte=date_value) &
+            (Q(date_field__gt=date_value) | (Q(date_field=date_value) & rest)),
+        ]
+
+    def _fetch(self, key, forward):
+        wanted = self.per_page + 1
+        ordering = self.ordering(forward)
+        rows = []
+        for segment in self.segments(key, forward):
+            rows.extend(self.queryset.filter(segment).order_by(*ordering)[:wanted - len(rows)])
+            if len(rows) >= wanted:
+                break
+        return rows
+
+    def get_page(self, cursor=None):
+        """Return the page at ``cursor`` (the first page if it is invalid)."""
+        parsed = self.parse_cursor(cursor) if cursor else None
+        forward, key = parsed if parsed else (True, None)
+
+        rows = self._fetch(key, forward)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return KeysetPage(rows, self, has_next=has_more, has_previous=key is not None)
+        if not has_more:
+            # Walked back to the start: show a full first page instead.
+            return self.get_page()
+        rows.reverse()
+        return KeysetPage(rows, self, has_next=True, has_previous=True)
+
+
+async def aget_page(paginator, number):
+    """
+    ``Paginator.get_page`` for async views, using the async ORM.
+
+    The count and the page's rows are read with ``acount`` and async
+    iteration; invalid page numbers fall back as in ``get_page``.
+    """
+    paginator.count = await paginator.object_list.acount()
+    try:
+        number = paginator.validate_number(number)
+    except PageNotAnInteger:
+        number = 1
+    except EmptyPage:
+        number = paginator.num_pages
+    bottom = (number - 1) * paginator.per_page
+    top = bottom + paginator.per_page
+    if top + paginator.orphans >= paginator.count:
+        top = paginator.count
+    rows = [row async for row in paginator.object_list[bottom:top]]
+    return paginator._get_page(rows, number, paginator)
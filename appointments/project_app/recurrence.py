@@ -0,0 +1,173 @@
+"""
+Lazy expansion of recurring appointments.
+
+A series is an appointment with a ``Recurrence``: the appointment row is the
+first occurrence and its RRULE generates the rest. Nothing is stored per
+occurrence. ``occurrences`` expands the series in a queryset only over the
+date window being displayed, then applies the sparse
+``RecurrenceException`` rows (skipped or moved occurrences).
+"""
+import functools
+import math
+import warnings
+from datetime import MAXYEAR, datetime, time
+
+from dateutil.rrule import DAILY, MONTHLY, WEEKLY, YEARLY, rrulestr
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import RecurrenceException
+
+# Finer frequencies would make a single row stand for thousands of visits
+FREQUENCIES = {'DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY'}
+# dateutil only checks UNTIL and COUNT when a date matches, so it searches up
+# to year 9999 for a rule that never matches (e.g. 30 February, or every 7th
+# day on a weekday the series does not start on). The Gregorian calendar
+# repeats every 400 years, in each frequency's units:
+CYCLE_UNITS = {YEARLY: 400, MONTHLY: 4800, WEEKLY: 20871, DAILY: 146097}
+
+
+def _no_match(rule, start, **changes):
+    with warnings.catch_warnings():
+        # COUNT and UNTIL together are deprecated in RFC 5545, not unsupported
+        warnings.simplefilter('ignore', DeprecationWarning)
+        probe = rrulestr(rule, dtstart=start).replace(until=None, count=None, **changes)
+    return probe.after(start, inc=True) is None
+
+
+def _never_matches_any_interval(rule, dtstart):
+    # Probed over the last 31 years (a leap year onwards, so a 29 February
+    # start stays valid), which span the leap-year and weekday cycles
+    return _no_match(rule, dtstart.replace(year=MAXYEAR - 31), interval=1)
+
+
+@functools.lru_cache(maxsize=1024)
+def never_matches(rule, dtstart):
+    """
+    Return whether ``rule`` starting at ``dtstart`` has no occurrences at all.
+
+    A rule repeats once both the calendar and its INTERVAL do, after a whole
+    number of 400-year cycles. Whether it matches is probed over the last
+    such repetition before 9999, starting in the same phase as ``dtstart``,
+    where the search ends after that repetition when nothing matches. Rules
+    matching no date even at INTERVAL=1 are told apart first, more cheaply.
+    """
+    if _never_matches_any_interval(rule, dtstart):
+        return True
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        parsed = rrulestr(rule, dtstart=dtstart)
+    years = 400 * (parsed._interval // math.gcd(parsed._interval, CYCLE_UNITS[parsed._freq]))
+    repetitions = max((MAXYEAR - years - dtstart.year) // years, 0)
+    return _no_match(rule, dtstart.replace(year=dtstart.year + repetitions * years))
+
+
+def clean_rule(rule, dtstart=None):
+    """
+    Validate an RRULE body and return it normalised; raise ValidationError.
+
+    Without the series' ``dtstart``, rules that only repeat from some start
+    dates (such as ``FREQ=DAILY;INTERVAL=7;BYDAY=TU``) are accepted.
+    """
+    rule = (rule or '').strip().upper()
+    if rule.startswith('RRULE:'):
+        rule = rule[len('RRULE:'):]
+    parts = dict(part.partition('=')[::2] for part in rule.split(';') if part)
+    if parts.get('FREQ') not in FREQUENCIES:
+        raise ValidationError('FREQ must be one of %s.' % ', '.join(sorted(FREQUENCIES)))
+    if 'DTSTART' in parts:
+        raise ValidationError('The series starts at the appointment date; omit DTSTART.')
+    try:
+        rrulestr(rule, dtstart=datetime(2000, 1, 1))
+    except (ValueError, TypeError) as error:
+        raise ValidationError(f'Invalid recurrence rule: {error}')
+    if (never_matches(rule, dtstart) if dtstart
+            else _never_matches_any_interval(rule, datetime(2000, 1, 1))):
+        raise ValidationError('The recurrence rule never repeats.')
+    return rule
+
+
+def series_start(appointment):
+    """Return the ``dtstart`` of the series an appointment starts."""
+    return datetime.combine(appointment.date_field, appointment.time_field or time())
+
+
+def occurrence_dates(appointment, rule, start, end):
+    """Dates of the rule's occurrences in ``[start, end]``, first one excluded."""
+    dtstart = series_start(appointment)
+    if never_matches(rule, dtstart):
+        return []
+    end = datetime.combine(end, time.max)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        bounded = rrulestr(rule, dtstart=dtstart)
+        bounded = bounded.replace(until=min(bounded._until or end, end))
+    dates = bounded.between(datetime.combine(start, time.min), end, inc=True)
+    return [value.date() for value in dates if value.date() != appointment.date_field]
+
+
+class Occurrence:
+    """A generated occurrence; reads like its series' appointment."""
+
+    is_occurrence = True
+
+    def __init__(self, appointment, date_field, time_field, original_date):
+        self.appointment = appointment
+        self.date_field = date_field
+        self.time_field = time_field
+        self.original_date = original_date
+
+    def __getattr__(self, name):
+        return getattr(self.appointment, name)
+
+    def __repr__(self):
+        return f'<Occurrence of {self.appointment.pk} on {self.date_field}>'
+
+
+def occurrences(queryset, start, end):
+    """
+    Return the occurrences in ``[start, end]`` of the series in ``queryset``.
+
+    First occurrences are not included: they are the appointment rows
+    themselves. Costs two queries however long the series run.
+    """
+    series = list(
+        queryset.filter(recurrence__isnull=False, date_field__lte=end)
+        .select_related('recurrence').order_by()
+    )
+    if not series:
+        return []
+    by_recurrence = {appointment.recurrence.pk: appointment for appointment in series}
+    exceptions = {
+        (exception.recurrence_id, exception.original_date): exception
+        for exception in RecurrenceException.objects.filter(
+            Q(original_date__range=(start, end)) | Q(date_field__range=(start, end)),
+            recurrence__in=list(by_recurrence),
+        )
+    }
+
+    result = []
+    for recurrence_id, appointment in by_recurrence.items():
+        rule = appointment.recurrence.rule
+        for day in occurrence_dates(appointment, rule, start, end):
+            exception = exceptions.pop((recurrence_id, day), None)
+            if exception is None:
+                result.append(Occurrence(appointment, day, appointment.time_field, day))
+            elif not exception.cancelled:
+                moved_to = exception.date_field or day
+                if start <= moved_to <= end:
+                    result.append(Occurrence(
+                        appointment, moved_to, exception.time_field or appointment.time_field, day
+                    ))
+    # Occurrences moved into the window from a date outside it
+    for (recurrence_id, original_date), exception in exceptions.items():
+        if (not exception.cancelled and exception.date_field
+                and not start <= original_date <= end):
+            appointment = by_recurrence[recurrence_id]
+            result.append(Occurrence(
+                appointment, exception.date_field,
+                exception.time_field or appointment.time_field, original_date,
+            ))
+
+    result.sort(key=lambda o: (o.date_field, o.time_field is not None, o.time_field or time(), o.pk))
+    return result
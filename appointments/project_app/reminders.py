@@ -0,0 +1,194 @@
+"""
+Email reminders before appointments.
+
+Each appointment with an email address, a date and an open status
+(pending or confirmed) gets one ``Reminder`` row per lead time in
+``APPOINTMENTS_REMINDER_LEAD_MINUTES``. ``sync_reminders`` keeps the rows in
+step when appointments are saved (see ``signals.py``) or bulk written:
+moving an appointment reschedules its reminders, and cancelling it or
+removing its email drops the unsent ones. Reminders whose time has
+already passed are not created.
+
+``send_reminders`` (the management command) runs ``dispatch`` in a loop:
+
+* ``claim_due`` locks due reminders on the partial ``reminder_due_idx``
+  with ``select_for_update(skip_locked=True)``, so several workers share
+  the load without sending twice, marks them sent and queues their emails
+  in the outbox already claimed, all in one transaction;
+* the emails are then sent with ``send_batch`` over the worker's
+  long-lived mail connection. Failures stay in the outbox, where
+  ``send_notifications`` retries them with backoff. When a whole batch
+  fails, the mail server is taken to be down and the worker backs off
+  before claiming more.
+
+When nothing is due the worker sleeps until the next reminder, found with
+one ``MIN()`` on the same index, instead of polling.
+"""
+import time as clock
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Reminder
+from .notifications import queue_notifications, retry_delay, send_batch
+
+# Appointments in these statuses are reminded of
+REMINDED_STATUSES = {'pending', 'confirmed'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def lead_minutes():
+    """Lead times of the reminders, in minutes before the appointment."""
+    return _setting('APPOINTMENTS_REMINDER_LEAD_MINUTES', [24 * 60])
+
+
+def starts_at(appointment):
+    """Aware start of an appointment; untimed ones start at midnight."""
+    return timezone.make_aware(
+        datetime.combine(appointment.date_field, appointment.time_field or time.min)
+    )
+
+
+def wanted_reminders(appointment, now):
+    """Return ``{lead_minutes: reminder_at}`` for the appointment's future reminders."""
+    if not (appointment.email and appointment.date_field
+            and appointment.status in REMINDED_STATUSES):
+        return {}
+    start = starts_at(appointment)
+    wanted = {lead: start - timedelta(minutes=lead) for lead in lead_minutes()}
+    return {lead: at for lead, at in wanted.items() if at > now}
+
+
+def sync_reminders(appointments):
+    """
+    Create, reschedule or drop the reminders of saved appointments.
+
+    Costs one query to read the existing reminders plus one per kind of
+    change, however many appointments are given.
+    """
+    appointments = [a for a in appointments if a.pk is not None]
+    if not appointments:
+        return
+    now = timezone.now()
+    existing = {}
+    for reminder in Reminder.objects.filter(appointment__in=[a.pk for a in appointments]):
+        existing[reminder.appointment_id, reminder.lead_minutes] = reminder
+
+    to_create, to_update = [], []
+    for appointment in appointments:
+        wanted = wanted_reminders(appointment, now)
+        for lead, reminder_at in wanted.items():
+            reminder = existing.pop((appointment.pk, lead), None)
+            if reminder is None:
+                to_create.append(Reminder(appointment=appointment, lead_minutes=lead,
+                                          reminder_at=reminder_at))
+            elif reminder.reminder_at != reminder_at:
+                # Rescheduled: remind again at the new time
+                reminder.reminder_at = reminder_at
+                reminder.sent = False
+                reminder.sent_at = None
+                to_update.append(reminder)
+    # Reminders no longer wanted; sent ones are kept as a record
+    to_delete = [reminder.pk for reminder in existing.values() if not reminder.sent]
+    if not (to_create or to_update or to_delete):
+        return
+
+    with transaction.atomic():
+        if to_create:
+            # A concurrent save of the same appointment may create them first
+            Reminder.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_update:
+            Reminder.objects.bulk_update(to_update, ['reminder_at', 'sent', 'sent_at'])
+        if to_delete:
+            Reminder.objects.filter(pk__in=to_delete).delete()
+
+
+def due_reminders(now=None):
+    """Unsent reminders due at ``now``, oldest first."""
+    now = now or timezone.now()
+    return Reminder.objects.filter(sent=False, reminder_at__lte=now).order_by('reminder_at', 'id')
+
+
+def next_due_at():
+    """When the earliest unsent reminder is due, or None."""
+    return Reminder.objects.filter(sent=False).aggregate(next=Min('reminder_at'))['next']
+
+
+def claim_due(batch_size, now=None):
+    """
+    Claim up to ``batch_size`` due reminders.
+
+    The reminders are marked sent and their emails created in the outbox,
+    already claimed for this worker, in one transaction. Returns the number
+    of reminders claimed and the emails to send.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        batch = list(
+            due_reminders(now).select_for_update(skip_locked=True, of=('self',))
+            .select_related('appointment')[:batch_size]
+        )
+        if not batch:
+            return 0, []
+        Reminder.objects.filter(pk__in=[r.pk for r in batch]).update(sent=True, sent_at=now)
+        # One email per appointment, even when several leads are due at once
+        appointments = list({r.appointment_id: r.appointment for r in batch}.values())
+        return len(batch), queue_notifications(appointments, 'reminder', claimed=True)
+
+
+def dispatch(batch_size=None, connection=None):
+    """Claim and send one batch of due reminders; return ``(claimed, sent, failed)``."""
+    batch_size = batch_size or _setting('APPOINTMENTS_REMINDER_BATCH_SIZE', 500)
+    claimed, emails = claim_due(batch_size)
+    if not emails:
+        return claimed, 0, 0
+    sent, failed = send_batch(emails, connection=connection)
+    return claimed, sent, failed
+
+
+def seconds_until_due(max_wait):
+    """Seconds to sleep until the next reminder is due, at most ``max_wait``."""
+    next_at = next_due_at()
+    if next_at is None:
+        return max_wait
+    return min(max((next_at - timezone.now()).total_seconds(), 0), max_wait)
+
+
+def run(batch_size=None, max_wait=60, connection=None, once=False, report=None):
+    """
+    Dispatch reminders until interrupted (or, with ``once``, until none is due).
+
+    ``connection`` is kept open while there is work and closed while idle
+    or after a failure, so a dropped SMTP session is reopened on demand.
+    After a batch in which nothing could be sent the worker sleeps for
+    ``retry_delay``, growing with each such batch in a row (with ``once``,
+    it returns instead).
+    ``report`` is called with ``(claimed, sent, failed)`` after each batch.
+    """
+    outages = 0
+    while True:
+        claimed, sent, failed = dispatch(batch_size, connection)
+        if claimed:
+            if report:
+                report(claimed, sent, failed)
+            if failed and connection is not None:
+                connection.close()
+            if failed and not sent:
+                outages += 1
+                if once:
+                    return
+                clock.sleep(retry_delay(outages).total_seconds())
+            else:
+                outages = 0
+            continue
+        if connection is not None:
+            connection.close()
+        if once:
+            return
+        clock.sleep(seconds_until_due(max_wait))
@@ -0,0 +1,202 @@
+"""
+Full-text search backends for appointments.
+
+The backend is chosen by the ``APPOINTMENTS_SEARCH_BACKEND`` setting (a
+dotted path). When it is unset, the backend is picked from the database
+vendor: SQLite uses an FTS5 index kept in sync by triggers, PostgreSQL uses
+a GIN-indexed ``to_tsvector`` expression, and anything else falls back to
+``icontains`` lookups.
+
+All backends match every word of the query as a prefix across the searched
+fields, so "jo smi" finds "John Smith".
+"""
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Fields covered by the search index, in index column order, with their
+# PostgreSQL weight class (A ranks highest).
+SEARCH_FIELDS = [
+    'first_name',
+    'last_name',
+    'email',
+    'appointment_title',
+    'appointment_description',
+]
+SEARCH_WEIGHTS = {
+    'first_name': 'A',
+    'last_name': 'A',
+    'email': 'B',
+    'appointment_title': 'A',
+    'appointment_description': 'C',
+}
+# PostgreSQL's default ts_rank weights, reused for SQLite's bm25().
+WEIGHT_VALUES = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+FTS_TABLE = 'project_app_appointment_fts'
+APPOINTMENT_TABLE = 'project_app_appointment'
+
+# Must match the expression of the GIN index created in
+# install_search_index(), otherwise PostgreSQL will not use the index.
+# Columns are qualified: searched querysets may join auth_user (the admin's
+# list_select_related), which has first_name, last_name and email too.
+# PostgreSQL stores index expressions as column references, so indexes
+# created before the qualification still match.
+POSTGRES_DOCUMENT = '({})'.format(' || '.join(
+    f"setweight(to_tsvector('english', coalesce(\"{APPOINTMENT_TABLE}\".\"{field}\", '')), "
+    f"'{SEARCH_WEIGHTS[field]}')"
+    for field in SEARCH_FIELDS
+))
+POSTGRES_INDEX = 'appt_search_gin_idx'
+
+_columns = ', '.join(SEARCH_FIELDS)
+_new_columns = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+_old_columns = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_columns}, content='{APPOINTMENT_TABLE}', content_rowid='id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {APPOINTMENT_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_columns}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {APPOINTMENT_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) "
+    f"VALUES ('delete', old.id, {_old_columns}); END",
+    # Only edits of the indexed columns re-index a row (not status changes);
+    # dropped first so reinstalling replaces a trigger firing on any update
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON {APPOINTMENT_TABLE} BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) "
+    f"VALUES ('delete', old.id, {_old_columns}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_columns}); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def _ordering(queryset):
+    return queryset.query.order_by or queryset.model._meta.ordering
+
+
+def search_terms(query):
+    """Split a search query into the words that are matched as prefixes."""
+    return re.findall(r'\w+', query or '')
+
+
+class IContainsSearchBackend:
+    """Portable fallback: OR of ``icontains`` lookups over every field."""
+
+    def search(self, queryset, query, ranked=False):
+        """Filter ``queryset`` to appointments matching ``query``."""
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+
+
+class SQLiteFTSSearchBackend(IContainsSearchBackend):
+    """SQLite FTS5 index over the searched fields, synced by triggers."""
+
+    def weights(self):
+        return ', '.join(
+            str(WEIGHT_VALUES[SEARCH_WEIGHTS[field]]) for field in SEARCH_FIELDS
+        )
+
+    def match_expression(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, query, ranked=False):
+        terms = search_terms(query)
+        if not terms:
+            return super().search(queryset, query)
+        match = self.match_expression(terms)
+        queryset = queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [match],
+        ))
+        if ranked:
+            # bm25() is lower-is-better; negate it so higher ranks first.
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, {self.weights()}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = {APPOINTMENT_TABLE}.id',
+                [match],
+                output_field=FloatField(),
+            )).order_by('-search_rank', *_ordering(queryset))
+        return queryset
+
+
+class PostgresSearchBackend(IContainsSearchBackend):
+    """PostgreSQL full-text search against a GIN expression index."""
+
+    def tsquery(self, terms):
+        return ' & '.join(f"'{term}':*" for term in terms)
+
+    def search(self, queryset, query, ranked=False):
+        terms = search_terms(query)
+        if not terms:
+            return super().search(queryset, query)
+        tsquery = self.tsquery(terms)
+        queryset = queryset.filter(RawSQL(
+            f"{POSTGRES_DOCUMENT} @@ to_tsquery('english', %s)",
+            [tsquery],
+            output_field=BooleanField(),
+        ))
+        if ranked:
+            queryset = queryset.annotate(search_rank=RawSQL(
+                f"ts_rank({POSTGRES_DOCUMENT}, to_tsquery('english', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )).order_by('-search_rank', *_ordering(queryset))
+        return queryset
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using='default'):
+    """Return the configured search backend for database ``using``."""
+    path = getattr(settings, 'APPOINTMENTS_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    vendor = connections[using].vendor
+    return VENDOR_BACKENDS.get(vendor, IContainsSearchBackend)()
+
+
+def install_search_index(schema_editor):
+    """
+    Create the vendor-specific search index (used by migrations).
+
+    SQLite drops triggers when Django rebuilds a table to alter it, so a
+    migration that rebuilds the appointment table must call this again.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQLITE_INSTALL:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} '
+            f'ON {APPOINTMENT_TABLE} USING GIN ({POSTGRES_DOCUMENT})'
+        )
+
+
+def uninstall_search_index(schema_editor):
+    """Drop the vendor-specific search index (used by migrations)."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for sql in SQLITE_UNINSTALL:
+            schema_editor.execute(sql)
+    elif vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {POSTGRES_INDEX}')
@@ -0,0 +1,97 @@
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import stats
+from .reminders import sync_reminders
+from .caching import bump_version
+from .changefeed import publish_appointment
+from .models import STATS_KEY_FIELDS, Appointment, Recurrence, RecurrenceException, WorkingHours
+
+
+def _invalidate(owner_id):
+    bump_version(owner_id)
+    if connection.in_atomic_block:
+        # Bump again on commit: a concurrent request may have cached the
+        # pre-commit rows under the version bumped above.
+        transaction.on_commit(lambda: bump_version(owner_id))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=WorkingHours)
+@receiver(post_delete, sender=WorkingHours)
+def invalidate_owner_cache(sender, instance, **kwargs):
+    """Invalidate cached data derived from the owner's appointments or hours."""
+    _invalidate(instance.owner_id)
+
+
+@receiver(post_save, sender=Recurrence)
+@receiver(post_delete, sender=Recurrence)
+@receiver(post_save, sender=RecurrenceException)
+@receiver(post_delete, sender=RecurrenceException)
+def invalidate_series_owner_cache(sender, instance, **kwargs):
+    """
+    Invalidate the series owner's cached data when a series changes.
+
+    The appointment's ``updated_at`` is touched too, as the ETags of the
+    pages showing its occurrences are derived from it.
+    """
+    if sender is Recurrence:
+        appointment = Appointment.objects.filter(pk=instance.appointment_id)
+    else:
+        appointment = Appointment.objects.filter(recurrence=instance.recurrence_id)
+    appointment.update(updated_at=timezone.now())
+    _invalidate(appointment.values_list('owner_id', flat=True).first())
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_stats_key(sender, instance, raw=False, **kwargs):
+    """Fetch the stored statistics key of instances not loaded from the database."""
+    if raw or instance.pk is None or getattr(instance, '_stored_stats_key', None):
+        return
+    instance._stored_stats_key = Appointment.objects.filter(pk=instance.pk).values_list(
+        *STATS_KEY_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=Appointment)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """Move the appointment's dashboard count to its new owner/date/status."""
+    if raw:
+        return
+    new_key = stats.stats_key(instance)
+    stats.record_change(None if created else getattr(instance, '_stored_stats_key', None),
+                        new_key)
+    instance._stored_stats_key = new_key
+
+
+@receiver(post_delete, sender=Appointment)
+def update_stats_on_delete(sender, instance, origin=None, **kwargs):
+    """Remove a deleted appointment from its owner's dashboard counts."""
+    # Appointments deleted along with their owner take the statistics with them
+    if not (isinstance(origin, Appointment) or getattr(origin, 'model', None) is Appointment):
+        return
+    stats.record_change(getattr(instance, '_stored_stats_key', None) or stats.stats_key(instance),
+                        None)
+
+
+@receiver(post_save, sender=Appointment)
+def schedule_reminders(sender, instance, raw=False, **kwargs):
+    """Create or reschedule the appointment's email reminders."""
+    if not raw:
+        sync_reminders([instance])
+
+
+@receiver(post_save, sender=Appointment)
+def publish_saved(sender, instance, raw=False, **kwargs):
+    """Stream the saved appointment to the owner's open pages."""
+    if not raw:
+        publish_appointment(instance)
+
+
+@receiver(post_delete, sender=Appointment)
+def publish_deleted(sender, instance, **kwargs):
+    """Stream the deletion to the owner's open pages."""
+    publish_appointment(instance, deleted=True)
@@ -0,0 +1,229 @@
+"""
+Per-owner dashboard statistics, maintained incrementally.
+
+``OwnerStats`` holds each owner's appointment count per status and
+``OwnerDayStats`` the count per (date, status). Rather than aggregating the
+appointments table, every change applies a delta: an appointment moving
+from (owner, date, status) A to B decrements A's counters and increments
+B's with ``F()`` updates.
+
+* ``post_save``/``post_delete`` apply the deltas of single saves and
+  deletes (see ``signals.py``), including ``update_status``;
+  ``Appointment.from_db`` remembers the stored key so an update costs no
+  extra query.
+* Bulk writes bypass the signals and call ``record_created`` or
+  ``apply_deltas`` themselves.
+* ``rebuild`` (``manage.py rebuild_stats``) recomputes everything with
+  two GROUP BY queries, to repair drift.
+
+Day rows that reach zero are deleted, so an owner has rows only for the
+days they have appointments on. ``dashboard`` is then one primary-key
+lookup plus one sum over the coming week's rows and those of past days
+with appointments still pending or confirmed (the overdue ones).
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import STATS_KEY_FIELDS, Appointment, OwnerDayStats, OwnerStats
+
+STATUSES = [status for status, _ in Appointment.STATUS_CHOICES]
+# Past-dated appointments in these statuses are overdue
+OPEN_STATUSES = ['pending', 'confirmed']
+
+# Databases supporting INSERT ... ON CONFLICT DO UPDATE; others apply
+# the deltas one row at a time
+UPSERT_VENDORS = {'sqlite', 'postgresql'}
+UPSERT_BATCH_SIZE = 500
+
+
+def stats_key(appointment):
+    """Return the ``(owner_id, date_field, status)`` an appointment counts under."""
+    return tuple(getattr(appointment, name) for name in STATS_KEY_FIELDS)
+
+
+def _increment(model, lookup, counts, values=None):
+    """Add ``counts`` to the fields of the ``lookup`` row, creating it if missing."""
+    values = values or {}
+    updates = dict({field: F(field) + n for field, n in counts.items()}, **values)
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **counts, **values)
+    except IntegrityError:
+        # Created concurrently
+        model.objects.filter(**lookup).update(**updates)
+
+
+def _upsert(model, key_fields, count_fields, rows, set_fields=()):
+    """
+    Add the counts of ``rows`` (dicts) to their rows with INSERT ... ON CONFLICT.
+
+    ``set_fields`` are overwritten rather than added to. One statement per
+    ``UPSERT_BATCH_SIZE`` rows, however many keys change.
+    """
+    meta = model._meta
+    quote = connection.ops.quote_name
+    fields = [meta.get_field(name) for name in key_fields + count_fields + list(set_fields)]
+    table = quote(meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    conflict = ', '.join(quote(meta.get_field(name).column) for name in key_fields)
+    updates = ', '.join([
+        f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}'
+        for column in (meta.get_field(name).column for name in count_fields)
+    ] + [
+        f'{quote(column)} = excluded.{quote(column)}'
+        for column in (meta.get_field(name).column for name in set_fields)
+    ])
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = [
+                field.get_db_prep_save(row[field.attname], connection)
+                for row in batch for field in fields
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {updates}',
+                params,
+            )
+
+
+def apply_deltas(deltas):
+    """Apply ``{(owner_id, date, status): change}`` to the statistics tables."""
+    deltas = {
+        key: change for key, change in deltas.items()
+        if change and key[0] is not None and key[2] in STATUSES
+    }
+    by_owner = defaultdict(Counter)
+    for (owner_id, _, status), change in deltas.items():
+        by_owner[owner_id][status] += change
+    now = timezone.now()
+    owner_rows = [
+        dict({status: counts[status] for status in STATUSES}, owner_id=owner_id, updated_at=now)
+        for owner_id, counts in sorted(by_owner.items())
+    ]
+    day_rows = [
+        {'owner_id': owner_id, 'date_field': day, 'status': status, 'count': change}
+        for (owner_id, day, status), change in sorted(deltas.items(), key=str)
+        if day is not None
+    ]
+    with transaction.atomic():
+        if connection.vendor in UPSERT_VENDORS:
+            _upsert(OwnerStats, ['owner_id'], STATUSES, owner_rows, set_fields=['updated_at'])
+            _upsert(OwnerDayStats, ['owner_id', 'date_field', 'status'], ['count'], day_rows)
+        else:
+            for row in owner_rows:
+                _increment(OwnerStats, {'owner_id': row['owner_id']},
+                           {status: row[status] for status in STATUSES if row[status]},
+                           {'updated_at': now})
+            for row in day_rows:
+                _increment(OwnerDayStats, {'owner_id': row['owner_id'],
+                                           'date_field': row['date_field'],
+                                           'status': row['status']}, {'count': row['count']})
+        _prune([row for row in day_rows if row['count'] < 0])
+
+
+def _prune(decremented):
+    """Delete the day rows that ``decremented`` brought to zero."""
+    if not decremented:
+        return
+    # Any zero row of these owners and days may go, touched or not
+    OwnerDayStats.objects.filter(
+        owner_id__in={row['owner_id'] for row in decremented},
+        date_field__in={row['date_field'] for row in decremented},
+        count=0,
+    ).delete()
+
+
+def record_change(old_key, new_key):
+    """Move one appointment's count from ``old_key`` to ``new_key`` (either may be None)."""
+    if old_key == new_key:
+        return
+    deltas = Counter()
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    apply_deltas(deltas)
+
+
+def record_created(appointments):
+    """Count appointments inserted with ``bulk_create``."""
+    apply_deltas(Counter(stats_key(appointment) for appointment in appointments))
+
+
+def rebuild(owner_ids=None):
+    """
+    Recompute the statistics from the appointments table.
+
+    Limited to ``owner_ids`` if given. Returns the number of owners rebuilt.
+    """
+    appointments = Appointment.objects.filter(owner__isnull=False)
+    owner_stats = OwnerStats.objects.all()
+    day_stats = OwnerDayStats.objects.all()
+    if owner_ids is not None:
+        appointments = appointments.filter(owner_id__in=owner_ids)
+        owner_stats = owner_stats.filter(owner_id__in=owner_ids)
+        day_stats = day_stats.filter(owner_id__in=owner_ids)
+
+    totals = {}
+    for row in appointments.order_by().values('owner_id', 'status').annotate(n=Count('id')):
+        if row['status'] in STATUSES:
+            totals.setdefault(row['owner_id'], {})[row['status']] = row['n']
+    days = (
+        appointments.filter(date_field__isnull=False).order_by()
+        .values('owner_id', 'date_field', 'status').annotate(n=Count('id'))
+        .iterator(chunk_size=5000)
+    )
+    with transaction.atomic():
+        owner_stats.delete()
+        day_stats.delete()
+        OwnerStats.objects.bulk_create(
+            [OwnerStats(owner_id=owner_id, **counts) for owner_id, counts in totals.items()],
+            batch_size=1000,
+        )
+        batch = []
+        for row in days:
+            if row['status'] not in STATUSES:
+                continue
+            batch.append(OwnerDayStats(owner_id=row['owner_id'], date_field=row['date_field'],
+                                       status=row['status'], count=row['n']))
+            if len(batch) >= 5000:
+                OwnerDayStats.objects.bulk_create(batch)
+                batch = []
+        OwnerDayStats.objects.bulk_create(batch)
+    return len(totals)
+
+
+def dashboard(owner_id, today=None):
+    """
+    Return an owner's dashboard figures.
+
+    ``status_counts`` is a list of ``(status, label, count)``; ``upcoming``
+    counts non-cancelled appointments in the next seven days, today
+    included, and ``overdue`` pending or confirmed ones dated before today.
+    """
+    today = today or timezone.now().date()
+    week_end = today + timedelta(days=6)
+    counts = OwnerStats.objects.filter(owner_id=owner_id).values(*STATUSES).first() or {}
+    figures = OwnerDayStats.objects.filter(owner_id=owner_id).filter(
+        Q(date_field__range=(today, week_end)) | Q(date_field__lt=today, status__in=OPEN_STATUSES)
+    ).aggregate(
+        upcoming=Sum('count', filter=Q(date_field__gte=today) & ~Q(status='cancelled')),
+        overdue=Sum('count', filter=Q(date_field__lt=today)),
+    )
+    return {
+        'status_counts': [
+            (status, label, counts.get(status, 0))
+            for status, label in Appointment.STATUS_CHOICES
+        ],
+        'total': sum(counts.get(status, 0) for status in STATUSES),
+        'upcoming': figures['upcoming'] or 0,
+        'overdue': figures['overdue'] or 0,
+    }
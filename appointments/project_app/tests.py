@@ -1,9 +1,42 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.db import connection
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.utils import timezone
 from django.contrib.auth.models import User
-from datetime import date, time, timedelta
-from .models import Appointment
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+import json
+import tempfile
+from unittest import mock
+from pathlib import Path
+from .models import (
+    Appointment, OutboundEmail, OwnerDayStats, OwnerStats, Recurrence, RecurrenceException,
+    Reminder, WorkingHours,
+)
+from .notifications import (
+    Notification, get_notification_template, outbox_stats, process_outbox,
+    send_appointment_notification,
+)
+from .availability import busy_intervals, subtract
+from .calendar_data import CALENDAR_FIELDS, month_data
+from .conflicts import DaySchedule, find_conflicts, interval, load_schedules
+from .export import export_lines
 from .forms import AppointmentForm, UserRegistrationForm
+from .importer import AppointmentRowCleaner
+from .instrumentation import registry as metrics_registry
+from .pagination import KeysetPaginator
+from .recurrence import clean_rule, occurrences
+from .reminders import claim_due, dispatch, run as run_reminders, sync_reminders
+from . import reminders
+from . import stats
 
 
 class AppointmentModelTests(TestCase):
@@ -237,6 +270,65 @@ class ViewTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'appointment_files/calendar.html')
 
+    def test_calendar_view_month_boundaries(self):
+        """Test the calendar includes the first and last day of the month."""
+        first = Appointment.objects.create(
+            owner=self.user, first_name='Ann', last_name='First',
+            appointment_title='First Day', date_field=date(2030, 2, 1),
+        )
+        last = Appointment.objects.create(
+            owner=self.user, first_name='Bob', last_name='Last',
+            appointment_title='Last Day', date_field=date(2030, 2, 28),
+        )
+        Appointment.objects.create(
+            owner=self.user, first_name='Cy', last_name='Next',
+            appointment_title='Next Month', date_field=date(2030, 3, 1),
+        )
+        response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 2})
+        by_date = response.context['appointments_by_date']
+        self.assertEqual([a['id'] for a in by_date[1]], [first.pk])
+        self.assertEqual([a['id'] for a in by_date[28]], [last.pk])
+        self.assertEqual(len(by_date), 2)
+
+    def test_calendar_view_cells(self):
+        """Test that each day cell carries only its own appointments."""
+        Appointment.objects.create(
+            owner=self.user, first_name='Ann', last_name='Early',
+            appointment_title='Morning', date_field=date(2030, 2, 5),
+            time_field=time(9, 0),
+        )
+        Appointment.objects.create(
+            owner=self.user, first_name='Bob', last_name='Late',
+            appointment_title='Evening', date_field=date(2030, 2, 5),
+            time_field=time(17, 0),
+        )
+        # The ETag state, the month's rows and the recurring series to expand
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 2})
+        cells = {cell['day']: cell for week in response.context['weeks'] for cell in week}
+        self.assertEqual(
+            [a['appointment_title'] for a in cells[5]['appointments']],
+            ['Morning', 'Evening']
+        )
+        self.assertEqual(cells[6]['appointments'], [])
+        self.assertEqual(set(cells[5]['appointments'][0]), set(CALENDAR_FIELDS))
+        self.assertContains(response, 'Morning', count=2)  # title attribute and text
+
+    @override_settings(APPOINTMENTS_CALENDAR_MAX_APPOINTMENTS=1)
+    def test_calendar_view_counts_only(self):
+        """Test that dense months only show per-day counts."""
+        for title in ('One', 'Two'):
+            Appointment.objects.create(
+                owner=self.user, first_name='Ann', last_name='Busy',
+                appointment_title=title, date_field=date(2030, 2, 5),
+            )
+        response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 2})
+        self.assertTrue(response.context['counts_only'])
+        self.assertEqual(response.context['total'], 2)
+        self.assertContains(response, '2 appointments')
+        self.assertContains(response, '?date=2030-02-05')
+        self.assertNotContains(response, 'Two')
+
     def test_search_appointments(self):
         """Test searching appointments."""
         response = self.client.get(reverse('view'), {'search': 'John'})
@@ -384,3 +476,2222 @@ class AppointmentCRUDTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.appointment.refresh_from_db()
         self.assertEqual(self.appointment.status, 'confirmed')
+
+
+
+class OwnershipTests(TestCase):
+    """Tests for the ownership-scoped appointment lookups."""
+
+    def setUp(self):
+        """Create two users with an appointment each, and an unowned one."""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        fields = {'first_name': 'John', 'last_name': 'Doe', 'date_field': date(2030, 2, 5)}
+        self.own = Appointment.objects.create(owner=self.user, appointment_title='Own', **fields)
+        self.others = Appointment.objects.create(owner=self.other, appointment_title='Other', **fields)
+        self.unowned = Appointment.objects.create(appointment_title='Unowned', **fields)
+
+    def request(self, user):
+        """Return a request made by ``user``."""
+        from django.test import RequestFactory
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_for_user(self):
+        """Test that users may change their own and unowned appointments."""
+        from django.contrib.auth.models import AnonymousUser
+        self.assertQuerysetEqual(Appointment.objects.for_user(self.user).order_by('pk'),
+                                 [self.own, self.unowned])
+        self.assertQuerysetEqual(Appointment.objects.for_user(AnonymousUser()), [self.unowned])
+
+    def test_editable_appointment_one_query(self):
+        """Test that an allowed lookup, owner included, is one query."""
+        from django.http import Http404
+        from .views import editable_appointment
+        request = self.request(self.user)
+        for appointment in [self.own, self.unowned]:
+            with self.assertNumQueries(1):
+                found = editable_appointment(request, appointment.pk)
+                self.assertEqual(found, appointment)
+                self.assertEqual(found.owner, appointment.owner)
+        with self.assertNumQueries(2):
+            self.assertIsNone(editable_appointment(request, self.others.pk))
+        with self.assertRaises(Http404):
+            editable_appointment(request, self.unowned.pk + 100)
+
+    def test_views_refuse_other_owners(self):
+        """Test that the edit, delete and status views refuse other owners' appointments."""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('appointment_edit', args=[self.others.pk]))
+        self.assertRedirects(response, reverse('view'), fetch_redirect_response=False)
+        self.client.post(reverse('appoint_remove', args=[self.others.pk]))
+        self.assertTrue(Appointment.objects.filter(pk=self.others.pk).exists())
+        response = self.client.post(reverse('update_status', args=[self.others.pk]),
+                                    {'status': 'confirmed'})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post(reverse('update_status', args=[self.unowned.pk + 100]),
+                                    {'status': 'confirmed'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_update_status_queries(self):
+        """Test that a status update does not load the owner separately."""
+        self.client.login(username='testuser', password='testpass123')
+        url = reverse('update_status', args=[self.own.pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'status': 'confirmed'})
+        self.assertEqual(response.json()['status'], 'Confirmed')
+        user_table = User._meta.db_table
+        user_queries = [q['sql'] for q in queries
+                        if q['sql'].startswith('SELECT') and f'FROM "{user_table}"' in q['sql']]
+        # Only the session's user is loaded
+        self.assertEqual(len(user_queries), 1)
+
+    def test_admin_queryset(self):
+        """Test that staff see their own and unowned appointments in the admin."""
+        from django.contrib.admin.sites import site
+        model_admin = site._registry[Appointment]
+        staff = self.request(self.user)
+        self.assertQuerysetEqual(model_admin.get_queryset(staff).order_by('pk'),
+                                 [self.own, self.unowned])
+        self.user.is_superuser = True
+        self.assertEqual(model_admin.get_queryset(staff).count(), 3)
+
+
+class StatusTransitionTests(TestCase):
+    """Tests for the appointment status transitions."""
+
+    def setUp(self):
+        """Create a logged-in owner with a pending appointment."""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            appointment_title='Test Appointment',
+            date_field=date.today() + timedelta(days=1),
+        )
+        self.url = reverse('update_status', args=[self.appointment.pk])
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_transition_saves_status_only(self):
+        """Test that a transition updates the status and updated_at columns only."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.appointment.transition_to('confirmed'))
+        [update] = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "project_app_appointment"')]
+        self.assertIn('"status"', update)
+        self.assertIn('"updated_at"', update)
+        self.assertNotIn('"first_name"', update)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'confirmed')
+
+    def test_same_status_is_a_no_op(self):
+        """Test that repeating the current status writes nothing."""
+        with self.assertNumQueries(0):
+            self.assertFalse(self.appointment.transition_to('pending'))
+
+    async def test_async_transition(self):
+        """Test that the async transition saves the status, or refuses it."""
+        self.assertTrue(await self.appointment.atransition_to('confirmed'))
+        self.assertFalse(await self.appointment.atransition_to('confirmed'))
+        with self.assertRaises(ValidationError):
+            await self.appointment.atransition_to('pending')
+        stored = await Appointment.objects.aget(pk=self.appointment.pk)
+        self.assertEqual(stored.status, 'confirmed')
+
+    def test_stale_status_is_refused(self):
+        """Test that a transition checked against a stale status writes nothing."""
+        stale = Appointment.objects.get(pk=self.appointment.pk)
+        self.appointment.transition_to('cancelled')
+        # Pending may be confirmed, but the stored status is now cancelled
+        with self.assertRaisesMessage(ValidationError, 'was changed to cancelled'):
+            stale.transition_to('confirmed')
+        self.assertEqual(stale.status, 'cancelled')
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'cancelled')
+        counts = OwnerStats.objects.values_list('pending', 'confirmed', 'cancelled').get()
+        self.assertEqual(counts, (0, 0, 1))
+        self.assertFalse(Reminder.objects.exists())
+
+    def test_disallowed_transition(self):
+        """Test that a status the current one may not move to is refused."""
+        self.appointment.transition_to('cancelled')
+        with self.assertRaises(ValidationError):
+            self.appointment.transition_to('completed')
+        self.assertEqual(self.appointment.status, 'cancelled')
+        self.assertEqual(self.appointment.status_options,
+                         [('pending', 'Pending'), ('cancelled', 'Cancelled')])
+
+    def test_reactivation_checks_overlaps(self):
+        """Test that moving a cancelled appointment back refuses a taken slot."""
+        self.appointment.time_field = time(9, 0)
+        self.appointment.transition_to('cancelled')
+        self.appointment.save()
+        Appointment.objects.create(
+            owner=self.user, first_name='Jane', last_name='Doe', email='jane@example.com',
+            appointment_title='Rebooked', date_field=self.appointment.date_field,
+            time_field=time(9, 15),
+        )
+        with self.assertRaisesMessage(ValidationError, 'This time overlaps "Rebooked" at 09:15.'):
+            self.appointment.transition_to('pending')
+        self.assertEqual(self.appointment.status, 'cancelled')
+        response = self.client.post(self.url, {'status': 'pending'})
+        self.assertEqual(response.status_code, 409)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'cancelled')
+
+    async def test_async_reactivation_checks_overlaps(self):
+        """Test that the async transition also refuses a taken slot."""
+        self.appointment.time_field = time(9, 0)
+        self.appointment.status = 'cancelled'
+        await self.appointment.asave()
+        await Appointment.objects.acreate(
+            owner=self.user, first_name='Jane', last_name='Doe', email='jane@example.com',
+            appointment_title='Rebooked', date_field=self.appointment.date_field,
+            time_field=time(9, 15),
+        )
+        with self.assertRaises(ValidationError):
+            await self.appointment.atransition_to('pending')
+        stored = await Appointment.objects.aget(pk=self.appointment.pk)
+        self.assertEqual(stored.status, 'cancelled')
+
+    def test_admin_form_follows_status_transitions(self):
+        """Test that the admin form refuses a status the current one may not move to."""
+        from django.forms.models import model_to_dict
+        from .admin import AppointmentAdminForm
+        data = model_to_dict(self.appointment)
+        data['status'] = 'completed'
+        form = AppointmentAdminForm(data=data, instance=self.appointment)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['status'], ['A pending appointment cannot be completed.'])
+        data['status'] = 'confirmed'
+        self.assertTrue(AppointmentAdminForm(data=data, instance=self.appointment).is_valid())
+
+    def test_view_skips_email_when_unchanged(self):
+        """Test that a repeated status request answers without a write or an email."""
+        response = self.client.post(self.url, {'status': 'confirmed'})
+        self.assertEqual(response.json(), {'success': True, 'status': 'Confirmed', 'changed': True})
+        response = self.client.post(self.url, {'status': 'confirmed'})
+        self.assertEqual(response.json(), {'success': True, 'status': 'Confirmed', 'changed': False})
+        self.assertEqual(OutboundEmail.objects.filter(action='status_changed').count(), 1)
+
+    def test_view_refuses_disallowed_transition(self):
+        """Test that the view answers a disallowed transition with a 409."""
+        response = self.client.post(self.url, {'status': 'completed'})
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.json()['success'])
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'pending')
+
+    def test_detail_offers_allowed_statuses(self):
+        """Test that the detail page only offers the allowed statuses."""
+        response = self.client.get(reverse('appointmentsdetail', args=[self.appointment.pk]))
+        self.assertContains(response, '<option value="confirmed"')
+        self.assertNotContains(response, '<option value="completed"')
+
+
+class BulkStatusTests(TestCase):
+    """Tests for the bulk status transitions."""
+
+    def setUp(self):
+        """Create a logged-in owner with three pending and one completed appointment."""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.pending = [self.make(self.user, 'pending', day) for day in range(1, 4)]
+        self.completed = self.make(self.user, 'completed', 1)
+        self.others = self.make(self.other, 'pending', 1)
+        self.client.login(username='testuser', password='testpass123')
+
+    def make(self, owner, status, day):
+        return Appointment.objects.create(
+            owner=owner, first_name='John', last_name='Doe', email='john@example.com',
+            appointment_title='Checkup', date_field=date(2030, 2, day), time_field=time(9, 0),
+            status=status,
+        )
+
+    def stats_snapshot(self):
+        return list(OwnerStats.objects.values_list(
+            'owner_id', 'pending', 'confirmed', 'completed', 'cancelled'
+        ).order_by('owner_id'))
+
+    def test_bulk_transition(self):
+        """Test that the allowed appointments change with one UPDATE and one email batch."""
+        from .changefeed import broker
+        from .transitions import bulk_transition
+        subscription = broker.subscribe(self.user.pk)
+        self.addCleanup(broker.unsubscribe, subscription)
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            changed = bulk_transition(Appointment.objects.filter(owner=self.user), 'confirmed')
+        self.assertCountEqual(changed, self.pending)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "project_app_appointment"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Appointment.objects.filter(status='confirmed').count(), 3)
+        self.completed.refresh_from_db()
+        self.assertEqual(self.completed.status, 'completed')
+        self.assertEqual(OutboundEmail.objects.filter(action='status_changed').count(), 3)
+        self.assertEqual(subscription.get(0).name, 'reload')
+        incremental = self.stats_snapshot()
+        stats.rebuild()
+        self.assertEqual(incremental, self.stats_snapshot())
+
+    def test_concurrent_write_reconciled(self):
+        """Test that rows another write moves before the UPDATE get no side effects."""
+        from django.utils import timezone
+        from . import transitions
+        from .transitions import bulk_transition
+        moved = self.pending[0]
+        real_now = timezone.now
+
+        def now():
+            # Another request cancels one selected row before the UPDATE runs
+            Appointment.objects.filter(pk=moved.pk).update(status='cancelled')
+            return real_now()
+        with mock.patch.object(transitions.timezone, 'now', now):
+            changed = bulk_transition(Appointment.objects.filter(owner=self.user), 'confirmed')
+        self.assertCountEqual(changed, self.pending[1:])
+        self.assertFalse(OutboundEmail.objects.filter(appointment=moved, action='status_changed').exists())
+        incremental = self.stats_snapshot()
+        stats.rebuild()
+        self.assertEqual(incremental, self.stats_snapshot())
+
+    def test_reactivation_skips_taken_slots(self):
+        """Test that cancelled appointments are not reactivated into a booked slot."""
+        from .transitions import bulk_transition
+        clash, free = self.pending[0], self.pending[1]  # completed also holds day 1 at 9:00
+        bulk_transition(Appointment.objects.filter(pk__in=[clash.pk, free.pk]), 'cancelled')
+        changed = bulk_transition(Appointment.objects.filter(pk__in=[clash.pk, free.pk]), 'pending')
+        self.assertEqual(changed, [free])
+        clash.refresh_from_db()
+        self.assertEqual(clash.status, 'cancelled')
+        with self.assertRaises(ValidationError):
+            clash.transition_to('pending')
+
+    def test_cancelled_drops_reminders(self):
+        """Test that cancelling in bulk drops the appointments' reminders."""
+        from .transitions import bulk_transition
+        self.assertTrue(Reminder.objects.filter(appointment=self.pending[0]).exists())
+        bulk_transition(Appointment.objects.filter(pk=self.pending[0].pk), 'cancelled')
+        self.assertFalse(Reminder.objects.filter(appointment=self.pending[0]).exists())
+
+    def test_view_skips_other_owners(self):
+        """Test that the list's bulk action changes only the user's ticked appointments."""
+        ids = [self.pending[0].pk, self.completed.pk, self.others.pk]
+        response = self.client.post(reverse('bulk_update_status'), {
+            'ids': ids, 'status': 'confirmed', 'next': reverse('view') + '?status=pending',
+        }, follow=True)
+        self.assertRedirects(response, reverse('view') + '?status=pending')
+        self.assertContains(response, '1 appointment marked confirmed.')
+        self.assertContains(response, '2 appointments could not be marked confirmed.')
+        statuses = dict(Appointment.objects.filter(pk__in=ids).values_list('pk', 'status'))
+        self.assertEqual(statuses, {self.pending[0].pk: 'confirmed', self.completed.pk: 'completed',
+                                    self.others.pk: 'pending'})
+
+    def test_view_counts_duplicate_ids_once(self):
+        """Test that an id posted twice is changed and counted once."""
+        response = self.client.post(reverse('bulk_update_status'), {
+            'ids': [self.pending[0].pk, self.pending[0].pk], 'status': 'confirmed',
+        }, follow=True)
+        self.assertContains(response, '1 appointment marked confirmed.')
+        self.assertNotContains(response, 'could not be marked')
+
+    def test_view_rejects_bad_requests(self):
+        """Test that an unknown status, no selection or an outside redirect are refused."""
+        url = reverse('bulk_update_status')
+        response = self.client.post(url, {'ids': [self.pending[0].pk], 'status': 'archived',
+                                          'next': 'https://example.com/'})
+        self.assertRedirects(response, reverse('view'), fetch_redirect_response=False)
+        self.client.post(url, {'status': 'confirmed'})
+        self.assertEqual(Appointment.objects.filter(status='confirmed').count(), 0)
+
+    def test_list_has_bulk_form(self):
+        """Test that the list offers the bulk form and a checkbox per row."""
+        response = self.client.get(reverse('view'))
+        self.assertContains(response, 'id="bulk-status-form"')
+        self.assertContains(response, f'name="ids" value="{self.pending[0].pk}"')
+
+    def test_admin_action(self):
+        """Test that the admin actions move the selected appointments."""
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('admin:project_app_appointment_changelist'), {
+            'action': 'mark_completed',
+            '_selected_action': [a.pk for a in self.pending],
+        }, follow=True)
+        self.assertContains(response, '0 of 3 selected appointments marked completed.')
+        self.client.post(reverse('admin:project_app_appointment_changelist'), {
+            'action': 'mark_confirmed',
+            '_selected_action': [a.pk for a in self.pending] + [self.others.pk],
+        })
+        self.assertEqual(Appointment.objects.filter(status='confirmed').count(), 4)
+
+class SearchBackendTests(TestCase):
+    """Tests for the full-text search backends."""
+
+    def setUp(self):
+        """Set up appointments to search."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.john = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Smith',
+            email='john.smith@example.com',
+            appointment_title='Dental Cleaning',
+            appointment_description='Routine cleaning and checkup',
+            date_field=date.today() + timedelta(days=1),
+        )
+        self.mary = Appointment.objects.create(
+            owner=self.user,
+            first_name='Mary',
+            last_name='Jones',
+            appointment_title='Eye Exam',
+            appointment_description='Annual dental referral follow-up',
+            date_field=date.today() + timedelta(days=2),
+        )
+
+    def test_prefix_matching(self):
+        """Test that each word matches as a prefix across fields."""
+        self.assertEqual(list(Appointment.objects.search('jo smi')), [self.john])
+        self.assertEqual(list(Appointment.objects.search('exa')), [self.mary, self.john])
+        self.assertFalse(Appointment.objects.search('ohn').exists())
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test that the index stays in sync with the table."""
+        self.john.appointment_title = 'Physical Therapy'
+        self.john.save()
+        self.assertFalse(Appointment.objects.search('dental clean').exists())
+        self.assertEqual(list(Appointment.objects.search('therapy')), [self.john])
+
+        Appointment.objects.filter(pk=self.mary.pk).update(last_name='Brown')
+        self.assertEqual(list(Appointment.objects.search('brown')), [self.mary])
+
+        self.mary.delete()
+        self.assertFalse(Appointment.objects.search('brown').exists())
+
+    def test_status_update_skips_index(self):
+        """Test that updates of columns outside the index do not re-index the row."""
+        def changes(**fields):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT total_changes()')
+                before = cursor.fetchone()[0]
+                Appointment.objects.filter(pk=self.john.pk).update(**fields)
+                cursor.execute('SELECT total_changes()')
+                return cursor.fetchone()[0] - before
+        self.assertEqual(changes(status='confirmed'), 1)
+        self.assertGreater(changes(appointment_title='Physical Therapy'), 1)
+
+    def test_ranked_results(self):
+        """Test that ranked search orders the best match first."""
+        results = list(Appointment.objects.search('dental', ranked=True))
+        self.assertEqual(results, [self.john, self.mary])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_query_without_words_falls_back(self):
+        """Test that punctuation-only queries use substring matching."""
+        self.assertEqual(list(Appointment.objects.search('.smith@')), [self.john])
+
+    def test_postgres_document_survives_owner_join(self):
+        """Test that the PostgreSQL search names appointment columns unambiguously."""
+        from .search import PostgresSearchBackend
+        queryset = PostgresSearchBackend().search(Appointment.objects.select_related('owner'), 'john')
+        sql = str(queryset.query)
+        self.assertIn('"project_app_appointment"."first_name"', sql)
+        self.assertNotIn('coalesce(first_name', sql)
+
+    @override_settings(
+        APPOINTMENTS_SEARCH_BACKEND='project_app.search.IContainsSearchBackend'
+    )
+    def test_configured_backend(self):
+        """Test that the backend can be chosen by setting."""
+        self.assertEqual(list(Appointment.objects.search('ohn')), [self.john])
+
+    def test_admin_search_uses_backend(self):
+        """Test that the admin changelist search uses the same backend."""
+        User.objects.create_superuser('admin', 'admin@example.com', 'adminpass123')
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(
+            reverse('admin:project_app_appointment_changelist'), {'q': 'jo smi'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [self.john])
+
+
+class KeysetPaginationTests(TestCase):
+    """Tests for cursor-based pagination of the appointment list."""
+
+    def setUp(self):
+        """Create appointments with shared dates, times and missing values."""
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        today = date.today()
+        dates = [today, today, today + timedelta(days=1), None, None]
+        times = [time(9, 0), None, time(9, 0)]
+        for i in range(23):
+            Appointment.objects.create(
+                owner=self.user,
+                first_name='John',
+                last_name='Doe',
+                appointment_title=f'Appointment {i}',
+                date_field=dates[i % len(dates)],
+                time_field=times[i % len(times)],
+            )
+        # Expected order: date and time descending with NULLs last, then id.
+        self.expected = sorted(
+            Appointment.objects.all(),
+            key=lambda a: (
+                a.date_field is not None, a.date_field or date.min,
+                a.time_field is not None, a.time_field or time.min,
+                a.pk,
+            ),
+            reverse=True,
+        )
+
+    def test_walk_forward_and_back(self):
+        """Test that next/previous cursors visit every row exactly once."""
+        paginator = KeysetPaginator(Appointment.objects.all(), 5)
+        page = paginator.get_page()
+        pages = [list(page)]
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            pages.append(list(page))
+        self.assertEqual([a for p in pages for a in p], self.expected)
+        self.assertEqual(len(pages), 5)
+
+        for expected in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual(list(page), expected)
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Test that a tampered cursor falls back to the first page."""
+        paginator = KeysetPaginator(Appointment.objects.all(), 5)
+        page = paginator.get_page('not-a-cursor')
+        self.assertEqual(list(page), self.expected[:5])
+
+    def test_deep_page_query_count(self):
+        """Test that a page costs the same queries wherever it is."""
+        paginator = KeysetPaginator(Appointment.objects.all(), 5)
+        cursor = paginator.make_cursor(self.expected[4])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(paginator.get_page(cursor)), self.expected[5:10])
+
+    def test_cached_count(self):
+        """Test that the cached count only queries once."""
+        paginator = KeysetPaginator(Appointment.objects.all(), 5, count='cached')
+        self.assertEqual(paginator.count, 23)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 23)
+
+    @override_settings(APPOINTMENTS_PAGINATION='keyset')
+    def test_list_view_keyset_mode(self):
+        """Test the list view with keyset pagination enabled."""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('view'))
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertTrue(response.context['cursor_pagination'])
+        self.assertContains(response, page.next_cursor)
+
+        response = self.client.get(reverse('view'), {'cursor': page.next_cursor})
+        self.assertEqual(list(response.context['page_obj']), self.expected[10:20])
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    """Local stand-in for SMTP that counts connections opened."""
+
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Stand-in for an SMTP server that rejects every message."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    """Stand-in for an SMTP server that cannot be connected to."""
+
+    def open(self):
+        raise ConnectionRefusedError('SMTP server unreachable')
+
+    def send_messages(self, email_messages):
+        raise AssertionError('send_messages called without a connection')
+
+
+class NotificationOutboxTests(TestCase):
+    """Tests for the queued notification outbox and its worker."""
+
+    def setUp(self):
+        """Set up a user and an appointment with an email address."""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            appointment_title='Test Appointment',
+            date_field=date.today() + timedelta(days=1),
+            status='pending'
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_views_queue_instead_of_sending(self):
+        """Test that a status change is queued, not sent in the request."""
+        self.client.post(
+            reverse('update_status', kwargs={'pk': self.appointment.pk}),
+            {'status': 'confirmed'}
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.action, 'status_changed')
+        self.assertEqual(email.recipient, 'john@example.com')
+        self.assertIn('Confirmed', email.body)
+
+    def test_repeated_edits_are_deduplicated(self):
+        """Test that pending emails for the same edit are rewritten."""
+        send_appointment_notification(self.appointment, 'updated')
+        self.appointment.appointment_title = 'Renamed Appointment'
+        send_appointment_notification(self.appointment, 'updated')
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.subject, 'Appointment Updated: Renamed Appointment')
+
+    @override_settings(EMAIL_BACKEND='project_app.tests.CountingEmailBackend')
+    def test_worker_sends_batch_over_one_connection(self):
+        """Test that one batch is sent over a single connection."""
+        for action in ('created', 'updated', 'status_changed'):
+            send_appointment_notification(self.appointment, action)
+        CountingEmailBackend.opened = 0
+        self.assertEqual(process_outbox(batch_size=10), (3, 0))
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+        self.assertEqual(process_outbox(batch_size=10), (0, 0))
+
+    @override_settings(
+        EMAIL_BACKEND='project_app.tests.FailingEmailBackend',
+        APPOINTMENTS_EMAIL_MAX_ATTEMPTS=2,
+        APPOINTMENTS_EMAIL_RETRY_DELAY=60,
+    )
+    def test_failures_retry_with_backoff(self):
+        """Test that failed sends back off and eventually give up."""
+        send_appointment_notification(self.appointment, 'created')
+        self.assertEqual(process_outbox(), (0, 1))
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('unavailable', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        # Not due yet
+        self.assertEqual(process_outbox(), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_outbox(), (0, 1))
+        self.assertEqual(OutboundEmail.objects.get().status, 'failed')
+
+    @override_settings(
+        EMAIL_BACKEND='project_app.tests.UnreachableEmailBackend',
+        APPOINTMENTS_EMAIL_RETRY_DELAY=60,
+    )
+    def test_connection_failure_reschedules_batch(self):
+        """Test that a connection failure reschedules the claimed batch."""
+        send_appointment_notification(self.appointment, 'created')
+        send_appointment_notification(self.appointment, 'status_changed')
+        with self.assertLogs('project_app.notifications', 'WARNING'):
+            self.assertEqual(process_outbox(), (0, 2))
+        for email in OutboundEmail.objects.all():
+            self.assertEqual((email.status, email.attempts), ('pending', 1))
+            self.assertIn('unreachable', email.last_error)
+            self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+
+        out = StringIO()
+        with self.assertLogs('project_app.notifications', 'WARNING'):
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            call_command('send_notifications', '--once', stdout=out)
+        self.assertEqual(OutboundEmail.objects.filter(attempts=2).count(), 2)
+
+    def test_stats_and_metrics_endpoint(self):
+        """Test queue-depth metrics and their staff-only endpoint."""
+        send_appointment_notification(self.appointment, 'created')
+        stats = outbox_stats()
+        self.assertEqual(stats['depth'], 1)
+        self.assertEqual(stats['by_status']['pending'], 1)
+
+        response = self.client.get(reverse('outbox_metrics'))
+        self.assertEqual(response.status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('outbox_metrics'))
+        self.assertEqual(response.json()['depth'], 1)
+
+    def test_send_notifications_command(self):
+        """Test that the worker command drains the outbox once."""
+        send_appointment_notification(self.appointment, 'created')
+        call_command('send_notifications', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['john@example.com'])
+
+
+class NotificationTemplateTests(TestCase):
+    """Tests for the compiled notification template registry."""
+
+    def setUp(self):
+        """Set up an unsaved appointment to render."""
+        self.appointment = Appointment(
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            appointment_title='Checkup & Cleaning',
+            date_field=date(2030, 1, 15),
+            time_field=time(9, 30),
+            status='confirmed'
+        )
+
+    def test_render_parts(self):
+        """Test the subject, text and HTML parts of a notification."""
+        notification = Notification(self.appointment, 'created')
+        self.assertEqual(notification.subject, 'New Appointment: Checkup & Cleaning')
+        self.assertIn('Hello John,', notification.body)
+        self.assertIn('Date: 2030-01-15', notification.body)
+        self.assertIn('Status: Confirmed', notification.body)
+        self.assertIn('Checkup &amp; Cleaning', notification.html_body)
+
+        status = Notification(self.appointment, 'status_changed')
+        self.assertIn('New Status: Confirmed', status.body)
+        self.assertNotIn('Date:', status.body)
+
+    def test_unknown_action_uses_generic_templates(self):
+        """Test the fallback for actions without their own templates."""
+        notification = Notification(self.appointment, 'unknown')
+        self.assertEqual(notification.subject, 'Appointment Notification')
+        self.assertEqual(notification.html_body, '')
+
+    def test_templates_compiled_once(self):
+        """Test that repeated renders reuse the compiled template."""
+        get_notification_template.cache_clear()
+        for _ in range(3):
+            Notification(self.appointment, 'updated').body
+        info = get_notification_template.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+    def test_locale_variant(self):
+        """Test that a language-specific template wins over the default."""
+        with tempfile.TemporaryDirectory() as directory:
+            variant = Path(directory, 'appointment_files', 'email', 'es')
+            variant.mkdir(parents=True)
+            (variant / 'created_subject.txt').write_text(
+                'Nueva cita: {{ appointment.appointment_title }}'
+            )
+            templates = [{
+                'BACKEND': 'django.template.backends.django.DjangoTemplates',
+                'DIRS': [directory],
+                'APP_DIRS': True,
+            }]
+            with override_settings(TEMPLATES=templates):
+                spanish = Notification(self.appointment, 'created', language='es-mx')
+                self.assertEqual(spanish.subject, 'Nueva cita: Checkup & Cleaning')
+                # Parts without a variant fall back to the default template
+                self.assertIn('Hello John,', spanish.body)
+                english = Notification(self.appointment, 'created', language='en')
+                self.assertEqual(english.subject, 'New Appointment: Checkup & Cleaning')
+
+    def test_worker_attaches_html_alternative(self):
+        """Test that queued emails are sent with their HTML part."""
+        self.appointment.save()
+        send_appointment_notification(self.appointment, 'created')
+        process_outbox()
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, 'New Appointment: Checkup & Cleaning')
+        self.assertEqual(message.alternatives[0][1], 'text/html')
+
+
+class CalendarCacheTests(TestCase):
+    """Tests for the versioned per-owner calendar cache."""
+
+    def setUp(self):
+        """Set up two owners and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            appointment_title='Cached Appointment',
+            date_field=date(2030, 2, 5),
+        )
+        self.params = {'year': 2030, 'month': 2}
+
+    def test_repeat_view_served_from_cache(self):
+        """Test that a repeated month does no appointment queries."""
+        self.client.get(reverse('calendar'), self.params)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('calendar'), self.params)
+        self.assertContains(response, 'Cached Appointment')
+
+    def test_save_and_delete_invalidate(self):
+        """Test that changing an appointment invalidates its months."""
+        self.client.get(reverse('calendar'), self.params)
+        self.appointment.appointment_title = 'Renamed Appointment'
+        self.appointment.save()
+        response = self.client.get(reverse('calendar'), self.params)
+        self.assertContains(response, 'Renamed Appointment')
+
+        self.appointment.delete()
+        response = self.client.get(reverse('calendar'), self.params)
+        self.assertNotContains(response, 'Renamed Appointment')
+
+    def test_other_owner_changes_keep_cache(self):
+        """Test that only the changed owner's months are invalidated."""
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(reverse('calendar'), self.params)
+        Appointment.objects.create(
+            owner=self.other,
+            first_name='Jane',
+            last_name='Roe',
+            appointment_title='Other Appointment',
+            date_field=date(2030, 2, 6),
+        )
+        with self.assertNumQueries(2):  # session and user only
+            response = self.client.get(reverse('calendar'), self.params)
+        self.assertContains(response, 'Cached Appointment')
+        self.assertNotContains(response, 'Other Appointment')
+
+
+class ConditionalGetTests(TestCase):
+    """Tests for ETag / Last-Modified support on the list, detail and calendar pages."""
+
+    def setUp(self):
+        """Set up a logged-in owner with one appointment and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            appointment_title='Conditional Appointment',
+            date_field=date(2030, 2, 5),
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.calendar_url = f"{reverse('calendar')}?year=2030&month=2"
+
+    def revalidate(self, url, **headers):
+        """Request ``url`` again with the validators of a first response."""
+        # Pages with forms set the CSRF cookie, part of the ETag, on first visit
+        self.client.get(url)
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return first, self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'], **headers)
+
+    def test_unchanged_pages_answered_with_304(self):
+        """Test that unchanged pages are answered with 304s without rendering."""
+        for url in [reverse('view'), self.calendar_url,
+                    reverse('appointmentsdetail', args=[self.appointment.pk])]:
+            first, second = self.revalidate(url)
+            self.assertEqual(second.status_code, 304, url)
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertEqual(second.templates, [])
+            self.assertIn('private', second['Cache-Control'])
+            self.assertIn('no-cache', second['Cache-Control'])
+
+    def test_revalidating_list_needs_no_appointment_query(self):
+        """Test that revalidating the list only loads the session and user."""
+        # The bulk status form sets the CSRF cookie on the first visit
+        self.client.get(reverse('view'))
+        first = self.client.get(reverse('view'))
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('view'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_varies_with_query_string(self):
+        """Test that filtered pages have their own ETags."""
+        first = self.client.get(reverse('view'))
+        response = self.client.get(reverse('view'), {'status': 'pending'},
+                                   HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_changes_etag(self):
+        """Test that editing an appointment changes the list and detail ETags."""
+        detail_url = reverse('appointmentsdetail', args=[self.appointment.pk])
+        list_etag = self.client.get(reverse('view'))['ETag']
+        detail_etag = self.client.get(detail_url)['ETag']
+        self.appointment.appointment_title = 'Renamed'
+        self.appointment.save()
+        response = self.client.get(reverse('view'), HTTP_IF_NONE_MATCH=list_etag)
+        self.assertContains(response, 'Renamed')
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertContains(response, 'Renamed')
+
+    def test_delete_changes_etag(self):
+        """Test that deleting an appointment changes the ETag though MAX(updated_at) does not."""
+        other = Appointment.objects.create(
+            owner=self.user, first_name='Ann', last_name='Early',
+            appointment_title='Deleted Appointment', date_field=date(2030, 2, 6),
+        )
+        # The older appointment becomes the most recently updated one
+        Appointment.objects.filter(pk=self.appointment.pk).update(
+            updated_at=other.updated_at + timedelta(seconds=1)
+        )
+        cache.clear()
+        etag = self.client.get(self.calendar_url)['ETag']
+        other.delete()
+        response = self.client.get(self.calendar_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Deleted Appointment')
+
+    def test_skipped_occurrence_changes_etag(self):
+        """Test that skipping an occurrence changes the calendar ETag."""
+        Recurrence.objects.create(appointment=self.appointment, rule='FREQ=WEEKLY')
+        etag = self.client.get(self.calendar_url)['ETag']
+        self.client.post(reverse('skip_occurrence', args=[self.appointment.pk, '2030-02-12']))
+        self.client.get(self.calendar_url)  # shows the flash message
+        response = self.client.get(self.calendar_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_varies_by_user(self):
+        """Test that another user's ETag does not match."""
+        first = self.client.get(reverse('view'))
+        User.objects.create_user(username='other', password='testpass123')
+        self.client.login(username='other', password='testpass123')
+        response = self.client.get(reverse('view'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_last_modified(self):
+        """Test that the detail page honours If-Modified-Since."""
+        url = reverse('appointmentsdetail', args=[self.appointment.pk])
+        first = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(self.client.get(reverse('view')).has_header('Last-Modified'))
+
+    def test_pending_messages_skip_304(self):
+        """Test that a page with a flash message is rendered rather than revalidated."""
+        etag = self.client.get(reverse('view'))['ETag']
+        # Editing redirects with a success message
+        response = self.client.post(
+            reverse('appointment_edit', args=[self.appointment.pk]),
+            {'first_name': 'John', 'last_name': 'Doe', 'email': '',
+             'appointment_title': 'Conditional Appointment', 'date_field': '2030-02-05',
+             'duration_minutes': 30, 'status': 'pending'},
+        )
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(reverse('view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class FragmentCacheTests(TestCase):
+    """Tests for the cached list row and detail card fragments."""
+
+    def setUp(self):
+        """Set up a logged-in owner with one appointment and an empty cache."""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            appointment_title='Fragment Appointment',
+            date_field=date(2030, 2, 5),
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+    def template_names(self, response):
+        return [template.name for template in response.templates]
+
+    def test_rows_rendered_once(self):
+        """Test that a repeated list reuses the cached row fragments."""
+        response = self.client.get(reverse('view'))
+        self.assertIn('appointment_files/_appointment_row.html', self.template_names(response))
+        response = self.client.get(reverse('view'))
+        self.assertNotIn('appointment_files/_appointment_row.html', self.template_names(response))
+        self.assertContains(response, 'Fragment Appointment')
+
+    def test_save_renders_new_row(self):
+        """Test that a saved appointment is rendered again under its new updated_at."""
+        self.client.get(reverse('view'))
+        self.appointment.appointment_title = 'Renamed Appointment'
+        self.appointment.save()
+        response = self.client.get(reverse('view'))
+        self.assertContains(response, 'Renamed Appointment')
+        self.assertNotContains(response, 'Fragment Appointment')
+
+    def test_rows_vary_with_authentication(self):
+        """Test that anonymous users do not get the cached rows with edit links."""
+        edit_url = reverse('appointment_edit', args=[self.appointment.pk])
+        self.assertContains(self.client.get(reverse('view')), edit_url)
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('view')), edit_url)
+
+    @override_settings(APPOINTMENTS_PER_PAGE=1)
+    def test_filter_query_encoded_once(self):
+        """Test that pagination and export links carry the encoded filters."""
+        Appointment.objects.create(
+            owner=self.user, first_name='Ann', last_name='Early',
+            appointment_title='Fragment Appointment 2', date_field=date(2030, 2, 6),
+        )
+        response = self.client.get(reverse('view'), {'search': 'Fragment', 'date': ''})
+        self.assertEqual(response.context['filter_query'], 'search=Fragment')
+        self.assertContains(response, '?page=2&search=Fragment')
+        response = self.client.get(reverse('view'), {'search': 'a&b c'})
+        self.assertContains(response, f"{reverse('export')}?search=a%26b+c")
+
+    def test_detail_card_cached(self):
+        """Test that the detail card is rendered once and shows the recurrence rule."""
+        Recurrence.objects.create(appointment=self.appointment, rule='FREQ=WEEKLY')
+        url = reverse('appointmentsdetail', args=[self.appointment.pk])
+        response = self.client.get(url)
+        self.assertIn('appointment_files/_appointment_card.html', self.template_names(response))
+        self.assertContains(response, 'FREQ=WEEKLY')
+        response = self.client.get(url)
+        self.assertNotIn('appointment_files/_appointment_card.html', self.template_names(response))
+        self.assertContains(response, 'FREQ=WEEKLY')
+
+
+class AsyncViewTests(TestCase):
+    """Tests for the async views served under ASGI."""
+
+    def setUp(self):
+        """Serve the async views, with a logged-in owner and one appointment."""
+        cache.clear()
+        settings_override = override_settings(APPOINTMENTS_ASYNC_VIEWS=True)
+        settings_override.enable()
+        self.addCleanup(self.reload_urls)
+        self.addCleanup(settings_override.disable)
+        self.reload_urls()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            appointment_title='Async Appointment',
+            date_field=date(2030, 2, 5),
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+    def reload_urls(self):
+        """Rebuild the URLconf for the current APPOINTMENTS_ASYNC_VIEWS."""
+        import importlib
+        from django.urls import clear_url_caches
+        from appointments import urls as root_urls
+        from . import urls as app_urls
+        importlib.reload(app_urls)
+        importlib.reload(root_urls)
+        clear_url_caches()
+
+    def test_async_views_served(self):
+        """Test that the list, detail, calendar and status URLs resolve to async views."""
+        import asyncio
+        from django.urls import resolve
+        for url in [reverse('view'), reverse('calendar'),
+                    reverse('appointmentsdetail', args=[self.appointment.pk]),
+                    reverse('update_status', args=[self.appointment.pk]), reverse('change_feed'),
+                    reverse('export')]:
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(url).func), url)
+
+    def test_list(self):
+        """Test that the async list shows the owner's appointments, paginated."""
+        response = self.client.get(reverse('view'), {'search': 'Async'})
+        self.assertContains(response, 'Async Appointment')
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        self.client.logout()
+        self.assertContains(self.client.get(reverse('view'), {'page': 99}), 'Async Appointment')
+
+    def test_calendar_and_detail(self):
+        """Test that the async calendar and detail pages render."""
+        response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 2})
+        self.assertContains(response, 'Async Appointment')
+        response = self.client.get(reverse('appointmentsdetail', args=[self.appointment.pk]))
+        self.assertContains(response, 'Async Appointment')
+        response = self.client.get(reverse('appointmentsdetail', args=[self.appointment.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get(self):
+        """Test that the async pages answer matching ETags with 304s."""
+        self.client.get(reverse('view'))
+        etag = self.client.get(reverse('view'))['ETag']
+        response = self.client.get(reverse('view'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_update_status_queues_email(self):
+        """Test that the async status update saves and queues the email in the outbox."""
+        with self.settings(APPOINTMENTS_EMAIL_QUEUE=False):
+            response = self.client.post(
+                reverse('update_status', args=[self.appointment.pk]), {'status': 'confirmed'}
+            )
+        self.assertEqual(response.json(), {'success': True, 'status': 'Confirmed', 'changed': True})
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'confirmed')
+        self.assertEqual(len(mail.outbox), 0)
+        response = self.client.post(
+            reverse('update_status', args=[self.appointment.pk]), {'status': 'pending'}
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(OutboundEmail.objects.filter(
+            appointment=self.appointment, action='status_changed', status='pending'
+        ).exists())
+
+    def test_update_status_permissions(self):
+        """Test that the async status update checks login and ownership."""
+        url = reverse('update_status', args=[self.appointment.pk])
+        User.objects.create_user(username='other', password='testpass123')
+        self.client.login(username='other', password='testpass123')
+        self.assertEqual(self.client.post(url, {'status': 'confirmed'}).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.post(url, {'status': 'confirmed'}).status_code, 302)
+
+    def test_export_streams_async(self):
+        """Test that the async export streams from an async iterator."""
+        import asyncio
+        from asgiref.sync import async_to_sync
+        response = self.client.get(reverse('export'), {'format': 'ndjson'})
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        async def read():
+            return [line async for line in response.streaming_content]
+        lines = async_to_sync(read)()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['appointment_title'], 'Async Appointment')
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('export')).status_code, 302)
+
+    @override_settings(APPOINTMENTS_CHANGEFEED_MAX_SECONDS=0.1, APPOINTMENTS_CHANGEFEED_HEARTBEAT=0.05)
+    async def test_change_feed(self):
+        """Test that the change feed streams the owner's events and keep-alives, then ends."""
+        from .changefeed import broker
+        self.async_client.cookies = self.client.cookies  # Logged in by setUp
+        other = broker.publish({self.user.pk + 1}, 'appointment', {'id': 1})
+        event = broker.publish({self.user.pk}, 'appointment', {'id': 2})
+        response = await self.async_client.get(reverse('change_feed'),
+                                               headers={'Last-Event-ID': str(other.id - 1)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn(event.encode(), body)
+        self.assertNotIn(other.encode(), body)
+        self.assertIn(': keepalive', body)
+        self.assertEqual(broker.subscribers(), 0)
+
+    def test_pages_subscribe_to_change_feed(self):
+        """Test that the list and calendar subscribe to the change feed."""
+        self.assertContains(self.client.get(reverse('view')), reverse('change_feed'))
+        response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 2})
+        self.assertContains(response, reverse('change_feed'))
+
+
+class ChangeFeedTests(TestCase):
+    """Tests for the live change feed."""
+
+    def setUp(self):
+        """Create an owner with one appointment and a fresh broker."""
+        from . import changefeed
+        self.broker = changefeed.Broker(history=3)
+        patcher = mock.patch.object(changefeed, 'broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            appointment_title='Live Appointment',
+            date_field=date(2030, 2, 5),
+            time_field=time(9, 30),
+        )
+
+    def events(self, subscription):
+        """Return the events queued on a subscription."""
+        events = []
+        while (event := subscription.get(0)) is not None:
+            events.append(event)
+        return events
+
+    def test_publish_by_scope(self):
+        """Test that events reach only the subscriptions of their scopes."""
+        owner = self.broker.subscribe(self.user.pk)
+        other = self.broker.subscribe(self.user.pk + 1)
+        anonymous = self.broker.subscribe('all')
+        event = self.broker.publish({self.user.pk, 'all'}, 'appointment', {'id': 1})
+        self.assertEqual(self.events(owner), [event])
+        self.assertEqual(self.events(other), [])
+        self.assertEqual(self.events(anonymous), [event])
+        self.broker.unsubscribe(owner)
+        self.broker.publish({self.user.pk}, 'appointment', {'id': 2})
+        self.assertEqual(self.events(owner), [])
+
+    def test_replay_after_last_event_id(self):
+        """Test that a reconnecting client receives the events it missed, or a reload."""
+        first = self.broker.publish({'all'}, 'appointment', {'id': 1})
+        second = self.broker.publish({self.user.pk}, 'appointment', {'id': 2})
+        third = self.broker.publish({'all'}, 'appointment', {'id': 3})
+        self.assertEqual(self.events(self.broker.subscribe('all', first.id)), [third])
+        self.assertEqual(self.events(self.broker.subscribe(self.user.pk, first.id)), [second])
+        self.assertEqual(self.events(self.broker.subscribe('all', third.id)), [])
+        self.broker.publish({'all'}, 'appointment', {'id': 4})
+        # The first event has left the history of three
+        [reload] = self.events(self.broker.subscribe('all', first.id - 1))
+        self.assertEqual(reload.name, 'reload')
+
+    def test_overflow_sends_reload(self):
+        """Test that a client falling behind is told to reload."""
+        from . import changefeed
+        subscription = self.broker.subscribe('all')
+        with mock.patch.object(subscription.queue, 'maxsize', 1):
+            self.broker.publish({'all'}, 'appointment', {'id': 1})
+            self.broker.publish({'all'}, 'appointment', {'id': 2})
+        self.assertTrue(subscription.overflowed)
+        self.assertIn('event: reload', changefeed._next_chunk(subscription, None))
+        self.assertEqual(self.events(subscription), [])
+
+    def test_save_and_delete_publish_on_commit(self):
+        """Test that saving and deleting an appointment publish after the commit."""
+        subscription = self.broker.subscribe(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.status = 'confirmed'
+            self.appointment.save()
+            self.assertEqual(self.events(subscription), [])
+        [event] = self.events(subscription)
+        self.assertEqual(event.name, 'appointment')
+        self.assertEqual(event.data, {
+            'id': self.appointment.pk, 'appointment_title': 'Live Appointment',
+            'first_name': 'John', 'last_name': 'Doe', 'status': 'confirmed',
+            'date_field': '2030-02-05', 'time_field': '09:30:00',
+            'status_display': 'Confirmed', 'deleted': False,
+        })
+        pk = self.appointment.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.appointment.delete()
+        [event] = self.events(subscription)
+        self.assertEqual((event.data['id'], event.data['deleted']), (pk, True))
+
+    def test_bulk_writes_publish_reload(self):
+        """Test that API batches and imports, which bypass the signals, publish a reload."""
+        from .importer import insert_batch
+        subscription = self.broker.subscribe(self.user.pk)
+        self.client.login(username='testuser', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('api_appointments'), json.dumps({'update': [
+                {'id': self.appointment.pk, 'status': 'confirmed'},
+            ]}), content_type='application/json')
+        self.assertEqual([event.name for event in self.events(subscription)], ['reload'])
+        with self.captureOnCommitCallbacks(execute=True):
+            insert_batch([{
+                'first_name': 'Jane', 'last_name': 'Doe', 'email': 'jane@example.com',
+                'appointment_title': 'Imported', 'date_field': date(2030, 2, 6),
+            }], owner_id=self.user.pk)
+        self.assertEqual([event.name for event in self.events(subscription)], ['reload'])
+
+    def test_pages_mark_appointments(self):
+        """Test that the list and calendar mark the entries, without a feed under WSGI."""
+        from django.urls import NoReverseMatch
+        self.client.login(username='testuser', password='testpass123')
+        marker = f'data-appointment-id="{self.appointment.pk}"'
+        self.assertContains(self.client.get(reverse('view')), marker)
+        response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 2})
+        self.assertContains(response, marker)
+        self.assertNotContains(response, 'EventSource')
+        with self.assertRaises(NoReverseMatch):
+            reverse('change_feed')
+
+
+class AppointmentAPITests(TestCase):
+    """Tests for the JSON appointments API."""
+
+    def setUp(self):
+        """Set up a logged-in user with one appointment."""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='testpass123'
+        )
+        self.appointment = Appointment.objects.create(
+            owner=self.user,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            appointment_title='Test Appointment',
+            date_field=date.today() + timedelta(days=1),
+            status='pending'
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.url = reverse('api_appointments')
+
+    def post_batch(self, payload):
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def new_item(self, title, days=None):
+        # Each new item gets its own day, so items never overlap
+        self.item_count = getattr(self, 'item_count', 0) + 1
+        return {
+            'first_name': 'jane',
+            'last_name': 'smith',
+            'email': 'Jane@Example.com',
+            'appointment_title': title,
+            'date_field': str(date.today() + timedelta(days=days or 1 + self.item_count)),
+            'time_field': '10:30',
+            'status': 'pending',
+        }
+
+    def test_requires_login(self):
+        """Test that anonymous requests get a JSON 401."""
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_bulk_create(self):
+        """Test creating a batch with form cleaning rules applied."""
+        response = self.post_batch({'create': [self.new_item(f'Batch {i}') for i in range(3)]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['created']), 3)
+        created = Appointment.objects.get(appointment_title='Batch 0')
+        self.assertEqual(created.owner, self.user)
+        self.assertEqual(created.first_name, 'Jane')
+        self.assertEqual(created.email, 'jane@example.com')
+        self.assertIsNotNone(created.created_at)
+        self.assertEqual(OutboundEmail.objects.filter(action='created').count(), 3)
+
+    def test_batch_query_count_is_constant(self):
+        """Test that a batch writes with bulk queries, not one per item."""
+        def count_queries(size):
+            payload = {'create': [self.new_item(f'Count {i}') for i in range(size)]}
+            with CaptureQueriesContext(connection) as queries:
+                self.post_batch(payload)
+            return len(queries)
+        self.assertEqual(count_queries(2), count_queries(20))
+
+    def test_partial_update_and_delete(self):
+        """Test patching and deleting in the same batch."""
+        doomed = Appointment.objects.create(
+            owner=self.user, first_name='Old', last_name='Entry',
+            appointment_title='Doomed', date_field=date.today() + timedelta(days=5),
+        )
+        response = self.post_batch({
+            'update': [{'id': self.appointment.pk, 'status': 'confirmed'}],
+            'delete': [doomed.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'confirmed')
+        self.assertEqual(self.appointment.appointment_title, 'Test Appointment')
+        self.assertFalse(Appointment.objects.filter(pk=doomed.pk).exists())
+        self.assertEqual(response.json()['deleted'], [doomed.pk])
+
+    def test_per_item_errors(self):
+        """Test that invalid items are reported and valid ones applied."""
+        foreign = Appointment.objects.create(
+            owner=self.other, first_name='Not', last_name='Mine',
+            appointment_title='Foreign', date_field=date.today() + timedelta(days=1),
+        )
+        bad = self.new_item('Bad')
+        bad['first_name'] = 'J'
+        response = self.post_batch({
+            'create': [self.new_item('Good'), bad],
+            'update': [{'id': foreign.pk, 'status': 'cancelled'}],
+            'delete': [foreign.pk],
+        })
+        self.assertEqual(response.status_code, 207)
+        errors = response.json()['errors']
+        self.assertEqual(
+            [(e['op'], e['index']) for e in errors],
+            [('create', 1), ('update', 0), ('delete', 0)]
+        )
+        self.assertIn('first_name', errors[0]['errors'])
+        self.assertTrue(Appointment.objects.filter(appointment_title='Good').exists())
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, 'pending')
+
+    def test_non_integer_ids(self):
+        """Test that ids which are not integers are reported per item, not a 500."""
+        response = self.post_batch({
+            'update': [{'id': [self.appointment.pk], 'status': 'confirmed'}, {'id': True}],
+            'delete': [{'id': self.appointment.pk}, str(self.appointment.pk), True],
+        })
+        self.assertEqual(response.status_code, 207)
+        errors = response.json()['errors']
+        self.assertEqual([(e['op'], e['index']) for e in errors],
+                         [('update', 0), ('update', 1), ('delete', 0), ('delete', 1), ('delete', 2)])
+        self.assertTrue(all(e['errors'] == {'id': 'Must be an integer.'} for e in errors))
+        self.assertTrue(Appointment.objects.filter(pk=self.appointment.pk, status='pending').exists())
+        response = self.post_batch({'delete': [[1]], 'atomic': True})
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_follows_status_transitions(self):
+        """Test that an update may only move the status along STATUS_TRANSITIONS."""
+        response = self.post_batch({'update': [{'id': self.appointment.pk, 'status': 'completed'}]})
+        self.assertEqual(response.status_code, 207)
+        [error] = response.json()['errors']
+        self.assertEqual(error['errors']['status'][0]['message'],
+                         'A pending appointment cannot be completed.')
+        self.appointment.refresh_from_db()
+        self.assertEqual(self.appointment.status, 'pending')
+
+    def test_atomic_batch_rejects_all(self):
+        """Test that an atomic batch writes nothing when an item fails."""
+        bad = self.new_item('Bad')
+        bad['phone'] = 'not a phone'
+        response = self.post_batch({
+            'create': [self.new_item('Good'), bad],
+            'atomic': True,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Appointment.objects.filter(appointment_title='Good').exists())
+
+    def test_list_and_detail(self):
+        """Test listing with filters and fetching one appointment."""
+        response = self.client.get(self.url, {'status': 'pending'})
+        results = response.json()['results']
+        self.assertEqual([r['id'] for r in results], [self.appointment.pk])
+        self.assertEqual(results[0]['owner'], self.user.pk)
+
+        response = self.client.get(
+            reverse('api_appointment_detail', kwargs={'pk': self.appointment.pk})
+        )
+        self.assertEqual(response.json()['appointment_title'], 'Test Appointment')
+
+
+class ExportTests(TestCase):
+    """Tests for the streaming CSV/NDJSON export."""
+
+    def setUp(self):
+        """Set up a logged-in user with appointments of both statuses."""
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        other = User.objects.create_user(username='other', password='testpass123')
+        for i, status in enumerate(['pending', 'confirmed', 'pending']):
+            Appointment.objects.create(
+                owner=self.user,
+                first_name=f'Name{i}',
+                last_name='Doe',
+                email=f'name{i}@example.com',
+                appointment_title=f'Title, {i}',
+                date_field=date(2025, 1, i + 1),
+                status=status
+            )
+        Appointment.objects.create(owner=other, first_name='Hidden', last_name='X')
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_export_requires_login(self):
+        """Test that anonymous users are redirected to login."""
+        self.client.logout()
+        response = self.client.get(reverse('export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv_export_streams_filtered_rows(self):
+        """Test that the CSV export is streamed and honours the list filters."""
+        response = self.client.get(reverse('export'), {'status': 'pending'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,first_name,last_name'))
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"Title, 2"', lines[1])
+        self.assertNotIn('Hidden', '\n'.join(lines))
+
+    def test_ndjson_export(self):
+        """Test that NDJSON emits one JSON object per appointment."""
+        response = self.client.get(reverse('export'), {'format': 'ndjson', 'search': 'Name1'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['status'], 'confirmed')
+        self.assertEqual(rows[0]['date_field'], '2025-01-02')
+
+    def test_export_command(self):
+        """Test that the management command writes the export to a file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'out.csv'
+            call_command('export_appointments', '--owner', 'testuser',
+                         '--output', str(path), '--chunk-size', '1')
+            lines = path.read_text().splitlines()
+        self.assertEqual(len(lines), 4)
+
+
+class ImportTests(TestCase):
+    """Tests for the bulk import command."""
+
+    def setUp(self):
+        """Set up an owner and a scratch directory."""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = Path(self.directory.name) / name
+        path.write_text(content)
+        return str(path)
+
+    def test_row_cleaner_matches_form(self):
+        """Test that rows get the same cleaning as AppointmentForm."""
+        row = {
+            'first_name': '  jane ', 'last_name': 'smith', 'email': ' Jane@Example.COM',
+            'appointment_title': 'Checkup', 'status': 'pending',
+            'date_field': str(date.today() + timedelta(days=1)),
+        }
+        cleaned, errors = AppointmentRowCleaner().clean(row)
+        form = AppointmentForm(data=row)
+        self.assertTrue(form.is_valid())
+        self.assertEqual(errors, {})
+        for field in ('first_name', 'last_name', 'email', 'date_field'):
+            self.assertEqual(cleaned[field], form.cleaned_data[field])
+
+        _, errors = AppointmentRowCleaner().clean(dict(row, phone='abc', status='bogus'))
+        self.assertEqual(set(errors), {'phone', 'status'})
+
+    def test_past_dates_need_allow_past(self):
+        """Test that past dates are rejected unless allow_past is set."""
+        row = {'first_name': 'Jane', 'last_name': 'Smith', 'appointment_title': 'Old',
+               'status': 'completed', 'date_field': '2020-01-01'}
+        self.assertIn('date_field', AppointmentRowCleaner().clean(row)[1])
+        self.assertEqual(AppointmentRowCleaner(allow_past=True).clean(row)[1], {})
+
+    def test_import_csv_with_rejects(self):
+        """Test importing a CSV file and writing rejected rows."""
+        path = self.write('in.csv', (
+            'first_name,last_name,email,appointment_title,status,date_field,phone\n'
+            'jane,smith,JANE@example.com,Checkup,pending,2020-01-01,\n'
+            'x,smith,,Bad name,pending,,\n'
+            'john,doe,,Cleaning,confirmed,,+123456789\n'
+        ))
+        rejects = str(Path(self.directory.name) / 'rejects.ndjson')
+        out = StringIO()
+        call_command('import_appointments', path, '--owner', 'testuser', '--allow-past',
+                     '--rejects', rejects, '--batch-size', '2', stdout=out)
+        self.assertIn('Imported 2 appointments, rejected 1 rows', out.getvalue())
+
+        jane = Appointment.objects.get(first_name='Jane')
+        self.assertEqual(jane.email, 'jane@example.com')
+        self.assertEqual(jane.owner, self.user)
+        reject = json.loads(Path(rejects).read_text())
+        self.assertEqual(reject['line'], 3)
+        self.assertIn('first_name', reject['errors'])
+
+    def test_import_ndjson_round_trip(self):
+        """Test that an NDJSON export imports back, rejecting invalid lines."""
+        Appointment.objects.create(first_name='John', last_name='Doe',
+                                   appointment_title='Exported', status='pending')
+        exported = ''.join(export_lines(Appointment.objects.all(), 'ndjson'))
+        path = self.write('in.ndjson', exported + 'not json\n')
+        call_command('import_appointments', path, stdout=StringIO())
+        self.assertEqual(Appointment.objects.filter(appointment_title='Exported').count(), 2)
+
+
+class ConflictTests(TestCase):
+    """Tests for appointment durations and overlap detection."""
+
+    def setUp(self):
+        """Set up an owner with one 10:00-11:00 appointment tomorrow."""
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.day = date.today() + timedelta(days=1)
+        self.booked = Appointment.objects.create(
+            owner=self.user, first_name='John', last_name='Doe',
+            appointment_title='Booked', date_field=self.day,
+            time_field=time(10, 0), duration_minutes=60,
+        )
+
+    def form_data(self, start, duration=30, **extra):
+        return dict({
+            'first_name': 'Jane', 'last_name': 'Smith', 'appointment_title': 'New',
+            'status': 'pending', 'date_field': self.day, 'time_field': start,
+            'duration_minutes': duration,
+        }, **extra)
+
+    def test_find_conflicts(self):
+        """Test overlapping, adjacent and cancelled appointments."""
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(10, 30), 15), [self.booked])
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(9, 30), 45), [self.booked])
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(9, 30), 30), [])
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(11, 0), 30), [])
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(10, 0), 30,
+                                        exclude_pk=self.booked.pk), [])
+        self.booked.status = 'cancelled'
+        self.booked.save()
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(10, 0), 30), [])
+
+    def test_find_conflicts_is_one_indexed_query(self):
+        """Test that a slot check is one range query on the owner index, plus the series."""
+        with CaptureQueriesContext(connection) as queries:
+            find_conflicts(self.user.pk, self.day, time(10, 30), 15)
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"time_field" >=', queries[0]['sql'])
+
+    def test_recurring_occurrences_conflict(self):
+        """Test that occurrences of a series block their slots, except for the series itself."""
+        series = Appointment.objects.create(
+            owner=self.user, first_name='Ann', last_name='Lee', appointment_title='Standup',
+            date_field=self.day - timedelta(days=1), time_field=time(8, 0), duration_minutes=30,
+        )
+        Recurrence.objects.create(appointment=series, rule='FREQ=DAILY;COUNT=3')
+        [occurrence] = find_conflicts(self.user.pk, self.day, time(8, 15), 30)
+        self.assertEqual((occurrence.pk, occurrence.date_field), (series.pk, self.day))
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(8, 30), 30), [])
+        self.assertEqual(find_conflicts(self.user.pk, self.day, time(8, 15), 30,
+                                        exclude_pk=series.pk), [])
+        self.assertEqual(load_schedules(self.user.pk, [self.day])[self.day].overlapping(
+            *interval(time(8, 15), 30)), [series.pk])
+
+    def test_day_schedule(self):
+        """Test the sorted in-memory interval structure."""
+        schedule = DaySchedule([(*interval(time(13, 0), 30), 'b'), (*interval(time(9, 0), 60), 'a')])
+        self.assertEqual(schedule.starts, sorted(schedule.starts))
+        self.assertEqual(schedule.overlapping(*interval(time(9, 30), 10)), ['a'])
+        self.assertEqual(schedule.overlapping(*interval(time(10, 0), 180)), [])
+        self.assertEqual(schedule.overlapping(*interval(time(8, 0), 12 * 60)), ['a', 'b'])
+        schedule.add(*interval(time(11, 0), 30), 'c')
+        self.assertEqual(schedule.overlapping(*interval(time(8, 0), 12 * 60)), ['a', 'c', 'b'])
+        self.assertEqual(interval(time(23, 45), 30), (23 * 3600 + 45 * 60, 24 * 3600))
+
+    def test_form_rejects_overlap_for_owner(self):
+        """Test that the form checks overlaps only when given an owner."""
+        form = AppointmentForm(data=self.form_data('10:30'), owner=self.user)
+        self.assertFalse(form.is_valid())
+        self.assertIn('overlaps "Booked"', form.non_field_errors()[0])
+        self.assertTrue(AppointmentForm(data=self.form_data('10:30')).is_valid())
+        self.assertTrue(AppointmentForm(data=self.form_data('11:00'), owner=self.user).is_valid())
+
+    def test_form_duration_default_and_maximum(self):
+        """Test that a blank duration defaults and long ones are rejected."""
+        form = AppointmentForm(data=self.form_data('12:00', duration=''))
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['duration_minutes'], 30)
+        form = AppointmentForm(data=self.form_data('12:00', duration=9 * 60))
+        self.assertIn('duration_minutes', form.errors)
+
+    def test_edit_view_checks_moves_only(self):
+        """Test that editing rechecks overlaps only when the slot changes."""
+        other = Appointment.objects.create(
+            owner=self.user, first_name='Ann', last_name='Lee', appointment_title='Other',
+            date_field=self.day, time_field=time(12, 0),
+        )
+        self.client.login(username='testuser', password='testpass123')
+        url = reverse('appointment_edit', kwargs={'pk': other.pk})
+        response = self.client.post(url, self.form_data('10:15', appointment_title='Other'))
+        self.assertEqual(response.status_code, 200)
+        other.refresh_from_db()
+        self.assertEqual(other.time_field, time(12, 0))
+
+        # Legacy overlapping data does not block unrelated edits
+        Appointment.objects.filter(pk=other.pk).update(time_field=time(10, 15))
+        response = self.client.post(url, self.form_data('10:15', appointment_title='Renamed'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_api_batch_checks_against_schedule_and_itself(self):
+        """Test that batch creates are checked against bookings and each other."""
+        self.client.login(username='testuser', password='testpass123')
+
+        def item(start, title):
+            return {'first_name': 'Jane', 'last_name': 'Smith', 'appointment_title': title,
+                    'status': 'pending', 'date_field': str(self.day), 'time_field': start,
+                    'duration_minutes': 30}
+
+        response = self.client.post(reverse('api_appointments'), json.dumps({
+            'create': [item('10:30', 'Clash'), item('11:00', 'First'), item('11:15', 'Second')],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [0, 2])
+        self.assertEqual(
+            list(Appointment.objects.filter(date_field=self.day).values_list(
+                'appointment_title', flat=True).order_by('time_field')),
+            ['Booked', 'First'],
+        )
+
+        # Deleting the booking in the same batch frees its slot
+        response = self.client.post(reverse('api_appointments'), json.dumps({
+            'create': [item('10:30', 'Replacement')], 'delete': [self.booked.pk],
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+
+class AvailabilityTests(TestCase):
+    """Tests for the free-slot search."""
+
+    def setUp(self):
+        """Set up an owner working 9-12 on Mondays with one booking."""
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.monday = date.today() + timedelta(days=7 - date.today().weekday())
+        WorkingHours.objects.create(owner=self.user, weekday=0,
+                                    start_time=time(9, 0), end_time=time(12, 0))
+        Appointment.objects.create(
+            owner=self.user, first_name='John', last_name='Doe', appointment_title='Booked',
+            date_field=self.monday, time_field=time(9, 30), duration_minutes=60,
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+    def slots(self, **params):
+        params.setdefault('from', str(self.monday))
+        response = self.client.get(reverse('api_availability'), params)
+        self.assertEqual(response.status_code, 200)
+        return [(s['date'], s['start'], s['end']) for s in response.json()['slots']]
+
+    def test_subtract_merges_in_one_pass(self):
+        """Test subtracting sorted, overlapping busy intervals from periods."""
+        periods = [(0, 100), (200, 300)]
+        busy = [(10, 20), (15, 30), (90, 210), (250, 260)]
+        self.assertEqual(subtract(periods, busy),
+                         [(0, 10), (30, 90), (210, 250), (260, 300)])
+        self.assertEqual(subtract(periods, []), periods)
+
+    def test_next_free_slots_skip_bookings(self):
+        """Test that slots fit between bookings within working hours."""
+        day = str(self.monday)
+        self.assertEqual(self.slots(duration=30, count=4), [
+            (day, '09:00', '09:30'), (day, '10:30', '11:00'),
+            (day, '10:45', '11:15'), (day, '11:00', '11:30'),
+        ])
+        # Only Mondays are worked: the 4th hour-long slot is a week later
+        slots = self.slots(duration=60, count=4)
+        self.assertEqual(slots[2], (day, '11:00', '12:00'))
+        self.assertEqual(slots[3], (str(self.monday + timedelta(days=7)), '09:00', '10:00'))
+
+    def test_free_intervals_cached_and_invalidated(self):
+        """Test that repeat searches hit the cache until a booking changes."""
+        first = self.slots(duration=30, count=1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.slots(duration=30, count=1), first)
+        self.assertFalse([q for q in queries if 'project_app_appointment' in q['sql']])
+
+        Appointment.objects.create(
+            owner=self.user, first_name='Ann', last_name='Lee', appointment_title='New',
+            date_field=self.monday, time_field=time(9, 0), duration_minutes=30,
+        )
+        self.assertEqual(self.slots(duration=30, count=1)[0][1], '10:30')
+
+    def test_default_working_hours_and_validation(self):
+        """Test the default hours for other owners and parameter checks."""
+        other = User.objects.create_user(username='other', password='testpass123')
+        slots = self.slots(owner=other.pk, duration=480, count=1)
+        self.assertEqual(slots, [(str(self.monday), '09:00', '17:00')])
+        response = self.client.get(reverse('api_availability'), {'duration': 0})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api_availability'), {'owner': 99999})
+        self.assertEqual(response.status_code, 404)
+
+
+class RecurrenceTests(TestCase):
+    """Tests for recurring appointments and their lazy expansion."""
+
+    def setUp(self):
+        """Set up an owner with a daily series starting on a Monday."""
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.start = date(2030, 3, 4)
+        self.appointment = Appointment.objects.create(
+            owner=self.user, first_name='John', last_name='Doe', appointment_title='Daily Standup',
+            date_field=self.start, time_field=time(9, 0), duration_minutes=15,
+        )
+        self.recurrence = Recurrence.objects.create(
+            appointment=self.appointment, rule='FREQ=DAILY;COUNT=365'
+        )
+
+    def dates(self, start, end):
+        queryset = Appointment.objects.filter(owner=self.user)
+        return [o.date_field for o in occurrences(queryset, start, end)]
+
+    def test_series_is_one_row_expanded_per_window(self):
+        """Test that a year-long series is expanded only for the window."""
+        self.assertEqual(Appointment.objects.count(), 1)
+        with self.assertNumQueries(2):
+            dates = self.dates(date(2030, 3, 1), date(2030, 3, 10))
+        # The first occurrence is the appointment row itself
+        self.assertEqual(dates, [date(2030, 3, day) for day in range(5, 11)])
+        self.assertEqual(self.dates(date(2031, 3, 5), date(2031, 3, 31)), [])
+
+        data = month_data(Appointment.objects.all(), 2030, 3)
+        self.assertEqual(data['total'], 28)
+        self.assertNotIn('recurring', data['by_day'][4][0])
+        self.assertTrue(data['by_day'][31][0]['recurring'])
+
+    def test_exceptions_skip_and_move_occurrences(self):
+        """Test skipped and moved occurrences, including into the window."""
+        RecurrenceException.objects.create(recurrence=self.recurrence,
+                                           original_date=date(2030, 3, 6))
+        RecurrenceException.objects.create(
+            recurrence=self.recurrence, original_date=date(2030, 3, 20), cancelled=False,
+            date_field=date(2030, 3, 8), time_field=time(14, 0),
+        )
+        found = occurrences(Appointment.objects.all(), date(2030, 3, 5), date(2030, 3, 8))
+        self.assertEqual(
+            [(o.date_field, o.time_field) for o in found],
+            [(date(2030, 3, 5), time(9, 0)), (date(2030, 3, 7), time(9, 0)),
+             (date(2030, 3, 8), time(9, 0)), (date(2030, 3, 8), time(14, 0))],
+        )
+        self.assertEqual(found[-1].original_date, date(2030, 3, 20))
+        self.assertNotIn(date(2030, 3, 20), self.dates(date(2030, 3, 19), date(2030, 3, 21)))
+
+    def test_clean_rule(self):
+        """Test rule normalisation and rejected rules."""
+        self.assertEqual(clean_rule('rrule:freq=weekly;count=3'), 'FREQ=WEEKLY;COUNT=3')
+        for rule in ['FREQ=HOURLY', 'FREQ=DAILY;DTSTART=20300101T000000', 'FREQ=DAILY;BYDAY=XX']:
+            with self.assertRaises(ValidationError):
+                clean_rule(rule)
+
+    def test_rule_that_never_repeats(self):
+        """Test that a rule with no occurrences is rejected and expands quickly."""
+        import time as clock
+        rule = 'FREQ=DAILY;BYMONTH=2;BYMONTHDAY=30'
+        with self.assertRaises(ValidationError):
+            clean_rule(rule)
+        self.assertEqual(clean_rule('FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=29'),
+                         'FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=29')
+        # Rows saved before the check was added still expand in bounded time
+        Recurrence.objects.filter(pk=self.recurrence.pk).update(rule=rule)
+        started = clock.perf_counter()
+        self.assertEqual(self.dates(self.start, self.start + timedelta(days=60)), [])
+        self.assertLess(clock.perf_counter() - started, 1)
+
+    def test_rule_that_never_repeats_from_its_start(self):
+        """Test that a rule repeating only from other start days is caught by its INTERVAL."""
+        import time as clock
+        rule = 'FREQ=DAILY;INTERVAL=7;BYDAY=TU'  # the series starts on a Monday
+        self.assertEqual(clean_rule(rule), rule)
+        with self.assertRaises(ValidationError):
+            clean_rule(rule, datetime(2030, 3, 4, 9, 0))
+        self.assertEqual(clean_rule(rule, datetime(2030, 3, 5, 9, 0)), rule)
+        Recurrence.objects.filter(pk=self.recurrence.pk).update(rule=rule)
+        started = clock.perf_counter()
+        for _ in range(10):
+            self.assertEqual(self.dates(self.start, self.start + timedelta(days=60)), [])
+        self.assertLess(clock.perf_counter() - started, 1)
+
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(reverse('post_new'), {
+            'first_name': 'Jane', 'last_name': 'Roe', 'appointment_title': 'Never',
+            'date_field': '2030-04-01', 'time_field': '11:00', 'duration_minutes': 30,
+            'status': 'pending', 'recurrence-rule': rule,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Appointment.objects.filter(appointment_title='Never').exists())
+
+    def test_create_series_from_form(self):
+        """Test that the new appointment form saves a recurrence."""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(reverse('post_new'), {
+            'first_name': 'Jane', 'last_name': 'Roe', 'appointment_title': 'Weekly Review',
+            'date_field': '2030-04-01', 'time_field': '11:00', 'duration_minutes': 30,
+            'status': 'pending', 'recurrence-rule': 'FREQ=WEEKLY;COUNT=4',
+        })
+        self.assertEqual(response.status_code, 302)
+        appointment = Appointment.objects.get(appointment_title='Weekly Review')
+        self.assertEqual(appointment.recurrence.rule, 'FREQ=WEEKLY;COUNT=4')
+
+    def test_skip_occurrence_view(self):
+        """Test skipping one occurrence from its detail page."""
+        self.client.login(username='testuser', password='testpass123')
+        url = reverse('skip_occurrence', args=[self.appointment.pk, '2030-03-06'])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.recurrence.exceptions.filter(original_date=date(2030, 3, 6)).exists())
+        self.assertNotIn(date(2030, 3, 6), self.dates(date(2030, 3, 6), date(2030, 3, 6)))
+        # Not an occurrence of the series
+        self.client.post(reverse('skip_occurrence', args=[self.appointment.pk, '2029-01-01']))
+        self.assertEqual(self.recurrence.exceptions.count(), 1)
+
+    def test_list_and_calendar_show_occurrences(self):
+        """Test that the date-filtered list and the calendar show occurrences."""
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('view'), {'date': '2030-03-12'})
+        self.assertContains(response, 'Daily Standup')
+        self.assertContains(response, '?occurrence=2030-03-12')
+
+        self.client.get(reverse('calendar'), {'year': 2030, 'month': 3})
+        RecurrenceException.objects.create(recurrence=self.recurrence,
+                                           original_date=date(2030, 3, 12))
+        response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 3})
+        self.assertNotContains(response, '?occurrence=2030-03-12')
+        self.assertContains(response, '?occurrence=2030-03-13')
+
+    def test_occurrences_are_busy(self):
+        """Test that availability treats occurrences as booked."""
+        day = date(2030, 3, 12)
+        self.assertEqual(busy_intervals(self.user.pk, [day]),
+                         {day: [interval(time(9, 0), 15)]})
+
+
+@override_settings(APPOINTMENTS_INSTRUMENTATION=True, APPOINTMENTS_SLOW_REQUEST_QUERIES=None,
+                   APPOINTMENTS_SLOW_REQUEST_MS=None)
+class InstrumentationTests(TestCase):
+    """Tests for the request metrics middleware."""
+
+    def setUp(self):
+        """Set up a staff user and an empty metrics registry."""
+        cache.clear()
+        metrics_registry.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(username='staff', password='testpass123',
+                                             is_staff=True)
+        self.client.login(username='staff', password='testpass123')
+
+    def test_server_timing_header(self):
+        """Test that responses report query count, db and template time."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('calendar'), {'year': 2030, 'month': 2})
+        timing = response['Server-Timing']
+        self.assertIn(f'db;desc="{len(queries)} queries";dur=', timing)
+        self.assertIn('tpl;desc="Templates";dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_histogram_endpoint(self):
+        """Test that requests are aggregated per view and served as JSON."""
+        self.client.get(reverse('view'))
+        self.client.get(reverse('view'))
+        stats = self.client.get(reverse('request_metrics')).json()['views']
+        self.assertEqual(stats['view']['count'], 2)
+        self.assertEqual(sum(b['count'] for b in stats['view']['latency_ms']['buckets']), 2)
+        self.assertGreater(stats['view']['queries_mean'], 0)
+        self.assertGreater(stats['view']['template_ms_mean'], 0)
+
+        self.client.logout()
+        response = self.client.get(reverse('request_metrics'))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(APPOINTMENTS_SLOW_REQUEST_QUERIES=1)
+    def test_slow_requests_logged(self):
+        """Test that requests over the query threshold are logged."""
+        with self.assertLogs('project_app.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('view'))
+        self.assertIn('Slow request GET /view/ (view)', logs.output[0])
+
+    def test_async_chain(self):
+        """Test that the middleware stays async and counts queries run in threads."""
+        from asgiref.sync import async_to_sync, iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import RequestMetricsMiddleware
+
+        async def view(request):
+            await User.objects.acount()
+            return HttpResponse()
+        middleware = RequestMetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        response = async_to_sync(middleware)(request)
+        self.assertIn('db;desc="1 queries"', response['Server-Timing'])
+        self.assertEqual(metrics_registry.snapshot()['unresolved']['count'], 1)
+
+    @override_settings(APPOINTMENTS_INSTRUMENTATION=False)
+    def test_disabled(self):
+        """Test that the middleware is left out when disabled."""
+        response = self.client.get(reverse('view'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics_registry.snapshot(), {})
+
+
+class DashboardStatsTests(TestCase):
+    """Tests for the incrementally maintained dashboard statistics."""
+
+    def setUp(self):
+        """Set up an owner with appointments around today."""
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.today = timezone.now().date()
+        self.make(self.today - timedelta(days=3), 'pending')
+        self.make(self.today - timedelta(days=3), 'completed')
+        self.make(self.today, 'confirmed')
+        self.make(self.today + timedelta(days=6), 'cancelled')
+        self.make(self.today + timedelta(days=7), 'pending')
+        self.make(None, 'pending')
+
+    def make(self, day, status, owner=None):
+        return Appointment.objects.create(
+            owner=owner or self.user, first_name='John', last_name='Doe',
+            appointment_title='Checkup', date_field=day, status=status,
+        )
+
+    def snapshot(self):
+        owners = list(OwnerStats.objects.values_list(
+            'owner_id', 'pending', 'confirmed', 'completed', 'cancelled'
+        ).order_by('owner_id'))
+        days = list(OwnerDayStats.objects.values_list(
+            'owner_id', 'date_field', 'status', 'count'
+        ).order_by('owner_id', 'date_field', 'status'))
+        return owners, days
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        stats.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_dashboard_figures(self):
+        """Test status counts, upcoming-this-week and overdue."""
+        figures = stats.dashboard(self.user.pk, today=self.today)
+        self.assertEqual(figures['status_counts'], [
+            ('pending', 'Pending', 3), ('confirmed', 'Confirmed', 1),
+            ('completed', 'Completed', 1), ('cancelled', 'Cancelled', 1),
+        ])
+        self.assertEqual(figures['total'], 6)
+        self.assertEqual(figures['upcoming'], 1)
+        self.assertEqual(figures['overdue'], 1)
+        self.assertMatchesRebuild()
+
+    def test_save_status_update_and_delete(self):
+        """Test that edits, status changes and deletes move the counts."""
+        appointment = Appointment.objects.get(status='confirmed')
+        appointment.date_field = self.today + timedelta(days=1)
+        appointment.save()
+        self.client.login(username='testuser', password='testpass123')
+        self.client.post(reverse('update_status', args=[appointment.pk]), {'status': 'cancelled'})
+        figures = stats.dashboard(self.user.pk, today=self.today)
+        self.assertEqual(figures['upcoming'], 0)
+        self.assertEqual(figures['status_counts'][3], ('cancelled', 'Cancelled', 2))
+
+        # Saving an instance loaded without its status
+        partial = Appointment.objects.only('id').get(pk=appointment.pk)
+        partial.status = 'pending'
+        partial.save()
+        Appointment.objects.filter(status='cancelled').delete()
+        self.assertMatchesRebuild()
+
+    def test_bulk_writes(self):
+        """Test that the API batch and the importer keep the counts."""
+        self.client.login(username='testuser', password='testpass123')
+        pending = Appointment.objects.filter(status='pending', date_field__isnull=False).first()
+        self.client.post(reverse('api_appointments'), json.dumps({
+            'create': [{'first_name': 'Jane', 'last_name': 'Roe', 'appointment_title': 'New',
+                        'date_field': str(self.today + timedelta(days=2)), 'status': 'pending'}],
+            'update': [{'id': pending.pk, 'status': 'confirmed'}],
+            'delete': [Appointment.objects.get(status='completed').pk],
+        }), content_type='application/json')
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'rows.csv'
+            path.write_text('first_name,last_name,appointment_title,date_field,status\n'
+                            f'Ann,Lee,Imported,{self.today + timedelta(days=3)},pending\n')
+            call_command('import_appointments', str(path), '--owner', 'testuser',
+                         stdout=StringIO())
+        self.assertEqual(stats.dashboard(self.user.pk, today=self.today)['upcoming'], 3)
+        self.assertMatchesRebuild()
+
+    def test_zero_day_rows_are_deleted(self):
+        """Test that day rows reaching zero are deleted rather than summed."""
+        overdue = Appointment.objects.get(date_field=self.today - timedelta(days=3), status='pending')
+        overdue.transition_to('confirmed')
+        overdue.transition_to('completed')
+        self.assertFalse(OwnerDayStats.objects.filter(date_field=overdue.date_field,
+                                                      status__in=['pending', 'confirmed']).exists())
+        self.assertEqual(stats.dashboard(self.user.pk, today=self.today)['overdue'], 0)
+        self.assertFalse(OwnerDayStats.objects.filter(count=0).exists())
+        self.assertMatchesRebuild()
+
+    def test_row_by_row_fallback(self):
+        """Test the path for databases without INSERT ... ON CONFLICT."""
+        with mock.patch.object(stats, 'UPSERT_VENDORS', set()):
+            appointment = self.make(self.today, 'pending')
+            appointment.status = 'confirmed'
+            appointment.save()
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test that rebuild_stats recomputes the tables."""
+        expected = self.snapshot()
+        OwnerStats.objects.update(pending=99)
+        OwnerDayStats.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_stats', '--owner', 'testuser', stdout=out)
+        self.assertIn('Rebuilt statistics of 1 owners', out.getvalue())
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_index_dashboard_and_owner_delete(self):
+        """Test the home page dashboard and deleting an owner."""
+        self.client.login(username='testuser', password='testpass123')
+        with self.assertNumQueries(4):  # session, user, status counts, day sums
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['dashboard']['overdue'], 1)
+        self.assertContains(response, 'Upcoming This Week')
+
+        self.user.delete()
+        self.assertFalse(OwnerStats.objects.exists())
+        self.assertFalse(OwnerDayStats.objects.exists())
+
+
+class PooledEmailBackend(LocmemEmailBackend):
+    """Local stand-in for SMTP that counts connections actually opened."""
+
+    opened = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_open = False
+
+    def open(self):
+        if self.is_open:
+            return False
+        PooledEmailBackend.opened += 1
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+
+@override_settings(APPOINTMENTS_REMINDER_LEAD_MINUTES=[24 * 60])
+class ReminderTests(TestCase):
+    """Tests for reminder scheduling and the reminder dispatcher."""
+
+    def setUp(self):
+        """Set up an appointment with an email three days ahead."""
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.day = timezone.localdate() + timedelta(days=3)
+        self.appointment = self.make(email='john@example.com')
+
+    def make(self, **kwargs):
+        kwargs = {'owner': self.user, 'first_name': 'John', 'last_name': 'Doe',
+                  'appointment_title': 'Checkup', 'date_field': self.day,
+                  'time_field': time(10, 0), **kwargs}
+        return Appointment.objects.create(**kwargs)
+
+    def make_due(self):
+        Reminder.objects.update(reminder_at=timezone.now() - timedelta(minutes=1))
+
+    def test_reminders_follow_the_appointment(self):
+        """Test scheduling, rescheduling and dropping reminders."""
+        reminder = Reminder.objects.get()
+        start = timezone.make_aware(datetime.combine(self.day, time(10, 0)))
+        self.assertEqual(reminder.reminder_at, start - timedelta(days=1))
+
+        self.appointment.time_field = time(15, 0)
+        self.appointment.save()
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.reminder_at, start + timedelta(hours=5) - timedelta(days=1))
+
+        self.appointment.status = 'cancelled'
+        self.appointment.save()
+        self.assertFalse(Reminder.objects.exists())
+        # No email, or too soon for a reminder
+        self.make(email='')
+        self.make(email='ann@example.com', date_field=timezone.localdate())
+        self.assertFalse(Reminder.objects.exists())
+
+    def test_dispatch_sends_due_reminders_once(self):
+        """Test that due reminders are claimed, sent and not sent again."""
+        self.assertEqual(dispatch(), (0, 0, 0))
+        self.make_due()
+        self.assertEqual(dispatch(), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Reminder: Checkup', mail.outbox[0].subject)
+        self.assertTrue(Reminder.objects.get().sent)
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+        self.assertEqual(dispatch(), (0, 0, 0))
+        self.assertEqual(claim_due(10), (0, []))
+
+    @override_settings(EMAIL_BACKEND='project_app.tests.PooledEmailBackend')
+    def test_batches_share_one_connection(self):
+        """Test that consecutive batches reuse one open mail connection."""
+        for i in range(4):
+            self.make(email=f'patient{i}@example.com', time_field=time(11 + i, 0))
+        self.make_due()
+        PooledEmailBackend.opened = 0
+        batches = []
+        run_reminders(batch_size=2, connection=get_connection(), once=True,
+                      report=lambda *counts: batches.append(counts))
+        self.assertEqual(batches, [(2, 2, 0), (2, 2, 0), (1, 1, 0)])
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(PooledEmailBackend.opened, 1)
+
+    @override_settings(EMAIL_BACKEND='project_app.tests.FailingEmailBackend')
+    def test_failures_are_left_to_the_outbox(self):
+        """Test that a failed reminder email is retried by the outbox."""
+        self.make_due()
+        with self.assertLogs('project_app.notifications', 'WARNING'):
+            self.assertEqual(dispatch(), (1, 0, 1))
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.action, email.status, email.attempts), ('reminder', 'pending', 1))
+
+    @override_settings(
+        EMAIL_BACKEND='project_app.tests.UnreachableEmailBackend',
+        APPOINTMENTS_EMAIL_RETRY_DELAY=60,
+    )
+    def test_outage_backs_off(self):
+        """Test that the worker sleeps with backoff while mail is down."""
+        for i in range(3):
+            self.make(email=f'patient{i}@example.com', time_field=time(11 + i, 0))
+        self.make_due()
+        batches, sleeps = [], []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 2:
+                raise KeyboardInterrupt
+
+        with self.assertLogs('project_app.notifications', 'WARNING'), \
+                mock.patch.object(reminders.clock, 'sleep', sleep), \
+                self.assertRaises(KeyboardInterrupt):
+            run_reminders(batch_size=1, connection=get_connection(),
+                          report=lambda *counts: batches.append(counts))
+        self.assertEqual(batches, [(1, 0, 1), (1, 0, 1)])
+        self.assertEqual(sleeps, [60, 120])
+        self.assertEqual(Reminder.objects.filter(sent=False).count(), 2)
+
+        with self.assertLogs('project_app.notifications', 'WARNING'):
+            run_reminders(batch_size=1, once=True,
+                          report=lambda *counts: batches.append(counts))
+        self.assertEqual(len(batches), 3)
+
+    def test_unchanged_sync_writes_nothing(self):
+        """Test that syncing up-to-date reminders only reads them."""
+        with CaptureQueriesContext(connection) as queries:
+            sync_reminders([self.appointment])
+        self.assertEqual(len(queries), 1)
+
+    def test_send_reminders_command(self):
+        """Test the management command in --once mode."""
+        self.make_due()
+        out = StringIO()
+        call_command('send_reminders', '--once', stdout=out)
+        self.assertIn('Claimed 1, sent 1, failed 0', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,118 @@
+"""
+Bulk status transitions.
+
+``bulk_transition`` moves a set of appointments to a status with one
+``UPDATE``, for the list page's bulk action and the admin actions. Only the
+appointments whose status may move to the new one (see
+``Appointment.STATUS_TRANSITIONS``) change; the rest are left alone, as
+``Appointment.transition_to`` would refuse them or do nothing. So are
+cancelled appointments being reactivated into a slot that has been booked
+since (checked against the owners' schedules, see ``conflicts.py``).
+
+The selected rows are locked (``select_for_update``) until the
+transaction commits, so a concurrent save cannot move one in between. On
+databases without row locks, should the ``UPDATE`` change fewer rows than
+were selected, the side effects follow the rows it changed and the owners'
+statistics are rebuilt, as the status those rows had is no longer known.
+
+The ``UPDATE`` bypasses the signals, so the dashboard statistics,
+reminders, cache versions and change feed are updated here, and the status
+emails are queued with one bulk insert.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import bump_version
+from .changefeed import publish_reload
+from .conflicts import interval, load_schedules
+from .models import Appointment
+from .notifications import queue_notifications
+from .reminders import sync_reminders
+from .stats import apply_deltas, rebuild, stats_key
+
+
+def source_statuses(status):
+    """Return the statuses that may move to ``status``."""
+    return [source for source, targets in Appointment.STATUS_TRANSITIONS.items()
+            if status in targets]
+
+
+def _overlapping(appointments):
+    """
+    Return the pks of ``appointments`` (cancelled ones being reactivated)
+    whose slot is taken, by a booking or one reactivated before them.
+    """
+    by_owner = defaultdict(list)
+    for appointment in appointments:
+        if appointment.owner_id and appointment.date_field and appointment.time_field:
+            by_owner[appointment.owner_id].append(appointment)
+    taken = set()
+    for owner_id, owned in by_owner.items():
+        schedules = load_schedules(owner_id, {a.date_field for a in owned},
+                                   exclude_pks=[a.pk for a in owned])
+        for appointment in owned:
+            start, end = interval(appointment.time_field, appointment.duration_minutes)
+            schedule = schedules[appointment.date_field]
+            if schedule.overlapping(start, end):
+                taken.add(appointment.pk)
+            else:
+                schedule.add(start, end, appointment.pk)
+    return taken
+
+
+def _reselect(selected, status, now):
+    """Return the appointments of ``selected`` the bulk ``UPDATE`` changed."""
+    pks = set(Appointment.objects.filter(
+        pk__in=[appointment.pk for appointment in selected], status=status, updated_at=now,
+    ).values_list('pk', flat=True))
+    return [appointment for appointment in selected if appointment.pk in pks]
+
+
+def bulk_transition(appointments, status):
+    """
+    Move the appointments of a queryset to ``status``; return those changed.
+
+    Pass a queryset already scoped to what the user may change (e.g.
+    ``Appointment.objects.for_user(user)``), so the ownership check is part
+    of the query selecting the rows.
+    """
+    sources = source_statuses(status)
+    with transaction.atomic():
+        # Lock by primary key, free of the caller's joins and ordering
+        changed = list(Appointment.objects.select_for_update().filter(
+            pk__in=appointments.values('pk'), status__in=sources,
+        ))
+        if status != 'cancelled':
+            # Cancelled appointments gave up their slot, as in transition_to
+            taken = _overlapping([a for a in changed if a.status == 'cancelled'])
+            changed = [appointment for appointment in changed if appointment.pk not in taken]
+        if not changed:
+            return []
+        now = timezone.now()
+        updated = Appointment.objects.filter(
+            pk__in=[appointment.pk for appointment in changed], status__in=sources,
+        ).update(status=status, updated_at=now)
+        reselected = updated != len(changed)
+        if reselected:
+            changed = _reselect(changed, status, now)
+            if not changed:
+                return []
+
+        stats_deltas = Counter()
+        for appointment in changed:
+            stats_deltas[appointment._stored_stats_key] -= 1
+            appointment.status = status
+            appointment.updated_at = now
+            appointment._stored_stats_key = stats_key(appointment)
+            stats_deltas[appointment._stored_stats_key] += 1
+        if reselected:
+            rebuild({appointment.owner_id for appointment in changed})
+        else:
+            apply_deltas(stats_deltas)
+        sync_reminders(changed)
+        queue_notifications(changed, 'status_changed')
+        publish_reload({appointment.owner_id for appointment in changed})
+    bump_version(*{appointment.owner_id for appointment in changed})
+    return changed
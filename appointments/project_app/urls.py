@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, async_views, views
+
+# Views with an async version, served async when the ASGI entry point
+# (asgi.py) turns on APPOINTMENTS_ASYNC_VIEWS
+pages = async_views if getattr(settings, 'APPOINTMENTS_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
     # Home
@@ -12,18 +17,37 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
 
     # Appointments
-    path('view/', views.view, name='view'),
-    path('appointments/<int:pk>/', views.AppointmentDetailView.as_view(), name='appointmentsdetail'),
+    path('view/', pages.view, name='view'),
+    path('export/', pages.export, name='export'),
+    path('appointments/<int:pk>/', pages.appointment_detail, name='appointmentsdetail'),
     path('post/new/', views.post_new, name='post_new'),
     path('appointments/<int:pk>/edit/', views.appointment_edit, name='appointment_edit'),
     path('appointments/<int:pk>/delete/', views.appoint_remove, name='appoint_remove'),
-    path('appointments/<int:pk>/status/', views.update_status, name='update_status'),
+    path('appointments/<int:pk>/status/', pages.update_status, name='update_status'),
+    path('appointments/status/', views.bulk_update_status, name='bulk_update_status'),
+    path('appointments/<int:pk>/occurrences/<str:occurrence_date>/skip/', views.skip_occurrence,
+         name='skip_occurrence'),
 
     # Calendar
-    path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/', pages.calendar_view, name='calendar'),
+
+    # JSON API
+    path('api/appointments/', api.appointments_api, name='api_appointments'),
+    path('api/appointments/<int:pk>/', api.appointment_api_detail, name='api_appointment_detail'),
+    path('api/availability/', api.availability_api, name='api_availability'),
+
+    # Notifications
+    path('notifications/metrics/', views.outbox_metrics, name='outbox_metrics'),
+
+    # Request instrumentation
+    path('instrumentation/metrics/', views.request_metrics, name='request_metrics'),
 
     # Legacy URLs for backwards compatibility
     path('appointment/', views.appointment, name='appointment'),
-    path('appointmentsdetail/<int:pk>', views.AppointmentDetailView.as_view(), name='appointmentsdetail_legacy'),
+    path('appointmentsdetail/<int:pk>', pages.appointment_detail, name='appointmentsdetail_legacy'),
     path('view/<int:pk>/remove/', views.appoint_remove, name='appoint_remove_legacy'),
 ]
+
+if pages is async_views:
+    # Live changes (server-sent events); long-lived streams need the async views
+    urlpatterns.append(path('changes/', async_views.change_feed, name='change_feed'))
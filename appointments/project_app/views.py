@@ -1,19 +1,31 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.defaultfilters import pluralize
 from django.template.response import TemplateResponse
 from django.views.generic import DetailView, ListView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import login
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.core.paginator import Paginator
-from django.db.models import Q
 from django.conf import settings
-from django.core.mail import send_mail
-from django.http import JsonResponse
-
-from .models import Appointment
-from .forms import AppointmentForm, UserRegistrationForm
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+
+from .models import Appointment, Recurrence, RecurrenceException
+from .calendar_data import cached_month_data
+from .conditional import conditional_page, detail_etag, detail_last_modified, list_etag
+from .export import EXPORT_FORMATS, export_lines
+from .forms import AppointmentForm, RecurrenceForm, UserRegistrationForm
+from .fragments import render_fragment, render_fragments
+from .instrumentation import registry as request_metrics_registry
+from .notifications import outbox_stats, send_appointment_notification
+from .pagination import KeysetPaginator
+from .recurrence import clean_rule, occurrence_dates, occurrences, series_start
+from .stats import dashboard
+from .transitions import bulk_transition
 
 import calendar
 from datetime import datetime, date
@@ -21,8 +33,11 @@ from datetime import datetime, date
 
 # Home page
 def index(request):
-    """Display the home page."""
-    return render(request, 'appointment_files/index.html')
+    """Display the home page, with the user's dashboard statistics."""
+    context = {}
+    if request.user.is_authenticated:
+        context['dashboard'] = dashboard(request.user.pk)
+    return render(request, 'appointment_files/index.html', context)
 
 
 # User Registration
@@ -40,7 +55,77 @@ def register(request):
     return render(request, 'appointment_files/register.html', {'form': form})
 
 
+def list_filters(request):
+    """Return the list page's search, status and date filters."""
+    return {name: request.GET.get(name, '') for name in ('search', 'status', 'date')}
+
+
+def day_occurrences(appointments, filters):
+    """Occurrences of recurring series on the filtered day; only listed for a given day."""
+    try:
+        occurrence_day = datetime.strptime(filters['date'], '%Y-%m-%d').date()
+    except ValueError:
+        return []
+    return occurrences(
+        appointments.list_filter(search=filters['search'], status=filters['status']),
+        occurrence_day, occurrence_day,
+    )
+
+
+def list_paginator(appointments):
+    """Return the list page's paginator and whether it is cursor based."""
+    per_page = getattr(settings, 'APPOINTMENTS_PER_PAGE', 10)
+    if getattr(settings, 'APPOINTMENTS_PAGINATION', 'offset') == 'keyset':
+        return KeysetPaginator(
+            appointments,
+            per_page,
+            count=getattr(settings, 'APPOINTMENTS_PAGINATION_COUNT', None),
+            count_timeout=getattr(settings, 'APPOINTMENTS_PAGINATION_COUNT_TIMEOUT', 60),
+        ), True
+    return Paginator(appointments, per_page), False
+
+
+def row_fragments(appointments, authenticated):
+    """Return ``(appointment, row HTML)`` pairs from the cached row fragments."""
+    rows = render_fragments('row', 'appointment_files/_appointment_row.html', appointments,
+                            {'authenticated': authenticated})
+    return list(zip(appointments, rows))
+
+
+def live_updates():
+    """Whether pages subscribe to the change feed, served by the async views only."""
+    return getattr(settings, 'APPOINTMENTS_ASYNC_VIEWS', False)
+
+
+def list_context(page_obj, rows, cursor_pagination, occurrences_list, filters):
+    """Return the list page's context."""
+    if cursor_pagination:
+        page_range = []
+    else:
+        # Only the pages around the current one are linked
+        page_range = range(
+            max(page_obj.number - 2, 1),
+            min(page_obj.number + 2, page_obj.paginator.num_pages) + 1
+        )
+    return {
+        'page_obj': page_obj,
+        'rows': rows,
+        # The filters, encoded once for every pagination link
+        'filter_query': urlencode([(name, value) for name, value in filters.items() if value]),
+        'data': page_obj,  # backwards compatibility
+        'cursor_pagination': cursor_pagination,
+        'page_range': page_range,
+        'occurrences': occurrences_list,
+        'search_query': filters['search'],
+        'status_filter': filters['status'],
+        'date_filter': filters['date'],
+        'status_choices': Appointment.STATUS_CHOICES,
+        'live_updates': live_updates(),
+    }
+
+
 # List all appointments with search, filter, and pagination
+@conditional_page(list_etag)
 def view(request):
     """
     Display all appointments with search, filter, and pagination.
@@ -51,65 +136,128 @@ def view(request):
     else:
         appointments_list = Appointment.objects.all()
 
-    # Search functionality
-    search_query = request.GET.get('search', '')
-    if search_query:
-        appointments_list = appointments_list.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(appointment_title__icontains=search_query) |
-            Q(appointment_description__icontains=search_query)
-        )
-
-    # Status filter
-    status_filter = request.GET.get('status', '')
-    if status_filter:
-        appointments_list = appointments_list.filter(status=status_filter)
-
-    # Date filter
-    date_filter = request.GET.get('date', '')
-    if date_filter:
-        try:
-            filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-            appointments_list = appointments_list.filter(date_field=filter_date)
-        except ValueError:
-            pass
+    # Search, status and date filters
+    filters = list_filters(request)
+    occurrences_list = day_occurrences(appointments_list, filters)
+    appointments_list = appointments_list.list_filter(**filters)
 
     # Pagination
-    paginator = Paginator(appointments_list, getattr(settings, 'APPOINTMENTS_PER_PAGE', 10))
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator, cursor_pagination = list_paginator(appointments_list)
+    page_obj = paginator.get_page(request.GET.get('cursor' if cursor_pagination else 'page'))
 
-    context = {
-        'page_obj': page_obj,
-        'data': page_obj,  # backwards compatibility
-        'search_query': search_query,
-        'status_filter': status_filter,
-        'date_filter': date_filter,
-        'status_choices': Appointment.STATUS_CHOICES,
-    }
+    rows = row_fragments(list(page_obj), request.user.is_authenticated)
+    context = list_context(page_obj, rows, cursor_pagination, occurrences_list, filters)
     return TemplateResponse(request, 'appointment_files/view.html', context)
 
 
+# Export the (filtered) appointment list
+@login_required
+def export(request):
+    """Stream the user's appointments as CSV or NDJSON with the list filters."""
+    appointments, export_format = export_params(request, request.user)
+    return export_response(export_lines(appointments, export_format), export_format)
+
+
+def export_params(request, user):
+    """Return the appointments to export and the format."""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'csv'
+    appointments = Appointment.objects.filter(owner=user).list_filter(
+        search=request.GET.get('search', ''),
+        status=request.GET.get('status', ''),
+        date=request.GET.get('date', ''),
+    )
+    return appointments, export_format
+
+
+def export_response(lines, export_format):
+    """Return a download response streaming the export ``lines``."""
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="appointments.{export_format}"'
+    return response
+
+
 # Appointment Detail View
+@method_decorator(conditional_page(detail_etag, detail_last_modified), name='dispatch')
 class AppointmentDetailView(DetailView):
     """Display detailed information about a single appointment."""
     template_name = 'appointment_files/view_appointment.html'
     model = Appointment
     context_object_name = 'appointments'  # backwards compatibility
 
+    def get_context_data(self, **kwargs):
+        """Add the recurrence and the occurrence being viewed, if any."""
+        context = super().get_context_data(**kwargs)
+        recurrence = Recurrence.objects.filter(appointment=self.object).first()
+        context.update(detail_context(self.request, self.object, recurrence))
+        return context
+
+
+def detail_context(request, appointment, recurrence):
+    """Return the detail page's recurrence, occurrence date and cached card."""
+    try:
+        occurrence_date = date.fromisoformat(request.GET.get('occurrence', ''))
+    except ValueError:
+        occurrence_date = None
+    return {
+        'recurrence': recurrence,
+        'occurrence_date': occurrence_date,
+        'card': render_fragment(
+            'card', 'appointment_files/_appointment_card.html', appointment,
+            {'rule': recurrence.rule if recurrence else ''},
+        ),
+    }
+
+
+def editable_appointment(request, pk):
+    """
+    Return appointment ``pk`` if ``request.user`` may change it, else None.
+
+    Raise Http404 if it does not exist. The ownership check is part of the
+    query loading the appointment; only a refusal costs a second query, to
+    tell it from a missing appointment.
+    """
+    appointment = Appointment.objects.for_user(request.user).filter(pk=pk).first()
+    if appointment is None:
+        if not Appointment.objects.filter(pk=pk).exists():
+            raise Http404('No appointment matches the given query.')
+        return None
+    if appointment.owner_id is not None:
+        # The owner is the current user; spare the query loading it
+        appointment.owner = request.user
+    return appointment
+
+
+def _forms_valid(form, recurrence_form):
+    """Validate an appointment form together with its recurrence form."""
+    valid = form.is_valid() & recurrence_form.is_valid()
+    rule = valid and recurrence_form.cleaned_data['rule']
+    if rule and not form.cleaned_data.get('date_field'):
+        recurrence_form.add_error('rule', 'A repeating appointment needs a date.')
+        valid = False
+    elif rule:
+        # Whether a rule repeats at all can depend on the day it starts
+        try:
+            clean_rule(rule, series_start(form.instance))
+        except ValidationError as error:
+            recurrence_form.add_error('rule', error)
+            valid = False
+    return valid
+
 
 # Create new appointment
 @login_required
 def post_new(request):
     """Handle creating a new appointment."""
     if request.method == "POST":
-        form = AppointmentForm(request.POST)
-        if form.is_valid():
+        form = AppointmentForm(request.POST, owner=request.user)
+        recurrence_form = RecurrenceForm(request.POST, prefix='recurrence')
+        if _forms_valid(form, recurrence_form):
             appointment = form.save(commit=False)
             appointment.owner = request.user
             appointment.save()
+            recurrence_form.save(appointment)
 
             # Send email notification
             send_appointment_notification(appointment, 'created')
@@ -120,25 +268,30 @@ def post_new(request):
             messages.error(request, 'Please correct the errors below.')
     else:
         form = AppointmentForm()
+        recurrence_form = RecurrenceForm(prefix='recurrence')
 
-    return render(request, 'appointment_files/appointments_form.html', {'form': form})
+    return render(request, 'appointment_files/appointments_form.html', {
+        'form': form,
+        'recurrence_form': recurrence_form,
+    })
 
 
 # Edit existing appointment
 @login_required
 def appointment_edit(request, pk):
     """Handle editing an existing appointment."""
-    appointment = get_object_or_404(Appointment, pk=pk)
-
-    # Check ownership
-    if appointment.owner and appointment.owner != request.user:
+    appointment = editable_appointment(request, pk)
+    if appointment is None:
         messages.error(request, 'You do not have permission to edit this appointment.')
         return redirect('view')
 
+    recurrence = Recurrence.objects.filter(appointment=appointment).first()
     if request.method == "POST":
-        form = AppointmentForm(request.POST, instance=appointment)
-        if form.is_valid():
+        form = AppointmentForm(request.POST, instance=appointment, owner=appointment.owner)
+        recurrence_form = RecurrenceForm(request.POST, prefix='recurrence')
+        if _forms_valid(form, recurrence_form):
             appointment = form.save()
+            recurrence_form.save(appointment)
 
             # Send email notification
             send_appointment_notification(appointment, 'updated')
@@ -149,9 +302,13 @@ def appointment_edit(request, pk):
             messages.error(request, 'Please correct the errors below.')
     else:
         form = AppointmentForm(instance=appointment)
+        recurrence_form = RecurrenceForm(
+            prefix='recurrence', initial={'rule': recurrence.rule if recurrence else ''}
+        )
 
     return render(request, 'appointment_files/appointments_form.html', {
         'form': form,
+        'recurrence_form': recurrence_form,
         'edit_mode': True,
         'appointment': appointment
     })
@@ -161,10 +318,8 @@ def appointment_edit(request, pk):
 @login_required
 def appoint_remove(request, pk):
     """Handle deleting an appointment."""
-    appointment = get_object_or_404(Appointment, pk=pk)
-
-    # Check ownership
-    if appointment.owner and appointment.owner != request.user:
+    appointment = editable_appointment(request, pk)
+    if appointment is None:
         messages.error(request, 'You do not have permission to delete this appointment.')
         return redirect('view')
 
@@ -178,62 +333,101 @@ def appoint_remove(request, pk):
     })
 
 
+# Skip one occurrence of a recurring appointment
+@login_required
+def skip_occurrence(request, pk, occurrence_date):
+    """Cancel a single occurrence of a series by recording an exception."""
+    appointment = editable_appointment(request, pk)
+    if appointment is None:
+        messages.error(request, 'You do not have permission to edit this appointment.')
+        return redirect('view')
+
+    recurrence = get_object_or_404(Recurrence, appointment=appointment)
+    try:
+        day = date.fromisoformat(occurrence_date)
+    except ValueError:
+        day = None
+    if request.method == "POST" and day and occurrence_dates(appointment, recurrence.rule, day, day):
+        RecurrenceException.objects.update_or_create(
+            recurrence=recurrence, original_date=day,
+            defaults={'cancelled': True, 'date_field': None, 'time_field': None},
+        )
+        messages.success(request, f'The occurrence on {day:%B %d, %Y} was skipped.')
+        return redirect(f"{reverse('calendar')}?year={day.year}&month={day.month}")
+    messages.error(request, 'That date is not an occurrence of this appointment.')
+    return redirect('appointmentsdetail', pk=appointment.pk)
+
+
 # Update appointment status
 @login_required
 def update_status(request, pk):
-    """Update the status of an appointment via AJAX."""
-    if request.method == "POST":
-        appointment = get_object_or_404(Appointment, pk=pk)
+    """
+    Update the status of an appointment via AJAX.
 
-        # Check ownership
-        if appointment.owner and appointment.owner != request.user:
+    Only the transitions in ``Appointment.STATUS_TRANSITIONS`` are allowed;
+    repeating the current status changes nothing and sends no email.
+    """
+    if request.method == "POST":
+        appointment = editable_appointment(request, pk)
+        if appointment is None:
             return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
 
         new_status = request.POST.get('status')
         if new_status in dict(Appointment.STATUS_CHOICES):
-            appointment.status = new_status
-            appointment.save()
+            try:
+                changed = appointment.transition_to(new_status)
+            except ValidationError as e:
+                return JsonResponse({'success': False, 'error': e.messages[0]}, status=409)
 
             # Send email notification for status change
-            send_appointment_notification(appointment, 'status_changed')
+            if changed:
+                send_appointment_notification(appointment, 'status_changed')
 
-            return JsonResponse({'success': True, 'status': appointment.get_status_display()})
+            return JsonResponse({'success': True, 'status': appointment.get_status_display(),
+                                 'changed': changed})
 
     return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
 
 
-# Calendar View
-def calendar_view(request):
-    """Display appointments in a calendar view."""
-    year = int(request.GET.get('year', datetime.now().year))
-    month = int(request.GET.get('month', datetime.now().month))
-
-    # Get appointments for the month
-    if request.user.is_authenticated:
-        appointments = Appointment.objects.filter(
-            owner=request.user,
-            date_field__year=year,
-            date_field__month=month
-        )
-    else:
-        appointments = Appointment.objects.filter(
-            date_field__year=year,
-            date_field__month=month
-        )
-
-    # Create calendar
-    cal = calendar.Calendar(firstweekday=6)  # Sunday start
-    month_days = cal.monthdayscalendar(year, month)
-
-    # Group appointments by date
-    appointments_by_date = {}
-    for appt in appointments:
-        if appt.date_field:
-            day = appt.date_field.day
-            if day not in appointments_by_date:
-                appointments_by_date[day] = []
-            appointments_by_date[day].append(appt)
+# Update the status of the appointments ticked on the list page
+@login_required
+def bulk_update_status(request):
+    """
+    Move the selected appointments to a status with one UPDATE.
 
+    Appointments of other owners, and those whose status may not move to
+    the new one, are skipped.
+    """
+    redirect_to = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(redirect_to, {request.get_host()},
+                                           require_https=request.is_secure()):
+        redirect_to = reverse('view')
+    new_status = request.POST.get('status')
+    pks = list({int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()})
+    if request.method != "POST" or new_status not in dict(Appointment.STATUS_CHOICES) or not pks:
+        messages.error(request, 'Select appointments and a status.')
+        return redirect(redirect_to)
+
+    changed = bulk_transition(Appointment.objects.for_user(request.user).filter(pk__in=pks),
+                              new_status)
+    label = dict(Appointment.STATUS_CHOICES)[new_status]
+    messages.success(request, f'{len(changed)} appointment{pluralize(len(changed))} '
+                              f'marked {label.lower()}.')
+    skipped = len(pks) - len(changed)
+    if skipped:
+        messages.warning(request, f'{skipped} appointment{pluralize(skipped)} '
+                                  f'could not be marked {label.lower()}.')
+    return redirect(redirect_to)
+
+
+def calendar_params(request):
+    """Return the ``(year, month)`` the calendar shows, this month by default."""
+    return (int(request.GET.get('year', datetime.now().year)),
+            int(request.GET.get('month', datetime.now().month)))
+
+
+def calendar_context(year, month, calendar_month):
+    """Return the calendar page's context for ``month_data`` of a month."""
     # Navigation
     prev_month = month - 1
     prev_year = year
@@ -247,80 +441,55 @@ def calendar_view(request):
         next_month = 1
         next_year += 1
 
-    context = {
+    today = date.today()
+    return {
         'year': year,
         'month': month,
         'month_name': calendar.month_name[month],
-        'month_days': month_days,
-        'appointments_by_date': appointments_by_date,
+        'weeks': calendar_month['weeks'],
+        'appointments_by_date': calendar_month['by_day'],
+        'counts_only': calendar_month['counts_only'],
+        'total': calendar_month['total'],
+        'today_day': today.day if (today.year, today.month) == (year, month) else None,
         'prev_year': prev_year,
         'prev_month': prev_month,
         'next_year': next_year,
         'next_month': next_month,
-        'today': date.today(),
+        'today': today,
+        'live_updates': live_updates(),
     }
-    return render(request, 'appointment_files/calendar.html', context)
-
-
-# Email notification helper
-def send_appointment_notification(appointment, action):
-    """Send email notification for appointment actions."""
-    if not appointment.email:
-        return
-
-    subjects = {
-        'created': f'New Appointment: {appointment.appointment_title}',
-        'updated': f'Appointment Updated: {appointment.appointment_title}',
-        'status_changed': f'Appointment Status Changed: {appointment.appointment_title}',
-    }
-
-    messages_content = {
-        'created': f'''
-Hello {appointment.first_name},
 
-Your appointment has been created successfully.
 
-Title: {appointment.appointment_title}
-Date: {appointment.date_field}
-Time: {appointment.time_field}
-Status: {appointment.get_status_display()}
-
-Thank you for using our Appointments App!
-        ''',
-        'updated': f'''
-Hello {appointment.first_name},
-
-Your appointment has been updated.
-
-Title: {appointment.appointment_title}
-Date: {appointment.date_field}
-Time: {appointment.time_field}
-Status: {appointment.get_status_display()}
+# Calendar View
+@conditional_page(list_etag)
+def calendar_view(request):
+    """Display appointments in a calendar view."""
+    year, month = calendar_params(request)
 
-Thank you for using our Appointments App!
-        ''',
-        'status_changed': f'''
-Hello {appointment.first_name},
+    # Get appointments for the month, grouped per day cell
+    if request.user.is_authenticated:
+        owner_id = request.user.pk
+        appointments = Appointment.objects.filter(owner_id=owner_id)
+    else:
+        owner_id = None
+        appointments = Appointment.objects.all()
+    calendar_month = cached_month_data(appointments, owner_id, year, month)
+    return render(request, 'appointment_files/calendar.html',
+                  calendar_context(year, month, calendar_month))
 
-The status of your appointment has been changed.
 
-Title: {appointment.appointment_title}
-New Status: {appointment.get_status_display()}
+# Notification outbox metrics
+@user_passes_test(lambda user: user.is_staff)
+def outbox_metrics(request):
+    """Return notification queue-depth metrics as JSON (staff only)."""
+    return JsonResponse(outbox_stats())
 
-Thank you for using our Appointments App!
-        ''',
-    }
 
-    try:
-        send_mail(
-            subject=subjects.get(action, 'Appointment Notification'),
-            message=messages_content.get(action, ''),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[appointment.email],
-            fail_silently=True,
-        )
-    except Exception:
-        pass  # Email sending is non-critical
+# Request instrumentation histograms
+@user_passes_test(lambda user: user.is_staff)
+def request_metrics(request):
+    """Return this process's per-view latency and query metrics as JSON (staff only)."""
+    return JsonResponse({'views': request_metrics_registry.snapshot()})
 
 
 # Legacy view for backwards compatibility
@@ -331,3 +500,4 @@ def appointment(request):
 
 # Backwards compatibility aliases
 appointmentsdetail = AppointmentDetailView
+appointment_detail = AppointmentDetailView.as_view()